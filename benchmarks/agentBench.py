@@ -0,0 +1,166 @@
+"""
+Offline benchmark of the full agent + tool stack (no network).
+
+The LLM is the scripted fake from service/agent/backends.py replaying
+benchmarks/agentScripts.json with a fixed latency; tools run against
+mongomock (default) or a local Mongo (--mongo, uses MONGODB_URI).
+
+Reports per scenario: wall time, time in the model, time in tools and the
+rest (framework overhead: prompt formatting, parsing, callbacks, memory).
+With --processes N it also measures throughput, one agent per process.
+
+    python -m benchmarks.agentBench --runs 50 --llm-latency-ms 0
+    python -m benchmarks.agentBench --processes 4 --seconds 10
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import statistics
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["AGENT_MEMORY_BACKEND"] = "none"
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks import fixtures
+
+# (scenario, message) - every message contains a digit or is long enough to
+# skip the fast-path router and the response cache
+SCENARIOS = [
+    ("search", "มีข้าวผัดอะไรบ้าง ขอ 2 อย่าง"),
+    ("create_order", "สั่งข้าวกะเพราหมูสับ 1 จาน เพิ่มไข่ดาว ไม่เผ็ด"),
+    ("my_orders", "ขอดูออเดอร์ 5 รายการล่าสุดของฉัน"),
+    ("parallel_reads", "แนะนำเมนูให้หน่อย 1 อย่าง จากที่เคยสั่ง"),
+    ("default", "ขอบคุณมากครับ วันนี้ 12 โมงเจอกัน"),
+]
+
+
+class StepTimer(BaseCallbackHandler):
+    """Time spent in the model and in each tool during one run"""
+
+    def __init__(self):
+        self.started: Dict = {}
+        self.model = 0.0
+        self.tools: Dict[str, List[float]] = defaultdict(list)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self.model += time.perf_counter() - self.started.pop(run_id, time.perf_counter())
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self.started[run_id] = (serialized.get("name"), time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        name, started = self.started.pop(run_id)
+        self.tools[name].append(time.perf_counter() - started)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
+
+
+def build_agent(llm_latency: float, use_mongo: bool):
+    if not use_mongo:
+        fixtures.use_mongomock()
+    ids = fixtures.seed(n_users=20, orders_per_user=5)
+
+    from service.agent.backends import create_llm
+    from service.agent.llm import FoodOrderingAgentWithUserMemory
+    from service.agent.memoryStore import ConversationBackend, ConversationMemoryStore
+    from service.users.user import Users
+
+    llm = create_llm("fake")
+    llm.latency = llm_latency
+    llm.context["user_id"] = ids["user_ids"][0]
+    agent = FoodOrderingAgentWithUserMemory(llm=llm, memory_store=ConversationMemoryStore(ConversationBackend()))
+    profile = Users().get_user_profile_by_line_id(ids["line_ids"][0])
+    return agent, ids["line_ids"][0], profile
+
+
+def silent():
+    # the agent prints every step and token counts; keep the report readable
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def warm_up(agent, line_id, profile):
+    """One run per scenario: builds the per-toolset executors, then silences them"""
+    with silent():
+        for _, message in SCENARIOS:
+            agent.chat(message, line_id, profile)
+    agent.memory_store.forget(line_id)
+    for executor in agent._executors.values():
+        executor.verbose = False
+
+
+def measure_latency(agent, line_id, profile, runs: int):
+    print(f"{'scenario':16s} {'wall p50':>9s} {'p95':>8s} {'model':>8s} {'tools':>8s} {'overhead':>9s}  (ms)")
+    tool_times: Dict[str, List[float]] = defaultdict(list)
+    for name, message in SCENARIOS:
+        walls, models, tools = [], [], []
+        for _ in range(runs):
+            timer = StepTimer()
+            started = time.perf_counter()
+            with silent():
+                agent.chat(message, line_id, profile, callbacks=[timer])
+            walls.append(time.perf_counter() - started)
+            models.append(timer.model)
+            tools.append(sum(sum(v) for v in timer.tools.values()))
+            for tool, durations in timer.tools.items():
+                tool_times[tool].extend(durations)
+            agent.memory_store.forget(line_id)
+        walls.sort()
+        overhead = statistics.median(w - m - t for w, m, t in zip(walls, models, tools))
+        print(
+            f"{name:16s} {statistics.median(walls) * 1000:9.2f} {walls[int(len(walls) * 0.95) - 1] * 1000:8.2f} "
+            f"{statistics.median(models) * 1000:8.2f} {statistics.median(tools) * 1000:8.2f} {overhead * 1000:9.2f}"
+        )
+
+    print(f"\n{'tool':28s} {'calls':>6s} {'p50 ms':>8s} {'max ms':>8s}")
+    for tool, durations in sorted(tool_times.items()):
+        print(f"{tool:28s} {len(durations):6d} {statistics.median(durations) * 1000:8.2f} {max(durations) * 1000:8.2f}")
+
+
+def _worker(args):
+    llm_latency, use_mongo, seconds = args
+    agent, line_id, profile = build_agent(llm_latency, use_mongo)
+    warm_up(agent, line_id, profile)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    with silent():
+        while time.perf_counter() < deadline:
+            _, message = SCENARIOS[done % len(SCENARIOS)]
+            agent.chat(message, line_id, profile)
+            done += 1
+    return done
+
+
+def measure_throughput(processes: int, llm_latency: float, use_mongo: bool, seconds: float):
+    # spawn: every worker seeds its own in-memory database
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        counts = pool.map(_worker, [(llm_latency, use_mongo, seconds)] * processes)
+    total = sum(counts) / seconds
+    print(f"\nthroughput: {total:.1f} chats/s with {processes} processes ({total / processes:.1f} chats/s per core)")
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.agentBench [--runs N] [--processes N]")
+    arg_parser.add_argument("--runs", type=int, default=30, help="runs per scenario")
+    arg_parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    arg_parser.add_argument("--mongo", action="store_true", help="use MONGODB_URI instead of mongomock")
+    arg_parser.add_argument("--processes", type=int, default=0, help="also measure throughput with N processes")
+    arg_parser.add_argument("--seconds", type=float, default=5.0)
+    options = arg_parser.parse_args()
+
+    latency = options.llm_latency_ms / 1000
+    agent, line_id, profile = build_agent(latency, options.mongo)
+    warm_up(agent, line_id, profile)
+    measure_latency(agent, line_id, profile, options.runs)
+    if options.processes:
+        measure_throughput(options.processes, latency, options.mongo, options.seconds)
@@ -0,0 +1,108 @@
+"""
+Per-message framework overhead of FoodOrderingAgentWithUserMemory, separated from LLM time.
+
+Uses a fake chat model (fixed latency, no network) and compares (the message
+contains a number so it skips the fast-path router and the response cache):
+  rebuild  - a new AgentExecutor per message (the old chat() behaviour)
+  shared   - the executor built once in __init__ (current chat())
+
+    python -m benchmarks.agentOverhead --messages 200 --llm-latency-ms 0
+"""
+import os
+import statistics
+import time
+from argparse import ArgumentParser
+from typing import Any, List, Optional
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # module-level agent needs a key to construct
+
+from langchain.agents import AgentExecutor
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatResult
+
+from service.agent.llm import FoodOrderingAgentWithUserMemory
+from service.agent.memoryStore import ConversationBackend, ConversationMemoryStore
+
+
+class TimedFakeChatModel(FakeMessagesListChatModel):
+    """Always answers directly; records time spent 'in the model'."""
+
+    latency: float = 0.0
+    model_time: float = 0.0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        started = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        self.model_time += time.perf_counter() - started
+        return result
+
+
+rebuild_memories = {}
+
+
+def run_rebuild(agent: FoodOrderingAgentWithUserMemory, message: str, user_id: str):
+    memory = rebuild_memories.setdefault(user_id, ConversationBufferWindowMemory(
+        k=10, memory_key="chat_history", return_messages=True, input_key="message", output_key="output"
+    ))
+    executor = AgentExecutor(
+        agent=agent.agent,
+        tools=agent.tools,
+        memory=memory,
+        verbose=False,
+        max_iterations=10,
+        early_stopping_method="force",
+        return_intermediate_steps=True,
+    )
+    return executor.invoke({"message": message, "user_info": "{}"})["output"]
+
+
+def run_shared(agent: FoodOrderingAgentWithUserMemory, message: str, user_id: str):
+    return agent.chat(message, user_id, "{}")
+
+
+def measure(name, fn, agent, llm, messages: int, users: int):
+    llm.model_time = 0.0
+    durations = []
+    for i in range(messages):
+        started = time.perf_counter()
+        fn(agent, "ขอข้าวกะเพรา 2 จาน", f"bench-user-{i % users}")
+        durations.append(time.perf_counter() - started)
+
+    total = sum(durations)
+    overhead = (total - llm.model_time) / messages
+    print(
+        f"{name:8s} total/msg={total / messages * 1000:7.2f}ms "
+        f"model/msg={llm.model_time / messages * 1000:7.2f}ms "
+        f"framework/msg={overhead * 1000:7.2f}ms "
+        f"p95={statistics.quantiles(durations, n=20)[-1] * 1000:7.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.agentOverhead [--messages N] [--llm-latency-ms N]")
+    arg_parser.add_argument("--messages", type=int, default=200)
+    arg_parser.add_argument("--users", type=int, default=20)
+    arg_parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    options = arg_parser.parse_args()
+
+    llm = TimedFakeChatModel(responses=[AIMessage(content="มีข้าวกะเพรา ข้าวผัด และต้มยำครับ")])
+    llm.latency = options.llm_latency_ms / 1000
+    agent = FoodOrderingAgentWithUserMemory(llm=llm, memory_store=ConversationMemoryStore(ConversationBackend()))
+    agent.agent_executor.verbose = False
+
+    measure("rebuild", run_rebuild, agent, llm, options.messages, options.users)
+    measure("shared", run_shared, agent, llm, options.messages, options.users)
@@ -0,0 +1,85 @@
+"""
+Shared setup for the offline benchmarks.
+
+use_mongomock() must run before any service module is imported: the services
+create their MongoClient at import/construction time.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+MENU = [
+    ("ข้าวกะเพราหมูสับ", 50), ("ข้าวกะเพราไก่", 50), ("ข้าวผัดหมู", 45), ("ข้าวผัดกุ้ง", 60),
+    ("ผัดไทยกุ้งสด", 60), ("ราดหน้าหมู", 50), ("ผัดซีอิ๊วหมู", 50), ("ข้าวมันไก่", 45),
+    ("ข้าวขาหมู", 50), ("ต้มยำกุ้ง", 80), ("แกงเขียวหวานไก่", 55), ("ข้าวไข่เจียว", 35),
+    ("ก๋วยเตี๋ยวเรือ", 45), ("สุกี้น้ำ", 55), ("ข้าวหมูแดง", 45), ("ส้มตำไทย", 40),
+    ("ไก่ทอด", 40), ("ชาเย็น", 25), ("กาแฟเย็น", 30), ("น้ำเปล่า", 10),
+]
+ADDONS = ["ไข่ดาว", "ไข่เจียว", "หมูกรอบ", "พิเศษ"]
+DESCRIPTIONS = ["", "ไม่เผ็ด", "เผ็ดน้อย", "ไม่ใส่ผัก", "ข้าวน้อย"]
+
+
+def use_mongomock():
+    """Route every MongoClient in this process to one shared in-memory mongomock client"""
+    import mongomock
+    import pymongo
+
+    shared = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared
+    os.environ.setdefault("MONGODB_URI", "mongodb://mongomock")
+
+
+def seed(n_users: int = 50, orders_per_user: int = 5, rng_seed: int = 7) -> Dict[str, List]:
+    """Insert a menu, registered LINE users and an order history; returns the ids"""
+    from service.order.order import OrderService
+    from service.product.product import ProductService
+    from service.users.user import Users
+
+    rng = random.Random(rng_seed)
+    products = ProductService(os.getenv("MONGODB_URI"))
+    orders = OrderService()
+    users = Users()
+
+    product_ids = []
+    for i, (name, price) in enumerate(MENU):
+        product_ids.append(products.CreateProduct({
+            "product_name": name,
+            "price": price,
+            "status": "available" if i % 7 else "unavailable",
+            "description": f"{name} จานเด็ด สูตรร้าน",
+            "image": f"https://example.com/img/{i}.jpg",
+        }))
+
+    user_ids, line_ids = [], []
+    for i in range(n_users):
+        line_id = f"Ubench{i:027d}"
+        users.upsert_user({
+            "line_user_id": line_id,
+            "username": f"student{i}",
+            "display_name": f"Student {i}",
+            "email": f"student{i}@example.com",
+            "studentId": f"65{i:06d}",
+            "role": "student",
+        })
+        user_ids.append(str(users.get_user_by_line_id(line_id)["_id"]))
+        line_ids.append(line_id)
+
+    now = datetime.now()
+    order_ids = []
+    for user_id in user_ids:
+        favourites = rng.sample(MENU, 4)
+        for _ in range(orders_per_user):
+            name, price = rng.choice(favourites)
+            addon = rng.sample(ADDONS, rng.randint(0, 2))
+            order_ids.append(orders.collection.insert_one({
+                "product_name": name,
+                "userId": user_id,
+                "price": price + 10 * len(addon),
+                "addon": addon,
+                "status": rng.choice(["pending", "making", "complete", "cancelled"]),
+                "description": rng.choice(DESCRIPTIONS),
+                "createAt": now - timedelta(days=rng.randint(0, 30), hours=rng.randint(0, 23)),
+            }).inserted_id)
+
+    return {"product_ids": product_ids, "user_ids": user_ids, "line_ids": line_ids, "order_ids": order_ids}
@@ -0,0 +1,172 @@
+"""
+Replay LINE-like text traffic against /callback and measure webhook -> push latency.
+The push that counts is the answer: progress updates the agent pushes while
+it calls tools ("🔎 กำลังค้นหาเมนู...") are skipped.
+
+Needs the app running against benchmarks/lineStub.py (see that module), and
+LINE_CHANNEL_SECRET set to the same value the app uses so the signatures verify.
+
+    python -m benchmarks.lineLoad --target http://127.0.0.1:8000 --stub http://127.0.0.1:9000 \
+        --users 50 --messages 5 --seed-users
+
+--seed-users registers the simulated users (line_user_id + studentId) in MONGODB_URI
+so /callback routes them to the agent instead of the login link.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from argparse import ArgumentParser
+from typing import Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET", "")
+
+DEFAULT_MESSAGES = [
+    "เมนูวันนี้มีอะไรบ้าง",
+    "ขอข้าวกะเพราหมูสับ",
+    "ไข่ดาว",
+    "ไม่เผ็ด",
+    "ออเดอร์ล่าสุดของฉัน",
+    "สถานะออเดอร์เป็นยังไงบ้าง",
+    "ราคาเท่าไหร่",
+    "แนะนำเมนูหน่อย",
+    "ขอบคุณครับ",
+    "ยกเลิกออเดอร์",
+]
+
+
+def sign(body: bytes, secret: str) -> str:
+    """X-Line-Signature: base64(HMAC-SHA256(channel secret, body))"""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def text_webhook(user_id: str, text: str) -> bytes:
+    event = {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex.upper()[:26],
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+        "message": {"id": str(random.randint(10**17, 10**18)), "type": "text", "quoteToken": "q", "text": text},
+    }
+    return json.dumps({"destination": "Ustub", "events": [event]}, ensure_ascii=False).encode()
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed_users(user_ids: List[str]):
+    from service.users.user import Users
+
+    users = Users()
+    for i, user_id in enumerate(user_ids):
+        users.upsert_user({
+            "line_user_id": user_id,
+            "display_name": f"Load {i}",
+            "username": f"load{i}",
+            "studentId": f"LOAD{i:05d}",
+        })
+
+
+async def simulate_user(
+    client: httpx.AsyncClient,
+    options,
+    user_id: str,
+    corpus: List[str],
+    results: Dict[str, List[float]],
+    progress_texts: List[str],
+):
+    for _ in range(options.messages):
+        text = random.choice(corpus)
+        body = text_webhook(user_id, text)
+        started = time.time()
+        try:
+            response = await client.post(
+                f"{options.target}/callback",
+                content=body,
+                headers={"X-Line-Signature": sign(body, CHANNEL_SECRET), "Content-Type": "application/json"},
+            )
+            results["ack"].append(time.time() - started)
+            if response.status_code != 200:
+                results["errors"].append(response.status_code)
+                continue
+
+            pushed = await client.get(
+                f"{options.stub}/_stub/pushes/{user_id}",
+                params={"after": started, "timeout": options.timeout, "skip": progress_texts},
+                timeout=options.timeout + 5,
+            )
+            if pushed.status_code != 200:
+                results["timeouts"].append(1)
+                continue
+            results["push"].append(pushed.json()["at"] - started)
+        except httpx.HTTPError as e:
+            results["errors"].append(str(e))
+
+        # wait out the debounce window so each message is its own turn
+        await asyncio.sleep(options.think_ms / 1000)
+
+
+async def run(options):
+    from service.agent.toolSelection import PROGRESS_TEXTS
+
+    corpus = DEFAULT_MESSAGES
+    if options.corpus:
+        with open(options.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+
+    user_ids = [f"Uload{i:028d}" for i in range(options.users)]
+    if options.seed_users:
+        seed_users(user_ids)
+
+    results: Dict[str, List] = {"ack": [], "push": [], "errors": [], "timeouts": []}
+    limits = httpx.Limits(max_connections=options.users * 2, max_keepalive_connections=options.users * 2)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await client.post(f"{options.stub}/_stub/reset")
+        started = time.time()
+        await asyncio.gather(*(simulate_user(client, options, u, corpus, results, PROGRESS_TEXTS) for u in user_ids))
+        elapsed = time.time() - started
+        stub_stats = (await client.get(f"{options.stub}/_stub/stats")).json()
+
+    push = results["push"]
+    print(f"users={options.users} messages/user={options.messages} wall={elapsed:.1f}s")
+    print(f"completed={len(push)} errors={len(results['errors'])} timeouts={len(results['timeouts'])}")
+    print(f"throughput={len(push) / elapsed:.2f} msg/s")
+    print(f"webhook ack  p50={percentile(results['ack'], 50) * 1000:.0f}ms p95={percentile(results['ack'], 95) * 1000:.0f}ms")
+    if push:
+        print(
+            f"webhook->push p50={percentile(push, 50):.2f}s p95={percentile(push, 95):.2f}s "
+            f"p99={percentile(push, 99):.2f}s mean={statistics.mean(push):.2f}s"
+        )
+    print(f"stub: {stub_stats}")
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.lineLoad [--users N] [--messages N] [--seed-users]")
+    arg_parser.add_argument("--target", default="http://127.0.0.1:8000", help="app base url")
+    arg_parser.add_argument("--stub", default="http://127.0.0.1:9000", help="lineStub base url")
+    arg_parser.add_argument("--users", type=int, default=20)
+    arg_parser.add_argument("--messages", type=int, default=5, help="messages per user")
+    arg_parser.add_argument("--think-ms", type=int, default=2000, help="pause between a user's messages")
+    arg_parser.add_argument("--timeout", type=float, default=120.0, help="max wait for a push (s)")
+    arg_parser.add_argument("--corpus", help="text file, one message per line")
+    arg_parser.add_argument("--seed-users", action="store_true", help="register the simulated users first")
+    asyncio.run(run(arg_parser.parse_args()))
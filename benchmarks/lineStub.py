@@ -0,0 +1,192 @@
+"""
+Local stand-in for the LINE Messaging / Login API, for load testing /callback.
+
+    python -m benchmarks.lineStub --port 9000 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+
+Then start the app against it:
+
+    LINE_API_HOST=http://127.0.0.1:9000 LINE_ACCESS_HOST=http://127.0.0.1:9000 python main.py
+
+Endpoints used by controller/line.py:
+    POST /v2/bot/message/reply | push | multicast
+    POST /oauth2/v2.1/token
+    GET  /v2/profile
+    GET  /oauth2/v2.1/authorize   (redirects straight back with a code)
+
+Stub control (used by benchmarks/lineLoad.py):
+    GET  /_stub/pushes/{user_id}?after=<unix ts>&timeout=<s>[&skip=<text>...]
+                                 long-poll for the next push (pushes whose
+                                 text is one of `skip` don't count)
+    GET  /_stub/stats
+    POST /_stub/reset
+"""
+import asyncio
+import random
+import time
+import uuid
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+import uvicorn
+from fastapi import FastAPI, Form, Header, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+
+class StubSettings:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+
+settings = StubSettings()
+app = FastAPI()
+
+# user_id -> list of (received_at, messages)
+pushes: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+counters: Dict[str, int] = defaultdict(int)
+push_arrived = asyncio.Condition()
+
+
+async def inject(endpoint: str):
+    """Simulated network/platform latency and failures. Returns an error response or None."""
+    counters[endpoint] += 1
+    delay = settings.latency_ms + random.uniform(0, settings.jitter_ms)
+    if delay:
+        await asyncio.sleep(delay / 1000)
+    if settings.error_rate and random.random() < settings.error_rate:
+        counters[f"{endpoint}_errors"] += 1
+        return JSONResponse({"message": "injected error"}, status_code=random.choice([429, 500]))
+    return None
+
+
+async def record_push(to: str, messages: List[Dict[str, Any]]):
+    async with push_arrived:
+        pushes[to].append({"at": time.time(), "messages": messages})
+        push_arrived.notify_all()
+
+
+# ---------------------- Messaging API -------------------------
+
+@app.post("/v2/bot/message/reply")
+async def reply(request: Request):
+    error = await inject("reply")
+    if error:
+        return error
+    body = await request.json()
+    return {"sentMessages": [{"id": uuid.uuid4().hex, "quoteToken": "q"} for _ in body.get("messages", [])]}
+
+
+@app.post("/v2/bot/message/push")
+async def push(request: Request):
+    error = await inject("push")
+    if error:
+        return error
+    body = await request.json()
+    await record_push(body["to"], body.get("messages", []))
+    return {"sentMessages": [{"id": uuid.uuid4().hex, "quoteToken": "q"} for _ in body.get("messages", [])]}
+
+
+@app.post("/v2/bot/message/multicast")
+async def multicast(request: Request):
+    error = await inject("multicast")
+    if error:
+        return error
+    body = await request.json()
+    for to in body.get("to", []):
+        await record_push(to, body.get("messages", []))
+    return {}
+
+
+# ---------------------- Login API -------------------------
+
+@app.get("/oauth2/v2.1/authorize")
+async def authorize(redirect_uri: str, state: str):
+    code = f"stub-{uuid.uuid4().hex[:12]}"
+    return RedirectResponse(url=f"{redirect_uri}?{urlencode({'code': code, 'state': state})}")
+
+
+@app.post("/oauth2/v2.1/token")
+async def token(code: str = Form(...)):
+    error = await inject("token")
+    if error:
+        return error
+    return {
+        "access_token": code,
+        "token_type": "Bearer",
+        "expires_in": 2592000,
+        "refresh_token": uuid.uuid4().hex,
+        "scope": "profile openid email",
+        "id_token": "",
+    }
+
+
+@app.get("/v2/profile")
+async def profile(authorization: str = Header(...)):
+    error = await inject("profile")
+    if error:
+        return error
+    access_token = authorization.removeprefix("Bearer ").strip()
+    user_id = "U" + uuid.uuid5(uuid.NAMESPACE_OID, access_token).hex
+    return {"userId": user_id, "displayName": f"Load {user_id[-6:]}", "pictureUrl": None}
+
+
+# ---------------------- Stub control -------------------------
+
+@app.get("/_stub/pushes/{user_id}")
+async def wait_for_push(
+    user_id: str,
+    after: float = 0.0,
+    timeout: float = 60.0,
+    skip: List[str] = Query(default=[]),
+):
+    """
+    Return the first push to user_id received after `after`, waiting up to
+    `timeout` seconds. Pushes made only of `skip` texts (progress updates)
+    are passed over.
+    """
+    skipped = set(skip)
+
+    def first_after():
+        return next(
+            (
+                p for p in pushes.get(user_id, [])
+                if p["at"] > after and not all(m.get("text") in skipped for m in p["messages"])
+            ),
+            None,
+        )
+
+    async with push_arrived:
+        try:
+            await asyncio.wait_for(push_arrived.wait_for(lambda: first_after() is not None), timeout)
+        except asyncio.TimeoutError:
+            return JSONResponse({"message": "timeout"}, status_code=408)
+        return first_after()
+
+
+@app.get("/_stub/stats")
+async def stats():
+    return {"counters": dict(counters), "users_pushed": len(pushes)}
+
+
+@app.post("/_stub/reset")
+async def reset():
+    pushes.clear()
+    counters.clear()
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.lineStub [--port 9000] [--latency-ms N] [--jitter-ms N] [--error-rate P]")
+    arg_parser.add_argument("-p", "--port", type=int, default=9000)
+    arg_parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed latency per API call")
+    arg_parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random latency")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429/500")
+    options = arg_parser.parse_args()
+
+    settings.latency_ms = options.latency_ms
+    settings.jitter_ms = options.jitter_ms
+    settings.error_rate = options.error_rate
+
+    uvicorn.run(app, host="127.0.0.1", port=options.port, log_level="warning")
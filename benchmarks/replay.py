@@ -0,0 +1,242 @@
+"""
+Replay a recorded LINE corpus (LINE_RECORD_PATH, see utills/recorder.py)
+against FoodOrderingAgentWithUserMemory.chat and report latency, tokens,
+tool calls and database mutations, to compare agent configurations.
+
+Each pseudonymous user is mapped to a seeded user and their messages are
+replayed in recorded order; users are spread over --workers threads by a
+stable assignment, so every run sends the same messages in the same order
+per user. Shared caches (response cache, tool cache) can still be warmed in
+a different order across users; use --workers 1 for a fully repeatable run.
+
+    python -m benchmarks.replay benchmarks/sampleCorpus.jsonl --backend fake
+    LLM_MODEL=gpt-5-mini python -m benchmarks.replay corpus.jsonl --backend openai --out mini.json
+    python -m benchmarks.replay corpus.jsonl --compare base.json mini.json
+
+The database is an in-memory mongomock seeded with fixtures. --real-db
+replays against MONGODB_URI instead: it seeds synthetic data there and the
+replayed messages place and cancel real orders.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks import fixtures
+
+# (database, collection) pairs whose changes are reported
+WATCHED = [("Orders", "orders"), ("Products", "products"), ("Users", "users")]
+
+
+def load_corpus(path: str, limit: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    by_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                by_user[record["user"]].append(record)
+    for records in by_user.values():
+        records.sort(key=lambda r: r["ts"])
+    users = dict(sorted(by_user.items()))
+    if limit:
+        kept, total = {}, 0
+        for user, records in users.items():
+            if total >= limit:
+                break
+            kept[user] = records[:limit - total]
+            total += len(kept[user])
+        users = kept
+    return users
+
+
+class RunStats(BaseCallbackHandler):
+    """Tokens and tool calls of one chat() call"""
+
+    run_inline = True
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.tools: Counter = Counter()
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tools[(serialized or {}).get("name", "?")] += 1
+
+
+def snapshot(client) -> Dict[str, Dict[str, str]]:
+    """_id -> content hash for every watched collection"""
+    state = {}
+    for database, collection in WATCHED:
+        docs = client[database][collection].find({})
+        state[f"{database}.{collection}"] = {
+            str(d["_id"]): hashlib.sha1(json.dumps(d, sort_keys=True, default=str).encode()).hexdigest()
+            for d in docs
+        }
+    return state
+
+
+def mutations(before, after) -> Dict[str, Dict[str, int]]:
+    report = {}
+    for name in before:
+        old, new = before[name], after[name]
+        report[name] = {
+            "inserted": len(new.keys() - old.keys()),
+            "updated": sum(1 for k in new.keys() & old.keys() if new[k] != old[k]),
+            "deleted": len(old.keys() - new.keys()),
+        }
+    return report
+
+
+def replay(agent, corpus, ids, workers: int) -> Dict[str, Any]:
+    from service.users.user import Users
+
+    users_service = Users()
+    line_ids = ids["line_ids"]
+    if len(corpus) > len(line_ids):
+        # sharing a seeded user would merge two histories (memory, caches, orders)
+        raise ValueError(f"corpus has {len(corpus)} users but only {len(line_ids)} were seeded")
+    # pseudonym -> seeded LINE user (stable: corpus order)
+    mapping = {user: line_ids[i] for i, user in enumerate(corpus)}
+
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def replay_user(user: str):
+        line_id = mapping[user]
+        profile = users_service.get_user_profile_by_line_id(line_id) or {}
+        for record in corpus[user]:
+            profile = {**profile, "role": record.get("role", "student")}
+            stats = RunStats()
+            started = time.perf_counter()
+            agent.chat(record["text"], line_id, profile, callbacks=[stats])
+            elapsed = time.perf_counter() - started
+            with lock:
+                results.append({
+                    "seconds": elapsed,
+                    "input_tokens": stats.input_tokens,
+                    "output_tokens": stats.output_tokens,
+                    "tools": stats.tools,
+                })
+
+    # stable assignment: user i -> worker i % workers, users in corpus order
+    lanes = [list(corpus)[i::workers] for i in range(workers)]
+
+    def run_lane(lane):
+        for user in lane:
+            replay_user(user)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(run_lane, lanes))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r["seconds"] for r in results)
+    tools = Counter()
+    for r in results:
+        tools.update(r["tools"])
+    return {
+        "messages": len(results),
+        "wall_seconds": round(wall, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else 0,
+        # nearest rank
+        "p95_ms": round(latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)] * 1000, 1) if latencies else 0,
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0,
+        "input_tokens": sum(r["input_tokens"] for r in results),
+        "output_tokens": sum(r["output_tokens"] for r in results),
+        "tool_calls": sum(tools.values()),
+        "tools": dict(tools.most_common()),
+    }
+
+
+def print_report(label: str, report: Dict[str, Any]) -> None:
+    print(f"== {label}")
+    print(
+        f"messages={report['messages']} wall={report['wall_seconds']}s "
+        f"p50={report['p50_ms']}ms p95={report['p95_ms']}ms max={report['max_ms']}ms"
+    )
+    print(f"tokens in={report['input_tokens']} out={report['output_tokens']} tool_calls={report['tool_calls']}")
+    for tool, count in report["tools"].items():
+        print(f"  {tool:28s} {count}")
+    for name, change in report["mutations"].items():
+        print(f"  {name:20s} +{change['inserted']} ~{change['updated']} -{change['deleted']}")
+
+
+def compare(paths: List[str]) -> None:
+    rows = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            rows.append(json.load(f))
+    keys = ["p50_ms", "p95_ms", "input_tokens", "output_tokens", "tool_calls"]
+    print(f"{'run':24s} " + " ".join(f"{k:>13s}" for k in keys))
+    for row in rows:
+        print(f"{row['label'][:24]:24s} " + " ".join(f"{row[k]:>13}" for k in keys))
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.replay CORPUS [--backend fake] [--real-db]")
+    arg_parser.add_argument("corpus", nargs="?")
+    arg_parser.add_argument("--backend", default=None, help="LLM_BACKEND for this run (openai|ollama|fake)")
+    arg_parser.add_argument(
+        "--real-db", action="store_true",
+        help="replay against MONGODB_URI instead of in-memory mongomock (writes seed data and orders)",
+    )
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--limit", type=int, default=0, help="replay at most N messages")
+    arg_parser.add_argument("--label", default=None)
+    arg_parser.add_argument("--out", default=None, help="write the report as JSON")
+    arg_parser.add_argument("--compare", nargs="+", default=None, help="print saved reports side by side")
+    options = arg_parser.parse_args()
+
+    if options.compare:
+        compare(options.compare)
+        raise SystemExit(0)
+
+    if options.backend:
+        os.environ["LLM_BACKEND"] = options.backend
+    os.environ.setdefault("OPENAI_API_KEY", "sk-replay")
+    os.environ["AGENT_MEMORY_BACKEND"] = "none"
+    if options.real_db:
+        print(f"⚠️ replaying against {os.getenv('MONGODB_URI')}")
+    else:
+        fixtures.use_mongomock()
+    corpus = load_corpus(options.corpus, options.limit)
+    # one seeded user per pseudonym
+    ids = fixtures.seed(n_users=max(50, len(corpus)))
+
+    from pymongo import MongoClient
+
+    from service.agent.llm import FoodOrderingAgentWithUserMemory
+    from service.agent.memoryStore import ConversationBackend, ConversationMemoryStore
+
+    agent = FoodOrderingAgentWithUserMemory(memory_store=ConversationMemoryStore(ConversationBackend()))
+    client = MongoClient(os.getenv("MONGODB_URI"))
+
+    before = snapshot(client)
+    # the agent prints per-message lines; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = replay(agent, corpus, ids, options.workers)
+    report["mutations"] = mutations(before, snapshot(client))
+    report["label"] = options.label or f"{os.getenv('LLM_BACKEND', 'openai')}:{os.getenv('LLM_MODEL', 'default')}"
+
+    print_report(report["label"], report)
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,123 @@
+"""
+Compare tool output size (tokens) and end-to-end latency for TOOL_OUTPUT_FORMAT
+verbose vs compact.
+
+    python -m benchmarks.toolOutput                        # offline mongomock, synthetic data
+    python -m benchmarks.toolOutput --real-db              # seeds + reads MONGODB_URI (writes!)
+    python -m benchmarks.toolOutput --live                 # also run agent.chat per format
+
+--live uses the configured LLM (needs OPENAI_API_KEY) and reports latency and
+prompt tokens per format; agent.chat places real orders, so together with
+--real-db it writes to that database as well.
+"""
+import os
+import statistics
+import time
+from argparse import ArgumentParser
+
+from benchmarks import fixtures
+
+PROMPTS = [
+    "ขอดูเมนูทั้งหมดพร้อมราคา",
+    "มีข้าวผัดอะไรบ้าง",
+    "ออเดอร์ทั้งหมดของฉันมีอะไรบ้าง",
+    "สั่งข้าวกะเพราหมูสับ เพิ่มไข่ดาว ไม่เผ็ด",
+]
+
+
+def tool_cases(ids):
+    from service.agent.tools.recommender import LangChainRecommendationService
+    from service.agent.tools.toolsOrder import LangChainOrderService
+    from service.agent.tools.toolsProduct import LangChainProductService
+    from service.agent.tools.toolsUser import LangChainUsers
+
+    tools = {}
+    order_service = LangChainOrderService()
+    services = (LangChainProductService(), order_service, LangChainUsers(), LangChainRecommendationService())
+    for service in services:
+        tools.update({t.name: t for t in service.get_langchain_tools()})
+
+    user_id, line_id = ids["user_ids"][0], ids["line_ids"][0]
+    order_id = str(ids["order_ids"][0])
+    order_status = order_service.GetOrder(order_id)["status"]
+    return [
+        (tools["list_all_products"], {}),
+        (tools["filter_products_by_status"], {"status": "available"}),
+        (tools["search_products"], {"keyword": "ข้าว"}),
+        (tools["get_product_by_id"], {"product_id": ids["product_ids"][0]}),
+        (tools["find_product_by_name"], {"product_name": fixtures.MENU[0][0]}),
+        (tools["get_user_orders"], {"user_id": user_id}),
+        (tools["get_latest_user_order"], {"user_id": user_id}),
+        (tools["get_orders_by_date_range"], {"start_date": "2000-01-01", "end_date": "2100-01-01"}),
+        (tools["find_user_by_line_id"], {"line_id": line_id}),
+        (tools["find_user_by_email"], {"email": "student0@example.com"}),
+        (tools["list_users_by_role"], {"role": "student"}),
+        # a write that sets the value the doc already has
+        (tools["update_order_status"], {"order_id": order_id, "status": order_status}),
+        (tools["get_recommendations_for_now"], {"user_id": user_id}),
+        (tools["get_trending_items"], {}),
+    ]
+
+
+def compare_tokens(ids):
+    from service.agent.tools.toolFormat import set_output_format
+    from utills.tokens import count_tokens
+
+    print(f"{'tool':28s} {'verbose':>9s} {'compact':>9s} {'saved':>7s}")
+    totals = {"verbose": 0, "compact": 0}
+    for tool, args in tool_cases(ids):
+        counts = {}
+        for fmt in ("verbose", "compact"):
+            set_output_format(fmt)
+            counts[fmt] = count_tokens(str(tool.invoke(args)))
+            totals[fmt] += counts[fmt]
+        saved = 1 - counts["compact"] / counts["verbose"] if counts["verbose"] else 0
+        print(f"{tool.name:28s} {counts['verbose']:9d} {counts['compact']:9d} {saved:7.0%}")
+    print(f"{'TOTAL':28s} {totals['verbose']:9d} {totals['compact']:9d} {1 - totals['compact'] / totals['verbose']:7.0%}")
+
+
+def compare_live(ids, repeats: int):
+    from service.agent.llm import agent_executor
+    from service.agent.toolSelection import llm_tokens
+    from service.agent.tools.toolFormat import set_output_format
+    from service.users.user import Users
+
+    line_id = ids["line_ids"][0]
+    profile = Users().get_user_profile_by_line_id(line_id)
+    agent_executor.response_cache.max_length = 0  # never serve from cache here
+
+    for fmt in ("verbose", "compact"):
+        set_output_format(fmt)
+        before = sum(v for (kind, _), v in llm_tokens.values().items() if kind == "input")
+        durations = []
+        for _ in range(repeats):
+            for prompt in PROMPTS:
+                started = time.perf_counter()
+                agent_executor.chat(prompt, line_id, profile)
+                durations.append(time.perf_counter() - started)
+        after = sum(v for (kind, _), v in llm_tokens.values().items() if kind == "input")
+        print(
+            f"{fmt:8s} runs={len(durations)} p50={statistics.median(durations):.2f}s "
+            f"max={max(durations):.2f}s input_tokens/run={(after - before) / len(durations):.0f}"
+        )
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(usage="python -m benchmarks.toolOutput [--real-db] [--live]")
+    arg_parser.add_argument(
+        "--real-db", action="store_true",
+        help="seed and query MONGODB_URI instead of in-memory mongomock (inserts synthetic users/products/orders)",
+    )
+    arg_parser.add_argument("--live", action="store_true", help="also time agent.chat per format")
+    arg_parser.add_argument("--repeats", type=int, default=1)
+    options = arg_parser.parse_args()
+
+    if options.real_db:
+        print(f"⚠️ seeding synthetic data into {os.getenv('MONGODB_URI')}")
+    else:
+        fixtures.use_mongomock()
+    ids = fixtures.seed()
+
+    compare_tokens(ids)
+    if options.live:
+        compare_live(ids, options.repeats)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from service.agent.llm import agent_executor
+from service.agent.tracing import trace_buffer
+from utills.metrics import REGISTRY
+
+router = APIRouter()
+
+
+# ---------- Routes ----------
+
+# Prometheus metrics
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return REGISTRY.render()
+
+
+# Fast-path router bypass rate
+@router.get("/debug/agent/router")
+def get_router_stats():
+    return agent_executor.intent_router.stats()
+
+
+# Response cache hit rate
+@router.get("/debug/agent/cache")
+def get_cache_stats():
+    return agent_executor.response_cache.stats()
+
+
+# Recent slow / sampled agent runs, slowest first
+@router.get("/debug/agent/traces")
+def get_agent_traces(limit: int = Query(20, ge=1, le=200), min_ms: float = Query(0, ge=0)):
+    return trace_buffer.recent(limit=limit, min_ms=min_ms)
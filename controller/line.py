@@ -1,13 +1,14 @@
+import asyncio
 import datetime
 import json
 import os
 import sys
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from urllib.parse import urlencode, parse_qs
 
 import httpx
 import jwt
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks, Query, Form
+from fastapi import APIRouter, Request, HTTPException, Query, Form
 from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
 from dotenv import load_dotenv
 
@@ -23,8 +24,12 @@ from linebot.v3.messaging import (
 from linebot.v3.webhooks import MessageEvent, TextMessageContent
 from pydantic import BaseModel
 
-from service.agent.llm import agent_executor
+from service.agent.llm import AGENT_DEADLINE, agent_executor
 from service.order.order import OrderService
+from service.events.orderEvents import OrderEvent
+from utills.cancellation import RunControl, current_run, run_control
+from utills.debounce import MessageDebouncer
+from utills.recorder import create_recorder
 from utills.token import Token
 from service.users.user import Users
 
@@ -38,7 +43,27 @@ REDIRECT_URI = os.getenv("REDIRECT_URI", "https://d19b55b1af62.ngrok-free.app/ap
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")  # frontend web app
 SECRET_KEY = os.getenv("SECRET_KEY", "mysecret")
 MONGODB_URI = os.getenv("MONGODB_URI")
+# point these at benchmarks/lineStub.py for local load tests
+LINE_API_HOST = os.getenv("LINE_API_HOST", "https://api.line.me")
+LINE_ACCESS_HOST = os.getenv("LINE_ACCESS_HOST", "https://access.line.me")
 ALGORITHM = "HS256"
+LINE_DEBOUNCE_MS = int(os.getenv("LINE_DEBOUNCE_MS", "1200"))
+# ตอบแทนเมื่อ agent ไม่ทันเวลา (AGENT_DEADLINE_SECONDS)
+AGENT_TIMEOUT_MESSAGE = os.getenv(
+    "AGENT_TIMEOUT_MESSAGE",
+    "⌛ ขออภัยครับ ตอนนี้ระบบตอบช้ากว่าปกติ กรุณาลองส่งข้อความอีกครั้งในอีกสักครู่ "
+    "หรือพิมพ์ 'ออเดอร์ล่าสุด' เพื่อตรวจสอบคำสั่งซื้อ",
+)
+# ไม่ทันเวลาแต่ agent เริ่มบันทึกคำสั่งซื้อไปแล้ว: ห้ามชวนให้ส่งซ้ำ (จะได้ออเดอร์ซ้ำ)
+AGENT_WRITE_TIMEOUT_MESSAGE = os.getenv(
+    "AGENT_WRITE_TIMEOUT_MESSAGE",
+    "⌛ ระบบกำลังบันทึกคำสั่งของคุณอยู่ กรุณาอย่าส่งข้อความเดิมซ้ำ "
+    "พิมพ์ 'ออเดอร์ล่าสุด' ในอีกสักครู่เพื่อตรวจสอบคำสั่งซื้อ",
+)
+# achat() bounds tools, LLM requests and the executor by AGENT_DEADLINE and
+# then answers on its own; the hard timeout is a backstop for a run that
+# still does not come back, so it must not race that deadline
+AGENT_TIMEOUT_MARGIN = float(os.getenv("AGENT_TIMEOUT_MARGIN_SECONDS", "5"))
 
 if not CHANNEL_SECRET or not CHANNEL_ACCESS_TOKEN:
     print("❌ Please set LINE_CHANNEL_SECRET and LINE_CHANNEL_ACCESS_TOKEN in your .env file")
@@ -51,16 +76,29 @@ if not LINE_LOGIN_CHANNEL_ID or not LINE_LOGIN_CHANNEL_SECRET:
 parser = WebhookParser(CHANNEL_SECRET)
 
 line_bot_api: AsyncMessagingApi | None = None
+main_loop: asyncio.AbstractEventLoop | None = None
 router = APIRouter()
 
 token_state = Token(MONGODB_URI)
 usermangement = Users()
 order_service = OrderService()
+# anonymized corpus of incoming text for benchmarks/replay.py (LINE_RECORD_PATH)
+recorder = create_recorder()
 
 class pushMessageType(BaseModel):
     order_id: str
     status: str
 
+
+# Status-specific messages
+ORDER_STATUS_MESSAGES = {
+    "pending": "✅ คำสั่งซื้อของคุณได้รับการยืนยันแล้ว",
+    "making": "👨‍🍳 กำลังเตรียมอาหารของคุณ",
+    "complete": "🎉 อาหารของคุณ ทำเสร็จแล้ว!!",
+    "completed": "🎉 อาหารของคุณ ทำเสร็จแล้ว!!",
+    "cancelled": "❌ คำสั่งซื้อของคุณถูกยกเลิก"
+}
+
 # ---------------------- JWT Utils -------------------------
 
 def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta] = None):
@@ -89,8 +127,9 @@ def verify_token(token: str):
 
 async def init_line_bot():
     """Init LINE bot client"""
-    global line_bot_api
-    config = Configuration(access_token=CHANNEL_ACCESS_TOKEN)
+    global line_bot_api, main_loop
+    main_loop = asyncio.get_running_loop()
+    config = Configuration(access_token=CHANNEL_ACCESS_TOKEN, host=LINE_API_HOST)
     api_client = AsyncApiClient(config)
     line_bot_api = AsyncMessagingApi(api_client)
     
@@ -110,7 +149,7 @@ async def index():
 # ---------------------- LINE Webhook -------------------------
 
 @router.post("/callback")
-async def callback(request: Request, background_tasks: BackgroundTasks):
+async def callback(request: Request):
     if not line_bot_api:
         raise HTTPException(status_code=500, detail="LINE Bot API not initialized")
 
@@ -126,7 +165,7 @@ async def callback(request: Request, background_tasks: BackgroundTasks):
         if isinstance(event, MessageEvent):
             if isinstance(event.message, TextMessageContent):
                 user_id = event.source.user_id
-                user = usermangement.get_user_by_line_id(user_id)
+                user = usermangement.get_user_profile_by_line_id(user_id)
 
                 if not user or not user.get("studentId"):
                     # ยังไม่ login หรือยังไม่ลงทะเบียน
@@ -138,14 +177,16 @@ async def callback(request: Request, background_tasks: BackgroundTasks):
                         )
                     )
                 else:
-                    # ตอบ placeholder ไว้ก่อน
-                    await line_bot_api.reply_message(
-                        ReplyMessageRequest(
-                            reply_token=event.reply_token,
-                            messages=[TextMessage(text="⏳ กำลังคิดคำตอบ...")],
+                    if recorder is not None:
+                        recorder.record(user_id, event.message.text, user.get("role"))
+                    # รวมข้อความที่ส่งมาติดๆ กันเป็นคำขอเดียว ตอบ placeholder เฉพาะข้อความแรก
+                    if message_debouncer.submit(user_id, event.message.text):
+                        await line_bot_api.reply_message(
+                            ReplyMessageRequest(
+                                reply_token=event.reply_token,
+                                messages=[TextMessage(text="⏳ กำลังคิดคำตอบ...")],
+                            )
                         )
-                    )
-                    background_tasks.add_task(process_message, event)
             else:
                 await line_bot_api.reply_message(
                     ReplyMessageRequest(
@@ -156,13 +197,40 @@ async def callback(request: Request, background_tasks: BackgroundTasks):
     return "OK"
 
 
-async def process_message(event: MessageEvent):
+async def process_message(user_id: str, texts: List[str]):
     """ประมวลผล LLM และส่งคำตอบจริงกลับไปหาผู้ใช้"""
     try:
-        user_id = event.source.user_id
-        user_info = usermangement.get_user_by_line_id(user_id) or {}
+        user_info = usermangement.get_user_profile_by_line_id(user_id) or {}
+        message = "\n".join(texts)
 
-        response = agent_executor.chat(event.message.text, user_id, user_info)
+        async def push_progress(text: str):
+            # ข้อความระหว่างทาง ส่งไม่สำเร็จก็ไม่เป็นไร
+            try:
+                await line_bot_api.push_message(
+                    PushMessageRequest(to=user_id, messages=[TextMessage(text=text)])
+                )
+            except Exception as e:
+                print(f"⚠️ progress push failed for {user_id}: {e}")
+
+        # if a newer message supersedes this run the await is cancelled and
+        # nothing more is pushed; past the deadline the run is cancelled and
+        # the user gets the fallback instead of waiting forever. Tool threads
+        # keep running after the cancel, so write tools check the RunControl
+        # (set by the debouncer) before they commit.
+        control = current_run() or RunControl()
+        try:
+            with run_control(control):
+                response = await asyncio.wait_for(
+                    agent_executor.achat(message, user_id, user_info, on_progress=push_progress),
+                    timeout=AGENT_DEADLINE + AGENT_TIMEOUT_MARGIN,
+                )
+        except asyncio.TimeoutError:
+            print(f"⌛ agent deadline ({AGENT_DEADLINE:.0f}s) exceeded for {user_id}")
+            if control.cancel():
+                response = AGENT_TIMEOUT_MESSAGE
+            else:
+                # a write already started and may still commit
+                response = AGENT_WRITE_TIMEOUT_MESSAGE
 
         if isinstance(response, dict):
             response_text = response.get("output") or response.get("content") or str(response)
@@ -178,12 +246,15 @@ async def process_message(event: MessageEvent):
     except Exception as e:
         await line_bot_api.push_message(
             PushMessageRequest(
-                to=event.source.user_id,
+                to=user_id,
                 messages=[TextMessage(text=f"⚠️ เกิดข้อผิดพลาด: {str(e)}")],
             )
         )
 
 
+message_debouncer = MessageDebouncer(process_message, window_ms=LINE_DEBOUNCE_MS)
+
+
 @router.post("/message/push/order-update")
 async def send_order_update_message(
     data: pushMessageType,
@@ -205,15 +276,7 @@ async def send_order_update_message(
         if not user or not user.get("line_user_id"):
             raise HTTPException(status_code=404, detail="User not found or no LINE ID")
         
-        # Create status-specific messages
-        status_messages = {
-            "pending": "✅ คำสั่งซื้อของคุณได้รับการยืนยันแล้ว",
-            "making": "👨‍🍳 กำลังเตรียมอาหารของคุณ",
-            "complete": "🎉 อาหารของคุณ ทำเสร็จแล้ว!!",
-            "cancelled": "❌ คำสั่งซื้อของคุณถูกยกเลิก"
-        }
-        
-        message = custom_message or status_messages.get(data.status, f"สถานะคำสั่งซื้อ: {data.status}")
+        message = custom_message or ORDER_STATUS_MESSAGES.get(data.status, f"สถานะคำสั่งซื้อ: {data.status}")
         message += f"\n\nหมายเลขคำสั่งซื้อ: {data.order_id}"
         
         await bot_api.push_message(
@@ -230,6 +293,54 @@ async def send_order_update_message(
         return HTMLResponse("User not found", status_code=200)
 
 
+def notify_order_status_changes(events: List[OrderEvent]):
+    """
+    Order event bus subscriber: push a LINE message for each status change.
+    Runs on the bus worker thread; pushes are scheduled on the app event loop.
+    """
+    if line_bot_api is None or main_loop is None:
+        return
+
+    # only the latest status per order matters within a batch
+    latest: Dict[str, str] = {}
+    for event in events:
+        if event.get("type") == "created":
+            continue  # the agent already confirmed the order in its reply
+        if event["status"] in ORDER_STATUS_MESSAGES:
+            latest[event["order_id"]] = event["status"]
+    if not latest:
+        return
+
+    orders = order_service.GetOrders(list(latest))
+    for order in orders:
+        order_id = str(order["_id"])
+        user = usermangement.get_user_by_user_id(order.get("userId"))
+        if not user or not user.get("line_user_id"):
+            continue
+
+        message = ORDER_STATUS_MESSAGES[latest[order_id]] + f"\n\nหมายเลขคำสั่งซื้อ: {order_id}"
+        future = asyncio.run_coroutine_threadsafe(
+            line_bot_api.push_message(
+                PushMessageRequest(
+                    to=user["line_user_id"],
+                    messages=[TextMessage(text=message)],
+                )
+            ),
+            main_loop,
+        )
+        future.add_done_callback(_log_push_failure)
+
+
+def _log_push_failure(future):
+    # exception() raises CancelledError on a cancelled future (loop shutting down)
+    if future.cancelled():
+        print("⚠️ order status push cancelled")
+        return
+    error = future.exception()
+    if error:
+        print(f"❌ order status push failed: {error}")
+
+
 # ----------------------------- Authentication -----------------------------------
 
 @router.get("/auth/line")
@@ -251,7 +362,7 @@ async def line_oauth_login(request: Request, origin: str = "chat", user_id: Opti
         "scope": "profile openid email",
     }
 
-    auth_url = f"https://access.line.me/oauth2/v2.1/authorize?{urlencode(params)}"
+    auth_url = f"{LINE_ACCESS_HOST}/oauth2/v2.1/authorize?{urlencode(params)}"
     return RedirectResponse(url=auth_url)
 
 @router.get("/auth/callback")
@@ -268,8 +379,8 @@ async def line_oauth_callback(
     if not code or not state:
         raise HTTPException(status_code=400, detail="Missing code or state")
 
-    # ตรวจสอบ state
-    state_data = token_state.get_oauth_state(state)
+    # ตรวจสอบ state: ตรวจ+ลบในครั้งเดียว (code ของ LINE ก็ใช้ได้ครั้งเดียวอยู่แล้ว)
+    state_data = token_state.consume_oauth_state(state)
     if not state_data:
         raise HTTPException(status_code=400, detail="Invalid state token")
 
@@ -442,7 +553,7 @@ async def get_current_user(request: Request, token: str = Query(...)):
     if not line_user_id:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    user = usermangement.get_user_by_line_id(line_user_id)
+    user = usermangement.get_user_profile_by_line_id(line_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -465,7 +576,7 @@ async def get_current_user(request: Request, token: str = Query(...)):
 async def exchange_code_for_token(code: str) -> Dict[str, Any]:
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            "https://api.line.me/oauth2/v2.1/token",
+            f"{LINE_API_HOST}/oauth2/v2.1/token",
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             data={
                 "grant_type": "authorization_code",
@@ -483,7 +594,7 @@ async def exchange_code_for_token(code: str) -> Dict[str, Any]:
 async def get_line_user_profile(access_token: str) -> Dict[str, Any]:
     async with httpx.AsyncClient() as client:
         response = await client.get(
-            "https://api.line.me/v2/profile",
+            f"{LINE_API_HOST}/v2/profile",
             headers={"Authorization": f"Bearer {access_token}"},
         )
         if response.status_code != 200:
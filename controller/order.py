@@ -1,41 +1,19 @@
 import os
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from model.orderSchema import OrderCreate, OrderUpdate
 from service.order.order import OrderService
+from service.events.subscribers import kitchen_feed, status_rollup
 from dotenv import load_dotenv
 
-
-from linebot.v3.messaging import (
-    TextMessage,
-    PushMessageRequest,
-    AsyncMessagingApi,
-    Configuration,
-    AsyncApiClient
-)
-
-from service.users.user import Users
-
-CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
-
-line_bot_api: AsyncMessagingApi | None = None
-
-async def init_line_bot():
-    """Init LINE bot client"""
-    global line_bot_api
-    config = Configuration(access_token=CHANNEL_ACCESS_TOKEN)
-    api_client = AsyncApiClient(config)
-    line_bot_api = AsyncMessagingApi(api_client)
-
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 
 router = APIRouter()
 order_service = OrderService()
 
-usermanagement = Users()
-
 # ---------- Pydantic Schemas ----------
 
 # ---------- Routes ----------
@@ -47,6 +25,18 @@ def create_order(order: OrderCreate):
     return {"order_id": order_id}
 
 
+# Kitchen feed (recent status changes from the order event bus)
+@router.get("/order/feed")
+def get_order_feed(since: Optional[datetime] = Query(default=None)):
+    return {"events": kitchen_feed.recent(since)}
+
+
+# Status change counts per day
+@router.get("/order/stats/status")
+def get_order_status_stats():
+    return {"days": status_rollup.snapshot()}
+
+
 # Get order by ID
 @router.get("/order/{order_id}")
 def get_order(order_id: str):
@@ -89,21 +79,8 @@ def get_orders_by_status(status: str):
 async def update_order(order_id: str, order: OrderUpdate):
     modified_count = 0
     if order.status is not None:
+        # LINE notification is sent by the order event bus subscriber
         modified_count += order_service.UpdateOrderStatus(order_id, order.status)
-        
-        # user_line_id = usermanagement.get_user_by_user_id(order.userId)
-        # print(user_line_id)
-        
-        # if (user_line_id["line_user_id"]):
-        #     if (order.status == "complete"):
-        #         print("pass")
-        #         print(user_line_id["line_user_id"])
-        #         await line_bot_api.push_message(
-        #             PushMessageRequest(
-        #                 to=user_line_id["line_user_id"],
-        #                 messages=[TextMessage(text="อาหารของคุณ ทำเสร็จแล้ว!!")],
-        #             )
-        #         )
     if order.addon is not None:
         modified_count += order_service.UpdateOrderAddon(order_id, order.addon)
 
@@ -129,4 +106,3 @@ def delete_order(order_id: str):
         raise HTTPException(status_code=404, detail="Order not found")
     return {"deleted_count": deleted_count}
 
-init_line_bot()
\ No newline at end of file
@@ -61,6 +61,16 @@ def get_all_products(
     return {"products": products}
 
 
+# Closest products to a free-text dish name (local vector index)
+@router.get("/product/similar")
+def get_similar_products(
+    q: str = Query(..., min_length=1),
+    k: int = Query(default=5, ge=1, le=50),
+    status: str | None = Query(default=None),
+):
+    return product_service.FindSimilarProducts(q, k=k, status=status)
+
+
 # Get products by status
 @router.get("/product/status/{status}")
 def get_products_by_status(status: str):
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from service.agent.llm import agent_executor
+
+router = APIRouter()
+
+
+# ---------- Routes ----------
+
+# Available products for a user right now (collaborative filtering + time-of-day re-ranking)
+@router.get("/recommendations/{user_id}")
+def get_recommendations(user_id: str, n: int = Query(5, ge=1, le=20)):
+    reranker = agent_executor.recommendation_service.reranker
+    if reranker is None:
+        raise HTTPException(status_code=503, detail="Recommendations need RECOMMENDER_BACKEND=local")
+    return {"user_id": user_id, "items": reranker.recommend(user_id, n)}
@@ -6,23 +6,42 @@ from argparse import ArgumentParser
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
+from controller import agent
 from controller import line 
 from controller import order
 from controller import product
+from controller import recommendation
+from service.events.orderEvents import ORDER_EVENT_SOURCE, order_event_bus, watch_order_changes
+from service.events.subscribers import kitchen_feed, status_rollup
+from service.recommendation.batch import start_batch_scheduler
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await line.init_line_bot()
     print("✅ LINE Bot API initialized")
+
+    order_event_bus.subscribe(line.notify_order_status_changes)
+    order_event_bus.subscribe(kitchen_feed.handle)
+    order_event_bus.subscribe(status_rollup.handle)
+    order_event_bus.start()
+    if ORDER_EVENT_SOURCE == "change_stream":
+        watch_order_changes(order.order_service.collection, order_event_bus)
+    print(f"✅ Order event bus started (source: {ORDER_EVENT_SOURCE})")
+    if agent.agent_executor.recommendation_service.store is not None:
+        start_batch_scheduler()
     yield
     # Shutdown
+    order_event_bus.stop()
+    await agent.agent_executor.recommendation_service.aclose()
     print("🛑 Shutting down LINE Bot API")
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(line.router)
+app.include_router(agent.router)
 app.include_router(order.router)
 app.include_router(product.router)
+app.include_router(recommendation.router)
 
 origins = [
     "http://localhost:3000",
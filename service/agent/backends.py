@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+from utills.deadline import remaining
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+
+def _cap_timeout(request: httpx.Request) -> None:
+    """
+    httpx request hook: no LLM request (nor a retry of one) may outlive the
+    current request deadline, whatever the client's own timeout is
+    """
+    budget = max(remaining(LLM_TIMEOUT), 0.01)
+    timeout = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {
+        key: budget if value is None else min(value, budget)
+        for key, value in {**httpx.Timeout(LLM_TIMEOUT).as_dict(), **timeout}.items()
+    }
+
+
+async def _acap_timeout(request: httpx.Request) -> None:
+    _cap_timeout(request)
+
+
+# "_id" of the customer profile rendered into the prompt (dict or JSON)
+_PROFILE_ID = re.compile(r"""["']_id["']\s*:\s*["']([0-9a-f]{24})["']""")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Offline chat model that replays recorded tool-call sequences.
+
+    A script is {"match": "<substring of the user message>", "steps": [...]};
+    each step is {"tool_calls": [{"name": ..., "args": {...}}]} or
+    {"content": "..."}. The step is picked from the number of model turns
+    since the last human message, so one instance is stateless and can serve
+    concurrent runs. String args may use {placeholders}: {user_id} comes from
+    the customer profile in the prompt, anything else from `context`. The
+    first script without "match" is the default.
+    """
+
+    scripts: List[Dict[str, Any]] = Field(default_factory=list)
+    latency: float = 0.0
+    context: Dict[str, str] = Field(default_factory=dict)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ScriptedChatModel":
+        with open(path, encoding="utf-8") as f:
+            return cls(scripts=json.load(f), **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _pick(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        text = str(messages[last_human].content) if last_human >= 0 else ""
+        # one tool batch = one AIMessage with tool_calls followed by its ToolMessages
+        turn = sum(
+            1 for m in messages[last_human + 1:]
+            if isinstance(m, AIMessage) and m.tool_calls
+        )
+
+        script = next((s for s in self.scripts if s.get("match") and s["match"] in text), None)
+        if script is None:
+            script = next((s for s in self.scripts if not s.get("match")), {"steps": [{"content": "โอเคครับ"}]})
+        steps = script["steps"]
+        return steps[min(turn, len(steps) - 1)]
+
+    def _values(self, messages: List[BaseMessage]) -> Dict[str, str]:
+        values = dict(self.context)
+        for m in messages:
+            if m.type == "system" and "Customer profile" in str(m.content):
+                found = _PROFILE_ID.search(str(m.content))
+                if found:
+                    values["user_id"] = found.group(1)
+        return values
+
+    def _fill(self, value: Any, values: Dict[str, str]) -> Any:
+        if isinstance(value, str):
+            return re.sub(r"\{(\w+)\}", lambda m: str(values.get(m.group(1), m.group(0))), value)
+        if isinstance(value, dict):
+            return {k: self._fill(v, values) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._fill(v, values) for v in value]
+        return value
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        step = self._pick(messages)
+        values = self._values(messages)
+        tool_calls = [
+            {
+                "name": call["name"],
+                "args": self._fill(call.get("args", {}), values),
+                "id": f"call_{i}_{time.monotonic_ns()}",
+            }
+            for i, call in enumerate(step.get("tool_calls", []))
+        ]
+        message = AIMessage(content=self._fill(step.get("content", ""), values), tool_calls=tool_calls)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+def create_llm(backend: Optional[str] = None, model: Optional[str] = None) -> BaseChatModel:
+    """
+    Chat model from LLM_* environment variables:
+      LLM_BACKEND       openai (default) | ollama | fake
+      LLM_MODEL         model name (gpt-5 / mistral-nemo); `model` overrides it
+      OLLAMA_BASE_URL   for ollama
+      LLM_FAKE_SCRIPT   JSON scripts for fake (default benchmarks/agentScripts.json)
+      LLM_FAKE_LATENCY_MS
+      LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES   per request (openai / ollama),
+                        each attempt also capped by the request deadline
+    """
+    backend = backend or os.getenv("LLM_BACKEND", "openai")
+
+    if backend == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=model or os.getenv("LLM_MODEL", "gpt-5"),
+            temperature=0,
+            streaming=False,
+            callbacks=[],
+            # a hung request must fail well inside the agent deadline
+            request_timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES,
+            http_client=httpx.Client(event_hooks={"request": [_cap_timeout]}),
+            http_async_client=httpx.AsyncClient(event_hooks={"request": [_acap_timeout]}),
+        )
+
+    if backend == "ollama":
+        from langchain_ollama import ChatOllama
+
+        return ChatOllama(
+            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            model=model or os.getenv("LLM_MODEL", "mistral-nemo"),
+            validate_model_on_init=True,
+            temperature=0,
+            client_kwargs={"timeout": LLM_TIMEOUT},
+            sync_client_kwargs={"event_hooks": {"request": [_cap_timeout]}},
+            async_client_kwargs={"event_hooks": {"request": [_acap_timeout]}},
+        )
+
+    if backend == "fake":
+        return ScriptedChatModel.from_file(
+            os.getenv("LLM_FAKE_SCRIPT", os.path.join("benchmarks", "agentScripts.json")),
+            latency=float(os.getenv("LLM_FAKE_LATENCY_MS", "0")) / 1000,
+        )
+
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
@@ -0,0 +1,221 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage
+
+from service.order.order import OrderService
+from service.product.product import ProductService
+from utills.metrics import REGISTRY
+from utills.textVector import embed, embed_many, normalize
+
+router_messages = REGISTRY.counter(
+    "agent_router_messages_total",
+    "Messages seen by the fast-path intent router, by route and intent",
+    ["route", "intent"],
+)
+
+CANCEL_CONFIRM_WORD = "ยืนยันยกเลิก"
+_CANCEL_PROMPT_MARK = f"พิมพ์ '{CANCEL_CONFIRM_WORD}'"
+# the prompt names the exact order, so a confirmation can't hit a newer one
+_CANCEL_PROMPT_ORDER = re.compile(re.escape(_CANCEL_PROMPT_MARK) + r" เพื่อยืนยันยกเลิกออเดอร์ ([0-9a-fA-F]{24})")
+
+STATUS_TEXT = {
+    "pending": "รอดำเนินการ",
+    "making": "กำลังทำ",
+    "complete": "เสร็จแล้ว",
+    "completed": "เสร็จแล้ว",
+    "cancelled": "ยกเลิกแล้ว",
+}
+
+# intent -> (keywords, exemplar phrases); a message must hit a keyword AND be
+# close to an exemplar, or be almost identical to one
+INTENTS: Dict[str, Tuple[List[str], List[str]]] = {
+    "menu": (
+        ["เมนู", "มีอะไรกิน", "มีอะไรบ้าง", "menu"],
+        ["เมนูวันนี้", "วันนี้มีอะไรกินบ้าง", "ขอดูเมนู", "มีเมนูอะไรบ้าง", "เมนูมีอะไรบ้าง", "menu"],
+    ),
+    "latest_order": (
+        ["ออเดอร์", "คำสั่งซื้อ", "order"],
+        ["ออเดอร์ล่าสุดของฉัน", "ออเดอร์ล่าสุด", "สถานะออเดอร์", "ออเดอร์ถึงไหนแล้ว", "เช็คสถานะออเดอร์", "อาหารเสร็จยัง"],
+    ),
+    "pending_orders": (
+        ["ออเดอร์", "คำสั่งซื้อ"],
+        ["ออเดอร์ที่ยังไม่เสร็จ", "ออเดอร์ที่รออยู่", "ออเดอร์ค้าง"],
+    ),
+    "cancel_order": (
+        ["ยกเลิก"],
+        ["ยกเลิกออเดอร์", "ยกเลิกออเดอร์ล่าสุด", "ขอยกเลิกออเดอร์", "ยกเลิกคำสั่งซื้อ"],
+    ),
+}
+
+
+class IntentRouter:
+    """
+    Deterministic fast path in front of the agent.
+
+    Simple, high-confidence requests (menu, latest order, cancel) are answered
+    straight from the services with templated Thai replies. Anything long,
+    anything that mentions ids/numbers, or anything that isn't a confident
+    match returns None so the caller falls back to the LLM agent.
+    """
+
+    def __init__(
+        self,
+        order_service: OrderService,
+        product_service: ProductService,
+        max_length: int = 40,
+        keyword_threshold: float = 0.45,
+        exact_threshold: float = 0.85,
+    ):
+        self.order_service = order_service
+        self.product_service = product_service
+        self.max_length = max_length
+        self.keyword_threshold = keyword_threshold
+        self.exact_threshold = exact_threshold
+
+        self._intent_names: List[str] = []
+        phrases: List[str] = []
+        for intent, (_, exemplars) in INTENTS.items():
+            for phrase in exemplars:
+                self._intent_names.append(intent)
+                phrases.append(normalize(phrase))
+        self._exemplars = embed_many(phrases)
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any], List[BaseMessage]], Optional[str]]] = {
+            "menu": self._reply_menu,
+            "latest_order": self._reply_latest_order,
+            "pending_orders": self._reply_pending_orders,
+            "cancel_order": self._reply_cancel_prompt,
+            "confirm_cancel": self._reply_confirm_cancel,
+        }
+
+    # ---------- Classification ----------
+    def classify(self, message: str) -> Tuple[Optional[str], float]:
+        """Return (intent, confidence) or (None, best score)"""
+        text = normalize(message)
+        if not text or len(text) > self.max_length:
+            return None, 0.0
+        if text == CANCEL_CONFIRM_WORD:
+            return "confirm_cancel", 1.0
+        # specific ids, quantities, prices -> let the agent handle it
+        if re.search(r"\d", text):
+            return None, 0.0
+
+        scores = self._exemplars @ embed(text)
+        best = int(np.argmax(scores))
+        intent, score = self._intent_names[best], float(scores[best])
+        keywords = INTENTS[intent][0]
+
+        if score >= self.exact_threshold:
+            return intent, score
+        if score >= self.keyword_threshold and any(k in text for k in keywords):
+            return intent, score
+        return None, score
+
+    def route(self, message: str, user_info: Any, history: List[BaseMessage]) -> Optional[str]:
+        """Templated reply for a confident intent, or None to fall back to the agent"""
+        intent, _ = self.classify(message)
+        reply = None
+        if intent:
+            profile = user_info if isinstance(user_info, dict) else {}
+            try:
+                reply = self._handlers[intent](profile, history)
+            except Exception as e:
+                print(f"⚠️ fast path '{intent}' failed, falling back to agent: {e}")
+                reply = None
+
+        if reply is None:
+            router_messages.inc(route="agent", intent=intent or "none")
+        else:
+            router_messages.inc(route="fast", intent=intent)
+        return reply
+
+    def stats(self) -> Dict[str, Any]:
+        values = router_messages.values()
+        total = sum(values.values())
+        fast = sum(v for (route, _), v in values.items() if route == "fast")
+        by_intent: Dict[str, float] = {}
+        for (route, intent), v in values.items():
+            if route == "fast":
+                by_intent[intent] = by_intent.get(intent, 0) + v
+        return {
+            "total": total,
+            "bypassed": fast,
+            "bypass_rate": fast / total if total else 0.0,
+            "by_intent": by_intent,
+        }
+
+    # ---------- Handlers ----------
+    def _reply_menu(self, profile: Dict[str, Any], history: List[BaseMessage]) -> Optional[str]:
+        products = self.product_service.GetProductsByStatus("available")
+        if not products:
+            return "😢 ตอนนี้ยังไม่มีเมนูที่พร้อมขายครับ"
+        lines = [f"📋 เมนูวันนี้ ({len(products)} รายการ)"]
+        for p in products[:30]:
+            lines.append(f"• {p['product_name']} - {p['price']:.0f} บาท")
+        if len(products) > 30:
+            lines.append(f"... และอีก {len(products) - 30} รายการ")
+        lines.append("\nพิมพ์ชื่อเมนูที่ต้องการสั่งได้เลยครับ 😊")
+        return "\n".join(lines)
+
+    def _reply_latest_order(self, profile: Dict[str, Any], history: List[BaseMessage]) -> Optional[str]:
+        user_id = profile.get("_id")
+        if not user_id:
+            return None
+        order = self.order_service.GetLatestUserOrder(str(user_id))
+        if not order:
+            return "📝 คุณยังไม่มีออเดอร์ครับ"
+        return "🕒 ออเดอร์ล่าสุดของคุณ\n" + self._format_order(order)
+
+    def _reply_pending_orders(self, profile: Dict[str, Any], history: List[BaseMessage]) -> Optional[str]:
+        user_id = profile.get("_id")
+        if not user_id:
+            return None
+        orders = self.order_service.GetUserOrdersByStatus(str(user_id), "pending")
+        if not orders:
+            return "✅ ไม่มีออเดอร์ที่รอดำเนินการครับ"
+        return f"⏳ ออเดอร์ที่รอดำเนินการ ({len(orders)} รายการ)\n" + "\n\n".join(
+            self._format_order(o) for o in orders[:10]
+        )
+
+    def _reply_cancel_prompt(self, profile: Dict[str, Any], history: List[BaseMessage]) -> Optional[str]:
+        user_id = profile.get("_id")
+        if not user_id:
+            return None
+        order = self.order_service.GetLatestUserOrder(str(user_id))
+        if not order or order.get("status") != "pending":
+            return "📝 ไม่มีออเดอร์ที่ยกเลิกได้ครับ (ยกเลิกได้เฉพาะออเดอร์ที่รอดำเนินการ)"
+        return (
+            "❓ ต้องการยกเลิกออเดอร์นี้ใช่ไหมครับ\n"
+            + self._format_order(order)
+            + f"\n\n{_CANCEL_PROMPT_MARK} เพื่อยืนยันยกเลิกออเดอร์ {order['_id']}"
+        )
+
+    def _reply_confirm_cancel(self, profile: Dict[str, Any], history: List[BaseMessage]) -> Optional[str]:
+        user_id = profile.get("_id")
+        last_ai = next((m for m in reversed(history) if isinstance(m, AIMessage)), None)
+        # only act on a confirmation of our own prompt
+        match = _CANCEL_PROMPT_ORDER.search(str(last_ai.content)) if last_ai else None
+        if not user_id or not match:
+            return None
+        order = self.order_service.GetOrder(match.group(1))
+        if not order or str(order.get("userId")) != str(user_id) or order.get("status") != "pending":
+            return "📝 ไม่มีออเดอร์ที่ยกเลิกได้ครับ"
+        if self.order_service.CancelOrder(str(order["_id"])):
+            return f"❌ ยกเลิกออเดอร์ {order['product_name']} เรียบร้อยแล้วครับ"
+        return "⚠️ ยกเลิกออเดอร์ไม่สำเร็จ กรุณาลองใหม่อีกครั้งครับ"
+
+    @staticmethod
+    def _format_order(order: Dict[str, Any]) -> str:
+        addon = order.get("addon") or []
+        lines = [
+            f"🍽️ {order.get('product_name')} - {order.get('price', 0):.0f} บาท",
+            f"สถานะ: {STATUS_TEXT.get(order.get('status'), order.get('status'))}",
+        ]
+        if addon:
+            lines.append(f"เพิ่ม: {', '.join(map(str, addon))}")
+        if order.get("description"):
+            lines.append(f"หมายเหตุ: {order['description']}")
+        lines.append(f"หมายเลข: {order['_id']}")
+        return "\n".join(lines)
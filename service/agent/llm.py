@@ -1,40 +1,47 @@
+import asyncio
+import os
+import threading
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
 from langchain.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
+from langchain.tools import BaseTool
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI, OpenAI
+from service.agent.modelRouting import ModelRouter, route_messages
+from service.agent.intentRouter import IntentRouter
+from service.agent.responseCache import ResponseCache
+from service.agent.toolSelection import progress_message, select_tools, tool_schema_tokens
+from service.agent.tracing import AgentTracer
+from utills.deadline import deadline, expired, remaining
+from service.agent.tools.asyncTools import with_async
+from service.agent.tools.toolCache import tool_cache
+from service.agent.tools.toolFormat import compact_mode, key_legend
+from service.agent.memoryStore import ConversationMemoryStore, create_memory_store
 from service.agent.tools.recommender import LangChainRecommendationService
 from service.agent.tools.toolsOrder import LangChainOrderService
 from service.agent.tools.toolsProduct import LangChainProductService
 from service.agent.tools.toolsUser import LangChainUsers
 
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "false").lower() in ("1", "true", "yes")
+# end-to-end budget for one message: tool timeouts, LLM requests
+# (backends.py), the executor's max_execution_time and escalation respect it
+AGENT_DEADLINE = float(os.getenv("AGENT_DEADLINE_SECONDS", "45"))
+# the stream ended without a final answer
+AGENT_NO_OUTPUT_MESSAGE = os.getenv(
+    "AGENT_NO_OUTPUT_MESSAGE", "ขออภัยค่ะ ระบบไม่สามารถตอบกลับได้ในขณะนี้ กรุณาลองใหม่อีกครั้ง"
+)
+
+
 class FoodOrderingAgentWithUserMemory:
-    def __init__(self):
-        # self.llm = ChatOllama(
-        #     base_url="http://localhost:11434",
-        #     model="mistral-nemo",
-        #     validate_model_on_init=True,
-        #     temperature=0,
-        # )
-        
-        self.llm = ChatOpenAI(
-            model="gpt-5",
-            temperature=0,
-            streaming=False,
-            callbacks=[]
-        )
-        
-        # เก็บ memory แยกตาม user_id
-        self.user_memories = {}
+    def __init__(self, llm=None, memory_store: ConversationMemoryStore = None):
+        # LLM_BACKEND=openai|ollama|fake (see service/agent/backends.py);
+        # short simple turns go to a small model, the rest to the large one
+        self.model_router = ModelRouter(llm)
+        self.llm = self.model_router.routes["large"].llm
         
-        self.memory = ConversationBufferWindowMemory(
-            k=10,  # เก็บ 10 รอบการสนทนาล่าสุด
-            memory_key="chat_history",
-            return_messages=True,
-            input_key="message",
-            output_key="output"
-        )
+        # เก็บ memory แยกตาม user_id (จำกัดขนาด + บันทึกลง Mongo/disk)
+        # บทสนทนาเก่าถูกย่อเป็น summary ใน background หลังตอบแล้ว
+        self.memory_store = memory_store or create_memory_store(summarizer=self.summarize_history)
         
         # ออกแบบ Prompt (ปรับปรุงให้รองรับ memory)
         self.prompt_template = ChatPromptTemplate.from_messages([
@@ -42,7 +49,8 @@ class FoodOrderingAgentWithUserMemory:
              "You are an intelligent food ordering assistant for a restaurant platform. "
              "Your role is to help users and staff manage orders, menu items, and delivery.\n"
              "If user add addon, Additional items cost 10 baht each.\n"
-             "If food order doesn't appaer in product database. get all order and find similarity product instead\n"
+             "If food order doesn't appaer in product database, use find_similar_products to get the closest menu items instead of listing all products\n"
+             "When a customer asks what to eat or for a recommendation, use get_recommendations_for_now (only available items, fitted to the time of day)\n"
              "If it is a description such as less spicy, more spicy, less rice, more rice, don't want more cucumber, these are descriptions. But if adding fried eggs, adding pork, adding chicken is considered an addon.\n"
              "You should anwser with Thai language because customer base are from Thailand.\n\n"
              
@@ -92,7 +100,8 @@ class FoodOrderingAgentWithUserMemory:
              "- Cancel an order due to unavailability\n"
              "- List orders within a specific date range\n"
              "- Update order status as preparation progresses\n\n"
-             "Use the descriptions of the tools to select the correct one for each task."),
+             "Use the descriptions of the tools to select the correct one for each task."
+             + (f"\n{key_legend()}" if compact_mode() else "")),
             
             ("system", "Example 1: \n"),
             ("human", "I want to order a Margherita Pizza with extra cheese"),
@@ -149,67 +158,233 @@ class FoodOrderingAgentWithUserMemory:
         self.order_service = LangChainOrderService()
         self.product_service = LangChainProductService()
         self.user_service = LangChainUsers()
-        self.recommendation_service = LangChainRecommendationService(api_base_url="http://127.0.0.1:8080")
+        self.recommendation_service = LangChainRecommendationService()  # RECOMMENDER_BACKEND
+        
+        # ตอบคำถามง่ายๆ ตรงจาก service โดยไม่ต้องเรียก LLM
+        self.intent_router = IntentRouter(self.order_service, self.product_service)
+        # คำตอบของคำถามทั่วไปเกี่ยวกับเมนู (ไม่ผูกกับผู้ใช้) ใช้ซ้ำได้จนกว่าสินค้าจะเปลี่ยน
+        self.response_cache = ResponseCache(self.product_service)
         
-        # Get tools
-        self.tools = (
+        # Get tools (sync func + async coroutine, for chat and achat)
+        self.tools = with_async(
             self.order_service.get_langchain_tools() +
             self.product_service.get_langchain_tools() +
             self.user_service.get_langchain_tools() + 
             self.recommendation_service.get_langchain_tools()
         )
         
-        # Build the agent
-        self.agent = create_tool_calling_agent(self.llm, self.tools, self.prompt_template)
+        # One executor per (model route, tool set), each built once: tool
+        # schemas are converted and bound to the model there, not per message
+        self._executors: Dict[Tuple[str, FrozenSet[str]], AgentExecutor] = {}
+        self._executors_lock = threading.Lock()
+        self.schema_tokens: Dict[FrozenSet[str], int] = {}
         
-        # Wrap it in an executor with memory
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            max_iterations=5,
-            early_stopping_method="force",
-            return_intermediate_steps=True
-        )
-        # ... (setup เดียวกัน)
+        self.agent_executor = self.get_executor(self.tools)
+        self.agent = self.agent_executor.agent
     
-    def get_or_create_memory(self, user_id: str):
-        """สร้างหรือดึง memory สำหรับผู้ใช้คนนี้"""
-        if user_id not in self.user_memories:
-            self.user_memories[user_id] = ConversationBufferWindowMemory(
-                k=10,
-                memory_key="chat_history",
-                return_messages=True,
-                input_key="message",
-                output_key="output"
-            )
-        return self.user_memories[user_id]
+    def summarize_history(self, summary: str, messages: List[BaseMessage], max_tokens: int) -> str:
+        """Fold older turns into the running summary (called off the reply path)"""
+        transcript = "\n".join(
+            f"{'Customer' if m.type == 'human' else 'Assistant'}: {m.content}" for m in messages
+        )
+        response = self.llm.invoke([
+            SystemMessage(content=(
+                "Update the running summary of a conversation between a customer and a food ordering assistant. "
+                "Keep facts needed later: order ids, items, addons, quantities, order status, preferences and "
+                "open questions. Drop greetings and menu listings. Write in Thai, "
+                f"at most {max_tokens} tokens. Reply with the summary only."
+            )),
+            HumanMessage(content=f"Current summary:\n{summary or '-'}\n\nNew messages:\n{transcript}"),
+        ])
+        return str(response.content)
+
+    def get_executor(self, tools: List[BaseTool], route: str = "large") -> AgentExecutor:
+        """Cached executor for this model route and exact tool set"""
+        names = frozenset(t.name for t in tools)
+        key = (route, names)
+        executor = self._executors.get(key)
+        if executor is None:
+            with self._executors_lock:
+                executor = self._executors.get(key)
+                if executor is None:
+                    # Shared executor without memory; each user's history is
+                    # passed in as chat_history on every invocation
+                    model_route = self.model_router.routes[route]
+                    executor = AgentExecutor(
+                        agent=create_tool_calling_agent(model_route.llm, tools, self.prompt_template),
+                        tools=tools,
+                        # per-step detail is in the traces (/debug/agent/traces)
+                        verbose=AGENT_VERBOSE,
+                        max_iterations=model_route.max_iterations,
+                        max_execution_time=model_route.timeout,
+                        early_stopping_method="force",
+                        return_intermediate_steps=True
+                    )
+                    if names not in self.schema_tokens:
+                        self.schema_tokens[names] = tool_schema_tokens(tools)
+                    self._executors[key] = executor
+        return executor
     
-    def chat(self, message: str, user_id: str, user_info: str = "{}"):
+    @staticmethod
+    def _bounded(run) -> AgentExecutor:
+        """
+        The run's executor with max_execution_time cut to what is left of the
+        deadline (the cached executor is shared, so this is a shallow copy)
+        """
+        executor = run["executor"]
+        budget = remaining(executor.max_execution_time or AGENT_DEADLINE)
+        return executor.model_copy(update={"max_execution_time": budget})
+
+    def _prepare(self, message: str, user_id: str, user_info):
+        """
+        Everything before the LLM call. Returns (reply, None) when the message
+        is answered without the agent, otherwise (None, run) with the executor,
+        its inputs and the tracer.
+        """
         if not message or not message.strip():
-            return "⚠️ คุณต้องพิมพ์ข้อความก่อนครับ"
-
-        memory = self.get_or_create_memory(user_id)
-
-        agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            memory=memory,
-            verbose=True,
-            max_iterations=10,
-            early_stopping_method="force",
-            return_intermediate_steps=True
+            return "⚠️ คุณต้องพิมพ์ข้อความก่อนครับ", None
+
+        message = message.strip()
+        history = self.memory_store.history(user_id)
+
+        fast_reply = self.intent_router.route(message, user_info, history)
+        if fast_reply is not None:
+            self.memory_store.append_turn(user_id, message, fast_reply)
+            return fast_reply, None
+
+        cached_reply = self.response_cache.lookup(message, history)
+        if cached_reply is not None:
+            self.memory_store.append_turn(user_id, message, cached_reply)
+            return cached_reply, None
+
+        # เลือกเฉพาะ tools ที่ role นี้ใช้ได้และเกี่ยวกับข้อความนี้ -> prompt สั้นลง
+        toolset, tools = select_tools(self.tools, user_info, message)
+        route = self.model_router.choose(toolset, message, history)
+        route_tools = self.model_router.tools_for(route, tools)
+        run = {
+            "message": message,
+            "user_id": user_id,
+            "user_info": user_info,
+            "toolset": toolset,
+            "selected_tools": tools,
+            "tools": route_tools,
+            "route": route,
+            "executor": self.get_executor(route_tools, route),
+            "tracer": AgentTracer(toolset, user_id, message, route=route),
+            "inputs": {"message": message, "user_info": user_info, "chat_history": history},
+        }
+        return None, run
+
+    def _escalate(self, run, outcome: str):
+        """Close the small-route attempt and rerun the same turn on the large model"""
+        run["tracer"].finish(outcome)
+        route_messages.inc(route="small", outcome="escalated")
+        print(f"⬆️ [{run['toolset']}] small model {outcome}, retrying on large model")
+        return {
+            **run,
+            "route": "large",
+            "tools": run["selected_tools"],
+            "executor": self.get_executor(run["selected_tools"], "large"),
+            "tracer": AgentTracer(run["toolset"], run["user_id"], run["message"], route="large"),
+        }
+
+    def _finish(self, run, user_id: str, output: str, tools_used: List[str]) -> str:
+        trace = run["tracer"].finish()
+        route_messages.inc(route=run["route"], outcome="ok")
+        print(
+            f"🔢 [{run['toolset']}/{run['route']}] tools={len(run['tools'])} "
+            f"schema≈{self.schema_tokens[frozenset(t.name for t in run['tools'])]} "
+            f"input={trace['input_tokens']} output={trace['output_tokens']} "
+            f"iterations={trace['iterations']} {trace['duration_ms']:.0f}ms"
         )
+        self.memory_store.append_turn(user_id, run["message"], output)
+        self.response_cache.store(run["message"], output, tools_used, run["user_info"], run["inputs"]["chat_history"])
+        return output
+
+    def chat(self, message: str, user_id: str, user_info: str = "{}", callbacks: Optional[list] = None):
+        """Blocking version, for scripts and benchmarks"""
+        reply, run = self._prepare(message, user_id, user_info)
+        if run is None:
+            return reply
+
+        with deadline(AGENT_DEADLINE):
+            while True:
+                try:
+                    # read-tool results are memoized for the duration of this run
+                    with tool_cache.turn():
+                        response = self._bounded(run).invoke(
+                            run["inputs"], config={"callbacks": [run["tracer"], *(callbacks or [])]}
+                        )
+                except Exception as e:
+                    if self.model_router.should_escalate(run["route"], None) and not expired():
+                        run = self._escalate(run, "error")
+                        continue
+                    run["tracer"].finish("error")
+                    route_messages.inc(route=run["route"], outcome="error")
+                    return f"เกิดข้อผิดพลาด: {str(e)}"
+
+                if self.model_router.should_escalate(run["route"], response["output"]) and not expired():
+                    run = self._escalate(run, "stopped")
+                    continue
+                tools_used = [action.tool for action, _ in response.get("intermediate_steps", [])]
+                return self._finish(run, user_id, response["output"], tools_used)
+
+    async def achat(
+        self,
+        message: str,
+        user_id: str,
+        user_info: str = "{}",
+        on_progress: Optional[Callable[[str], Awaitable[None]]] = None,
+        callbacks: Optional[list] = None,
+    ):
+        """
+        Async version used by the LINE webhook. Tool calls from one model turn
+        run concurrently; on_progress gets a short status text each time the
+        model starts a new kind of tool work (each text is sent once).
+        """
+        # Mongo lookups in the router / memory backend are blocking
+        reply, run = await asyncio.to_thread(self._prepare, message, user_id, user_info)
+        if run is None:
+            return reply
+
+        with deadline(AGENT_DEADLINE):
+            sent = set()
+            while True:
+                output, tools_used = None, []
+                try:
+                    with tool_cache.turn():
+                        config = {"callbacks": [run["tracer"], *(callbacks or [])]}
+                        async for chunk in self._bounded(run).astream(run["inputs"], config=config):
+                            if "actions" in chunk:
+                                names = [action.tool for action in chunk["actions"]]
+                                tools_used.extend(names)
+                                text = progress_message(names)
+                                if on_progress is not None and text not in sent:
+                                    sent.add(text)
+                                    await on_progress(text)
+                            elif "output" in chunk:
+                                output = chunk["output"]
+                except asyncio.CancelledError:
+                    run["tracer"].finish("cancelled")
+                    raise
+                except Exception as e:
+                    if self.model_router.should_escalate(run["route"], None) and not expired():
+                        run = self._escalate(run, "error")
+                        continue
+                    run["tracer"].finish("error")
+                    route_messages.inc(route=run["route"], outcome="error")
+                    return f"เกิดข้อผิดพลาด: {str(e)}"
 
-        try:
-            response = agent_executor.invoke({
-                "message": message.strip(),
-                "user_info": user_info
-            })
-            return response["output"]
-        except Exception as e:
-            return f"เกิดข้อผิดพลาด: {str(e)}"
+                if self.model_router.should_escalate(run["route"], output) and not expired():
+                    run = self._escalate(run, "stopped")
+                    continue
+                if not output:
+                    # nothing to remember or cache, but the user gets an answer
+                    run["tracer"].finish("error")
+                    route_messages.inc(route=run["route"], outcome="error")
+                    return AGENT_NO_OUTPUT_MESSAGE
+                # memory append + response cache hit Mongo
+                return await asyncio.to_thread(self._finish, run, user_id, output, tools_used)
 
 # สร้าง instance ของ agent
 agent_executor = FoodOrderingAgentWithUserMemory()
\ No newline at end of file
@@ -0,0 +1,466 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+from pymongo import MongoClient, ReturnDocument
+
+from utills.tokens import count_tokens
+
+# (previous summary, messages to fold in, max tokens) -> new summary
+Summarizer = Callable[[str, List[BaseMessage], int], str]
+
+
+class Conversation:
+    """Chat history of one LINE user: a running summary + the recent turns verbatim"""
+
+    def __init__(
+        self,
+        user_id: str,
+        messages: Optional[List[BaseMessage]] = None,
+        summary: str = "",
+        version: int = 0,
+    ):
+        self.user_id = user_id
+        # version of the stored copy this one is based on, +1 per local change
+        # not persisted yet; the backend assigns the real numbers
+        self.version = version
+        self.messages: List[BaseMessage] = messages or []
+        self.tokens: List[int] = [count_tokens(str(m.content)) for m in self.messages]
+        self.summary = summary
+        self.summary_tokens = count_tokens(summary)
+        self.summarizing = False
+        self.loaded_at = time.monotonic()
+        self.last_access = self.loaded_at
+
+    def add_turn(self, human: str, ai: str, max_turns: int) -> None:
+        self.messages.extend([HumanMessage(content=human), AIMessage(content=ai)])
+        self.tokens.extend([count_tokens(human), count_tokens(ai)])
+        self.version += 1
+        if len(self.messages) > max_turns * 2:
+            self.messages = self.messages[-max_turns * 2:]
+            self.tokens = self.tokens[-max_turns * 2:]
+
+    def fold(self, count: int, summary: str) -> None:
+        """Replace the oldest `count` messages with a new running summary"""
+        self.messages = self.messages[count:]
+        self.tokens = self.tokens[count:]
+        self.summary = summary
+        self.summary_tokens = count_tokens(summary)
+        self.version += 1
+
+    def total_tokens(self) -> int:
+        return self.summary_tokens + sum(self.tokens)
+
+    def window(self, token_budget: int) -> List[BaseMessage]:
+        """
+        Summary + as many of the newest messages as fit in token_budget
+        (the latest turn is always kept)
+        """
+        used = self.summary_tokens
+        start = len(self.messages)
+        # whole turns only (human + ai)
+        while start > 0:
+            step = min(2, start)
+            cost = sum(self.tokens[start - step:start])
+            if used + cost > token_budget and len(self.messages) - start >= 2:
+                break
+            used += cost
+            start -= step
+        window = list(self.messages[start:])
+        if self.summary:
+            window.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {self.summary}"))
+        return window
+
+    def size(self) -> int:
+        """Approximate memory footprint in bytes (message text dominates)"""
+        return sum(len(str(m.content).encode()) for m in self.messages) + len(self.summary.encode()) + 256
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"messages": messages_to_dict(self.messages), "summary": self.summary, "version": self.version}
+
+    @classmethod
+    def from_dict(cls, user_id: str, data: Dict[str, Any]) -> "Conversation":
+        return cls(
+            user_id,
+            messages_from_dict(data.get("messages", [])),
+            data.get("summary", ""),
+            data.get("version", 0),
+        )
+
+
+# ---------- Persistence backends ----------
+
+class ConversationBackend:
+    """
+    Several workers write the same user's history, so writes never replace
+    blindly: append() adds a turn atomically and returns the stored version
+    after it, save() only replaces the copy it was computed from.
+    """
+
+    # False = nothing is persisted, so there is nothing to resync from
+    shared = False
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def append(self, user_id: str, messages: List[Dict[str, Any]], max_messages: int) -> Optional[int]:
+        """Add messages, keep the newest max_messages; returns the new version (None = not persisted)"""
+        return None
+
+    def save(self, user_id: str, data: Dict[str, Any], expected_version: int) -> bool:
+        """Replace the stored copy if it is still at expected_version"""
+        return True
+
+    def delete(self, user_id: str) -> None:
+        pass
+
+
+class MongoConversationBackend(ConversationBackend):
+    shared = True
+
+    def __init__(self, uri: str):
+        self.client = MongoClient(uri)
+        self.database = self.client["Agent"]
+        self.collection = self.database["conversations"]
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": user_id})
+
+    def append(self, user_id: str, messages: List[Dict[str, Any]], max_messages: int) -> Optional[int]:
+        doc = self.collection.find_one_and_update(
+            {"_id": user_id},
+            {
+                "$push": {"messages": {"$each": messages, "$slice": -max_messages}},
+                "$inc": {"version": 1},
+                "$set": {"updatedAt": datetime.utcnow()},
+                "$setOnInsert": {"summary": ""},
+            },
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
+
+    def save(self, user_id: str, data: Dict[str, Any], expected_version: int) -> bool:
+        result = self.collection.replace_one(
+            {"_id": user_id, "version": expected_version},
+            {**data, "updatedAt": datetime.utcnow()},
+        )
+        return result.matched_count == 1
+
+    def delete(self, user_id: str) -> None:
+        self.collection.delete_one({"_id": user_id})
+
+
+class DiskConversationBackend(ConversationBackend):
+    """
+    One JSON file per user; writes are atomic (tmp file + rename) and
+    read-modify-write runs under a lock file shared by all workers
+    """
+
+    shared = True
+
+    def __init__(self, directory: str, lock_timeout: float = 10.0):
+        self.directory = directory
+        self.lock_timeout = lock_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(user_id.encode()).hexdigest() + ".json")
+
+    @contextmanager
+    def _locked(self, path: str):
+        lock = path + ".lock"
+        give_up = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                if time.monotonic() > give_up:
+                    # left behind by a crashed worker
+                    os.remove(lock)
+                    give_up = time.monotonic() + self.lock_timeout
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.remove(lock)
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(user_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, data: Dict[str, Any]) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def append(self, user_id: str, messages: List[Dict[str, Any]], max_messages: int) -> Optional[int]:
+        path = self._path(user_id)
+        with self._locked(path):
+            data = self.load(user_id) or {"messages": [], "summary": "", "version": 0}
+            data["messages"] = (data.get("messages", []) + messages)[-max_messages:]
+            data["version"] = data.get("version", 0) + 1
+            self._write(path, data)
+        return data["version"]
+
+    def save(self, user_id: str, data: Dict[str, Any], expected_version: int) -> bool:
+        path = self._path(user_id)
+        with self._locked(path):
+            stored = self.load(user_id)
+            if (stored or {}).get("version", 0) != expected_version:
+                return False
+            self._write(path, data)
+        return True
+
+    def delete(self, user_id: str) -> None:
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
+
+
+# ---------- Store ----------
+
+class ConversationMemoryStore:
+    """
+    Bounded cache of conversations in front of a persistence backend.
+
+    - idle users are dropped after idle_ttl seconds, then least-recently-used
+      ones until both max_users and max_bytes hold
+    - evicted conversations are rehydrated lazily from the backend
+    - cached entries older than sync_interval are reloaded, so several
+      uvicorn workers sharing one backend converge on the same history
+    - writes go through a single background thread, off the reply path;
+      turns are appended atomically, so concurrent workers never drop each
+      other's turns, and a worker whose cache turns out to have diverged
+      (the stored version is not the one it expected) reloads it
+    - with a summarizer, only the last keep_turns turns stay verbatim; older
+      turns are folded into a running summary by a background thread after
+      the reply, and history() never returns more than token_budget tokens
+    """
+
+    def __init__(
+        self,
+        backend: ConversationBackend,
+        max_users: int = 1000,
+        idle_ttl: float = 3600.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_turns: int = 10,
+        sync_interval: float = 30.0,
+        summarizer: Optional[Summarizer] = None,
+        keep_turns: int = 3,
+        token_budget: int = 1200,
+        summarize_batch: int = 2,
+    ):
+        self.backend = backend
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.sync_interval = sync_interval
+        self.summarizer = summarizer
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summarize_batch = summarize_batch
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-writer")
+        self._summarizer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summarizer")
+
+    def get(self, user_id: str) -> Conversation:
+        now = time.monotonic()
+        with self._lock:
+            conversation = self._conversations.get(user_id)
+            if conversation and (not self.backend.shared or now - conversation.loaded_at < self.sync_interval):
+                conversation.last_access = now
+                self._conversations.move_to_end(user_id)
+                return conversation
+
+        data = self.backend.load(user_id)
+        with self._lock:
+            cached = self._conversations.get(user_id)
+            # the backend may lag behind our own queued writes: keep the
+            # cached copy unless the stored one is newer (another worker wrote)
+            if cached and (not data or data.get("version", 0) <= cached.version):
+                cached.loaded_at = cached.last_access = now
+                self._conversations.move_to_end(user_id)
+                return cached
+            conversation = Conversation.from_dict(user_id, data) if data else Conversation(user_id)
+            self._put(conversation)
+        return conversation
+
+    def history(self, user_id: str) -> List[BaseMessage]:
+        conversation = self.get(user_id)
+        with self._lock:
+            return conversation.window(self.token_budget)
+
+    def append_turn(self, user_id: str, human: str, ai: str) -> None:
+        conversation = self.get(user_id)
+        with self._lock:
+            tracked = self._conversations.get(user_id) is conversation
+            if tracked:
+                self._bytes -= conversation.size()
+            conversation.add_turn(human, ai, self.max_turns)
+            if tracked:
+                self._bytes += conversation.size()
+            conversation.loaded_at = time.monotonic()
+            turn = messages_to_dict(conversation.messages[-2:])
+            version = conversation.version
+            self._evict()
+            summarize = self._needs_summary(conversation)
+            if summarize:
+                conversation.summarizing = True
+        self._writer.submit(self._append, conversation, turn, version)
+        if summarize:
+            self._summarizer_pool.submit(self._summarize, conversation)
+
+    def forget(self, user_id: str) -> None:
+        with self._lock:
+            self._remove(user_id)
+        self._writer.submit(self.backend.delete, user_id)
+
+    def clear(self) -> None:
+        """Drop the in-process cache (persisted history is kept)"""
+        with self._lock:
+            self._conversations.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._conversations), "bytes": self._bytes}
+
+    def _needs_summary(self, conversation: Conversation) -> bool:
+        if self.summarizer is None or conversation.summarizing:
+            return False
+        older = len(conversation.messages) - self.keep_turns * 2
+        if older <= 0:
+            return False
+        return older >= self.summarize_batch * 2 or conversation.total_tokens() > self.token_budget
+
+    def _summarize(self, conversation: Conversation) -> None:
+        """Fold everything but the last keep_turns turns into the summary (background)"""
+        try:
+            with self._lock:
+                count = len(conversation.messages) - self.keep_turns * 2
+                if count <= 0:
+                    return
+                older = conversation.messages[:count]
+                summary = conversation.summary
+
+            new_summary = self.summarizer(summary, older, self.token_budget // 3)
+
+            with self._lock:
+                # history may have been reloaded, trimmed or evicted meanwhile;
+                # an evicted copy is stale, saving it would roll back the store
+                if conversation.messages[:count] != older:
+                    return
+                if self._conversations.get(conversation.user_id) is not conversation:
+                    return
+                self._bytes -= conversation.size()
+                conversation.fold(count, new_summary.strip())
+                self._bytes += conversation.size()
+                data = conversation.to_dict()
+            self._writer.submit(self._save, conversation, data)
+        except Exception as e:
+            print(f"❌ failed to summarize conversation for {conversation.user_id}: {e}")
+        finally:
+            conversation.summarizing = False
+
+    def _append(self, conversation: Conversation, turn: List[Dict[str, Any]], version: int) -> None:
+        try:
+            stored = self.backend.append(conversation.user_id, turn, self.max_turns * 2)
+        except Exception as e:
+            print(f"❌ failed to persist conversation for {conversation.user_id}: {e}")
+            return
+        if stored is not None and stored != version:
+            # another worker appended too: the stored history has both turns
+            self._mark_stale(conversation)
+
+    def _save(self, conversation: Conversation, data: Dict[str, Any]) -> None:
+        try:
+            saved = self.backend.save(conversation.user_id, data, data["version"] - 1)
+        except Exception as e:
+            print(f"❌ failed to persist conversation for {conversation.user_id}: {e}")
+            return
+        if not saved:
+            # the summary was built from a copy another worker has changed
+            # since; drop it, the next turn summarizes the reloaded history
+            self._mark_stale(conversation)
+
+    def _mark_stale(self, conversation: Conversation) -> None:
+        with self._lock:
+            conversation.loaded_at = float("-inf")
+            conversation.version = -1
+
+    def _put(self, conversation: Conversation) -> None:
+        self._remove(conversation.user_id)
+        self._conversations[conversation.user_id] = conversation
+        self._bytes += conversation.size()
+        self._evict()
+
+    def _remove(self, user_id: str) -> None:
+        conversation = self._conversations.pop(user_id, None)
+        if conversation:
+            self._bytes -= conversation.size()
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            user_id, oldest = next(iter(self._conversations.items()))
+            if (
+                oldest.last_access < cutoff
+                or len(self._conversations) > self.max_users
+                or self._bytes > self.max_bytes
+            ):
+                self._remove(user_id)
+            else:
+                break
+
+
+def create_memory_store(summarizer: Optional[Summarizer] = None) -> ConversationMemoryStore:
+    """Build the store from AGENT_MEMORY_* environment variables"""
+    load_dotenv()
+    backend_name = os.getenv("AGENT_MEMORY_BACKEND", "mongo")
+    if backend_name == "mongo":
+        backend = MongoConversationBackend(os.getenv("MONGODB_URI"))
+    elif backend_name == "disk":
+        backend = DiskConversationBackend(os.getenv("AGENT_MEMORY_DIR", ".agent_memory"))
+    elif backend_name == "none":
+        backend = ConversationBackend()
+    else:
+        raise ValueError(f"Unknown AGENT_MEMORY_BACKEND: {backend_name}")
+
+    return ConversationMemoryStore(
+        backend,
+        max_users=int(os.getenv("AGENT_MEMORY_MAX_USERS", "1000")),
+        idle_ttl=float(os.getenv("AGENT_MEMORY_IDLE_TTL", "3600")),
+        max_bytes=int(float(os.getenv("AGENT_MEMORY_MAX_MB", "50")) * 1024 * 1024),
+        max_turns=int(os.getenv("AGENT_MEMORY_TURNS", "10")),
+        sync_interval=float(os.getenv("AGENT_MEMORY_SYNC_SECONDS", "30")),
+        summarizer=summarizer if os.getenv("AGENT_MEMORY_SUMMARY", "on") == "on" else None,
+        keep_turns=int(os.getenv("AGENT_MEMORY_KEEP_TURNS", "3")),
+        token_budget=int(os.getenv("AGENT_MEMORY_TOKEN_BUDGET", "1200")),
+    )
@@ -0,0 +1,118 @@
+import os
+from typing import Dict, Optional, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+from service.agent.backends import create_llm
+from service.agent.toolSelection import PRODUCT_READ_TOOLS, RECOMMENDATION_TOOLS
+from utills.metrics import REGISTRY
+from utills.textVector import normalize
+
+load_dotenv()
+
+route_messages = REGISTRY.counter(
+    "agent_model_route_total",
+    "Agent runs per model route; escalated = small route retried on the large model",
+    ["route", "outcome"],
+)
+
+# ข้อความที่ต้องลงมือทำหลายขั้น (สั่ง/ยกเลิก/แก้ไข) ใช้โมเดลใหญ่เสมอ
+ESCALATE_KEYWORDS = ["สั่ง", "เอา", "ยกเลิก", "เปลี่ยน", "แก้", "เพิ่ม", "order", "cancel"]
+
+# คำตอบล่าสุดของ AI ที่ถามกลับ / รอยืนยัน / คุยเรื่องออเดอร์อยู่: ข้อความถัดไป
+# (เช่น "ใช่ครับ", "ยืนยัน", "ไข่ดาว") ต้องไปโมเดลใหญ่ที่มี create_order/cancel_order
+PENDING_KEYWORDS = ESCALATE_KEYWORDS + [
+    "ยืนยัน", "ไหม", "มั้ย", "หรือไม่", "หรือเปล่า", "ต้องการ", "ออเดอร์", "คำสั่งซื้อ", "?", "confirm",
+]
+
+# the small route only reads, so retrying a failed small run on the large
+# model can never repeat a write (e.g. create the same order twice)
+SMALL_ROUTE_TOOLS = PRODUCT_READ_TOOLS | RECOMMENDATION_TOOLS | {
+    "get_order",
+    "get_user_orders",
+    "get_user_orders_by_status",
+    "get_latest_user_order",
+    "find_user_by_line_id",
+}
+
+# AgentExecutor's final answer when max_iterations / max_execution_time is hit
+STOPPED_PREFIX = "Agent stopped"
+
+
+class ModelRoute:
+    """One model + its own limits"""
+
+    def __init__(self, name: str, llm: BaseChatModel, max_iterations: int, timeout: float):
+        self.name = name
+        self.llm = llm
+        self.max_iterations = max_iterations
+        self.timeout = timeout
+
+
+class ModelRouter:
+    """
+    Sends short, simple customer turns (thanks, menu questions, status reads)
+    to a small fast model with a low iteration cap, and multi-step ordering,
+    long messages, follow-ups to a question / confirmation / order in progress
+    and staff/admin work to the large model. The small route
+    only gets read tools; a small-route run that errors or hits its limits is
+    retried once on the large route.
+
+    Env: AGENT_MODEL_ROUTING (on|off), LLM_SMALL_MODEL, AGENT_SMALL_MAX_CHARS,
+    AGENT_{SMALL,LARGE}_MAX_ITERATIONS, AGENT_{SMALL,LARGE}_TIMEOUT (seconds).
+    """
+
+    def __init__(self, llm: Optional[BaseChatModel] = None):
+        self.enabled = os.getenv("AGENT_MODEL_ROUTING", "on") == "on"
+        self.small_max_chars = int(os.getenv("AGENT_SMALL_MAX_CHARS", "60"))
+
+        large_llm = llm or create_llm()
+        if llm is not None or not self.enabled:
+            small_llm = large_llm
+        else:
+            default_small = "gpt-5-mini" if os.getenv("LLM_BACKEND", "openai") == "openai" else None
+            small_llm = create_llm(model=os.getenv("LLM_SMALL_MODEL") or default_small)
+        self.routes: Dict[str, ModelRoute] = {
+            "small": ModelRoute(
+                "small",
+                small_llm,
+                max_iterations=int(os.getenv("AGENT_SMALL_MAX_ITERATIONS", "4")),
+                timeout=float(os.getenv("AGENT_SMALL_TIMEOUT", "20")),
+            ),
+            "large": ModelRoute(
+                "large",
+                large_llm,
+                max_iterations=int(os.getenv("AGENT_LARGE_MAX_ITERATIONS", "10")),
+                timeout=float(os.getenv("AGENT_LARGE_TIMEOUT", "60")),
+            ),
+        }
+
+    def choose(self, toolset: str, message: str, history: Sequence[BaseMessage] = ()) -> str:
+        if not self.enabled:
+            return "large"
+        if not toolset.startswith("customer:"):
+            return "large"
+        if len(message) > self.small_max_chars:
+            return "large"
+        text = normalize(message)
+        if any(k in text for k in ESCALATE_KEYWORDS):
+            return "large"
+        last_reply = next((m for m in reversed(history) if getattr(m, "type", None) == "ai"), None)
+        if last_reply is not None:
+            # not normalize(): it strips the "?"
+            reply = str(last_reply.content).lower()
+            if any(k in reply for k in PENDING_KEYWORDS):
+                return "large"
+        return "small"
+
+    @staticmethod
+    def tools_for(route: str, tools):
+        if route == "small":
+            return [t for t in tools if t.name in SMALL_ROUTE_TOOLS]
+        return tools
+
+    @staticmethod
+    def should_escalate(route: str, output: Optional[str]) -> bool:
+        return route == "small" and (output is None or str(output).startswith(STOPPED_PREFIX))
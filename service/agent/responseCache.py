@@ -0,0 +1,179 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+
+from service.product.product import get_catalog_version, on_catalog_change
+from utills.metrics import REGISTRY
+from utills.textVector import DIM, embed, normalize
+
+cache_lookups = REGISTRY.counter(
+    "agent_response_cache_lookups_total",
+    "Response cache lookups by result (hit, miss, skip)",
+    ["result"],
+)
+
+# tools that only read the shared catalog; an answer is cached only if it
+# used at least one of them and nothing else (orders, users, writes,
+# trending - which is not keyed on the catalog version - or no tool at all,
+# i.e. an answer from this user's chat history)
+CACHEABLE_TOOLS = {
+    "list_all_products",
+    "filter_products_by_status",
+    "find_product_by_name",
+    "search_products",
+    "get_product_by_id",
+}
+
+# personal, write or context-dependent wording -> never served from cache
+_UNCACHEABLE_WORDS = (
+    "ฉัน", "ผม", "หนู", "เรา", "ของฉัน",
+    "ออเดอร์", "คำสั่งซื้อ", "สั่ง", "ยกเลิก", "เปลี่ยน", "แก้", "ลบ", "เพิ่ม", "เอา",
+    "อันนี้", "อันนั้น", "นี้", "นั้น", "มัน",
+    "order", "cancel", "my", "this", "that",
+)
+
+
+class ResponseCache:
+    """
+    Cache of agent answers to non-personalised, read-only questions.
+
+    Keyed by the normalised message plus the catalog version; lookups first try
+    an exact key, then cosine similarity over the cached message vectors.
+    Any product write clears the cache.
+
+    The key ignores the chat history, so only questions that stand on their
+    own are looked up or stored: the first turn of a conversation, or a
+    message that names a catalog product. "ราคาเท่าไหร่" after talking about
+    one dish is about that dish and must not be answered for everyone.
+    """
+
+    def __init__(
+        self,
+        product_service=None,
+        max_entries: int = 512,
+        ttl: float = 600.0,
+        similarity: float = 0.9,
+        max_length: int = 60,
+        names_max_age: float = 60.0,
+    ):
+        self.product_service = product_service
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_length = max_length
+        self.names_max_age = names_max_age
+        # normalised product names, reloaded like rerank.AvailableCatalog
+        self._names: Optional[FrozenSet[str]] = None
+        self._names_version = -1
+        self._names_loaded_at = 0.0
+        # key -> (expires_at, catalog_version, vector, reply)
+        self._entries: "OrderedDict[str, Tuple[float, int, np.ndarray, str]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+        on_catalog_change(lambda product_id: self.clear())
+
+    def product_names(self) -> FrozenSet[str]:
+        """Normalised names of every catalog product (empty without a product service)"""
+        if self.product_service is None:
+            return frozenset()
+        version = get_catalog_version()
+        with self._lock:
+            if self._names is not None and version == self._names_version and time.monotonic() - self._names_loaded_at < self.names_max_age:
+                return self._names
+        products = self.product_service.GetAllProducts()
+        names = frozenset(filter(None, (normalize(p.get("product_name") or "") for p in products)))
+        with self._lock:
+            self._names, self._names_version, self._names_loaded_at = names, version, time.monotonic()
+        return names
+
+    def is_cacheable_query(self, message: str, history: Sequence[BaseMessage] = ()) -> bool:
+        text = normalize(message)
+        if not text or len(text) > self.max_length or re.search(r"\d", text):
+            return False
+        if any(word in text for word in _UNCACHEABLE_WORDS):
+            return False
+        # with history the message may lean on it, unless it names a product
+        return not history or any(name in text for name in self.product_names())
+
+    def lookup(self, message: str, history: Sequence[BaseMessage] = ()) -> Optional[str]:
+        if not self.is_cacheable_query(message, history):
+            cache_lookups.inc(result="skip")
+            return None
+
+        key = normalize(message)
+        now = time.monotonic()
+        version = get_catalog_version()
+        with self._lock:
+            if key not in self._entries:
+                key = self._nearest(embed(key))
+            entry = self._entries.get(key) if key else None
+            if entry and (entry[0] < now or entry[1] != version):
+                self._remove(key)
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+
+        cache_lookups.inc(result="hit" if entry else "miss")
+        return entry[3] if entry else None
+
+    def store(
+        self,
+        message: str,
+        reply: str,
+        tools_used: Iterable[str],
+        user_info: Any = None,
+        history: Sequence[BaseMessage] = (),
+    ) -> bool:
+        """Cache reply if the query is generic and stand-alone and it was built from catalog reads only"""
+        if not reply or not self.is_cacheable_query(message, history):
+            return False
+        tools_used = set(tools_used)
+        if not tools_used or not tools_used <= CACHEABLE_TOOLS:
+            return False
+        if isinstance(user_info, dict):
+            names = [user_info.get(k) for k in ("username", "display_name")]
+            if any(n and n in reply for n in names):
+                return False
+
+        key = normalize(message)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, get_catalog_version(), embed(key), reply)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._matrix = None
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        values = {k[0]: v for k, v in cache_lookups.values().items()}
+        looked_up = values.get("hit", 0) + values.get("miss", 0)
+        return {
+            "entries": len(self._entries),
+            **values,
+            "hit_rate": values.get("hit", 0) / looked_up if looked_up else 0.0,
+        }
+
+    def _nearest(self, vector: np.ndarray) -> Optional[str]:
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.vstack([self._entries[k][2] for k in self._keys]) if self._keys else np.zeros((0, DIM))
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best] if scores[best] >= self.similarity else None
+
+    def _remove(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._matrix = None
@@ -0,0 +1,135 @@
+import json
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from langchain.tools import BaseTool
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utills.metrics import REGISTRY
+from utills.textVector import normalize
+from utills.tokens import count_tokens
+
+llm_tokens = REGISTRY.counter(
+    "agent_llm_tokens_total",
+    "LLM tokens used by the agent, by kind (input/output) and tool set",
+    ["kind", "toolset"],
+)
+
+PRODUCT_READ_TOOLS = {
+    "get_product_by_id",
+    "find_product_by_name",
+    "list_all_products",
+    "filter_products_by_status",
+    "search_products",
+    "find_similar_products",
+}
+RECOMMENDATION_TOOLS = {
+    "get_collaborative_recommendations",
+    "get_trending_items",
+    "get_recommendations_for_now",
+}
+CUSTOMER_ORDER_TOOLS = {
+    "create_order",
+    "get_order",
+    "get_user_orders",
+    "get_user_orders_by_status",
+    "cancel_order",
+    "get_latest_user_order",
+}
+
+# role -> allowed tools (None = everything)
+ROLE_TOOLS: Dict[str, Optional[set]] = {
+    "customer": CUSTOMER_ORDER_TOOLS | PRODUCT_READ_TOOLS | RECOMMENDATION_TOOLS | {"find_user_by_line_id"},
+    "staff": (
+        CUSTOMER_ORDER_TOOLS | PRODUCT_READ_TOOLS | RECOMMENDATION_TOOLS
+        | {"find_user_by_line_id", "find_user_by_student_id", "find_user_by_email",
+           "update_order_status", "get_orders_by_date_range", "update_product_status"}
+    ),
+    "admin": None,
+}
+STAFF_ROLES = {"staff", "teacher", "kitchen"}
+
+# intent -> (keywords, tools it needs); a message that matches exactly one
+# intent only gets that intent's tools. Keep the menu keywords specific:
+# generic words ("อาหาร", "มีอะไร") also show up in orders ("ขออาหาร...")
+# and would strip create_order
+INTENT_TOOLS: Dict[str, Tuple[List[str], set]] = {
+    "menu": (
+        ["เมนู", "ราคา", "แนะนำ", "อร่อย", "ขายดี", "menu", "price", "recommend"],
+        PRODUCT_READ_TOOLS | RECOMMENDATION_TOOLS,
+    ),
+    "order": (
+        ["สั่ง", "ออเดอร์", "ยกเลิก", "สถานะ", "เอา", "คำสั่งซื้อ", "order", "cancel"],
+        CUSTOMER_ORDER_TOOLS | PRODUCT_READ_TOOLS | {"find_user_by_line_id", "update_order_status"},
+    ),
+}
+
+# ข้อความแจ้งความคืบหน้าระหว่างที่ agent เรียก tools (เรียงตามความสำคัญ)
+TOOL_PROGRESS_MESSAGES: List[Tuple[set, str]] = [
+    ({"create_order", "update_order_status", "cancel_order"}, "📝 กำลังบันทึกคำสั่งซื้อ..."),
+    (RECOMMENDATION_TOOLS, "✨ กำลังหาเมนูแนะนำ..."),
+    (CUSTOMER_ORDER_TOOLS | {"get_orders_by_date_range"}, "📦 กำลังตรวจสอบคำสั่งซื้อ..."),
+    (PRODUCT_READ_TOOLS, "🔎 กำลังค้นหาเมนู..."),
+]
+DEFAULT_PROGRESS_MESSAGE = "⏳ กำลังดำเนินการ..."
+# every text progress_message() can return (benchmarks tell them from replies)
+PROGRESS_TEXTS = [text for _, text in TOOL_PROGRESS_MESSAGES] + [DEFAULT_PROGRESS_MESSAGE]
+
+
+def progress_message(tool_names: List[str]) -> str:
+    """Short progress text for a batch of tool calls"""
+    for names, text in TOOL_PROGRESS_MESSAGES:
+        if names & set(tool_names):
+            return text
+    return DEFAULT_PROGRESS_MESSAGE
+
+
+def role_of(user_info) -> str:
+    role = (user_info.get("role") if isinstance(user_info, dict) else None) or "student"
+    if role == "admin":
+        return "admin"
+    if role in STAFF_ROLES:
+        return "staff"
+    return "customer"
+
+
+def select_tools(tools: List[BaseTool], user_info, message: str) -> Tuple[str, List[BaseTool]]:
+    """Pick the tools this user may use for this message. Returns (label, tools)."""
+    role = role_of(user_info)
+    allowed = ROLE_TOOLS[role]
+    if allowed is not None:
+        tools = [t for t in tools if t.name in allowed]
+
+    text = normalize(message)
+    matched = [intent for intent, (keywords, _) in INTENT_TOOLS.items() if any(k in text for k in keywords)]
+    if len(matched) != 1:
+        return f"{role}:all", tools
+
+    intent = matched[0]
+    needed = INTENT_TOOLS[intent][1]
+    return f"{role}:{intent}", [t for t in tools if t.name in needed]
+
+
+def tool_schema_tokens(tools: List[BaseTool]) -> int:
+    """Approximate prompt tokens spent on tool schemas"""
+    return sum(count_tokens(json.dumps(convert_to_openai_tool(t), ensure_ascii=False)) for t in tools)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Sums usage_metadata over every model call of one agent run"""
+
+    def __init__(self, toolset: str):
+        self.toolset = toolset
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+    def report(self) -> None:
+        llm_tokens.inc(self.input_tokens, kind="input", toolset=self.toolset)
+        llm_tokens.inc(self.output_tokens, kind="output", toolset=self.toolset)
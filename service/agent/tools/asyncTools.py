@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import List
+
+from dotenv import load_dotenv
+from langchain.tools import BaseTool
+
+from utills.deadline import remaining
+from utills.metrics import REGISTRY
+
+load_dotenv()
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+
+tool_timeouts = REGISTRY.counter(
+    "agent_tool_timeouts_total",
+    "Tool calls abandoned after TOOL_TIMEOUT_SECONDS or the request deadline",
+    ["tool"],
+)
+
+# bounded pool for blocking tool bodies (pymongo / requests): a hung upstream
+# can occupy at most these threads, not the event loop's default executor
+_tool_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_THREADS", "16")),
+    thread_name_prefix="agent-tool",
+)
+
+
+def _timed_out(name: str, seconds: float) -> str:
+    tool_timeouts.inc(tool=name)
+    # returned to the model as the tool result so it can still answer
+    return (
+        f"timeout: {name} did not respond within {seconds:.0f}s. "
+        "It may still complete; do not retry it, tell the customer to check again shortly."
+    )
+
+
+def _submit(func, kwargs):
+    # contextvars (tool_cache.turn, deadline) follow the call into the thread
+    return _tool_pool.submit(contextvars.copy_context().run, functools.partial(func, **kwargs))
+
+
+def _with_timeout(name: str, func):
+    def run(**kwargs):
+        timeout = remaining(TOOL_TIMEOUT)
+        if timeout <= 0:
+            return _timed_out(name, 0)
+        try:
+            return _submit(func, kwargs).result(timeout=timeout)
+        except FutureTimeout:
+            return _timed_out(name, timeout)
+    return run
+
+
+def _in_thread(name: str, func):
+    async def run(**kwargs):
+        timeout = remaining(TOOL_TIMEOUT)
+        if timeout <= 0:
+            return _timed_out(name, 0)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(_submit(func, kwargs)), timeout)
+        except asyncio.TimeoutError:
+            return _timed_out(name, timeout)
+    return run
+
+
+def with_async(tools: List[BaseTool]) -> List[BaseTool]:
+    """
+    Run every tool body in the bounded tool pool with a timeout of
+    TOOL_TIMEOUT_SECONDS (less if the request deadline is closer), and give
+    sync tools a coroutine so AgentExecutor.ainvoke/astream can run the tool
+    calls of one model turn concurrently instead of one by one.
+    """
+    wrapped = []
+    for t in tools:
+        func = getattr(t, "func", None)
+        if func is not None:
+            update = {"func": _with_timeout(t.name, func)}
+            if getattr(t, "coroutine", None) is None:
+                update["coroutine"] = _in_thread(t.name, func)
+            t = t.model_copy(update=update)
+        wrapped.append(t)
+    return wrapped
@@ -1,13 +1,55 @@
-from typing import List, Dict, Any
-from langchain.tools import tool
-from langchain.tools import BaseTool
-import requests
+import os
+from typing import List, Dict, Any, Union
+from langchain.tools import BaseTool, StructuredTool
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from service.agent.tools.toolFormat import names_result
+from service.recommendation.batch import RecommendationStore
+from service.recommendation.client import RECOMMENDER_URL, RecommendationClient
+from service.product.product import ProductService
+from service.recommendation.recommendation import get_recommendation_engine
+from service.recommendation.rerank import AvailableCatalog, ContextReranker
+from service.recommendation.trending import get_trending_counter
+
+load_dotenv()
+
+# local = built-in engine over Orders.orders, http = external service at RECOMMENDER_URL
+RECOMMENDER_BACKEND = os.getenv("RECOMMENDER_BACKEND", "local")
+
+
+def _item_names(results: List[Dict[str, Any]]) -> List[str]:
+    return [r["item_name"] for r in results if "item_name" in r]
+
 
 class LangChainRecommendationService:
     """Recommendation Service with LangChain tool integration"""
 
-    def __init__(self, api_base_url: str):
+    def __init__(self, api_base_url: str = RECOMMENDER_URL, backend: str = RECOMMENDER_BACKEND):
         self.api_base_url = api_base_url
+        self.backend = backend
+        self.client = None
+        self.engine = None
+        self.trending = None
+        self.store = None
+        self.reranker = None
+        if backend == "local":
+            orders = MongoClient(os.getenv("MONGODB_URI"))["Orders"]["orders"]
+            # precomputed by service.recommendation.batch, engine covers users it missed
+            self.store = RecommendationStore(orders.database)
+            self.engine = get_recommendation_engine(orders)
+            self.trending = get_trending_counter(orders)
+            self.reranker = ContextReranker(
+                orders,
+                AvailableCatalog(ProductService(os.getenv("MONGODB_URI"))),
+                candidates=self.collaborative,
+                fallback=self.engine.popular,
+            )
+        elif backend == "http":
+            # pooled keep-alive client with TTL cache + circuit breaker
+            self.client = RecommendationClient(api_base_url)
+        else:
+            raise ValueError(f"Unknown RECOMMENDER_BACKEND: {backend}")
         self._tools = None
 
     def get_langchain_tools(self) -> List[BaseTool]:
@@ -16,49 +58,80 @@ class LangChainRecommendationService:
             self._tools = self._create_tools()
         return self._tools
 
+    def collaborative(self, user_id: str, n: int = 5) -> List[Dict[str, Any]]:
+        """Batch lookup first, the in-process engine for users it has not covered or who ordered since"""
+        if self.store is None:
+            return self.client.for_user(user_id, n)
+        results = self.store.lookup(user_id, n)
+        if results is None:
+            results = self.engine.for_user(user_id, n)
+        return results
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+        if self.trending is not None:
+            self.trending.snapshot()
+
     def _create_tools(self) -> List[BaseTool]:
         """Create LangChain tools from service methods"""
 
-        @tool
-        def get_collaborative_recommendations(user_id: str, n_recommendations: int = 5) -> List[Dict[str, Any]]:
+        def get_collaborative_recommendations(user_id: str, n_recommendations: int = 5) -> Union[str, List[str]]:
             """Get collaborative filtering recommendations for a user"""
-            try:
-                url = f"{self.api_base_url}/recommendations/{user_id}?n_recommendations={n_recommendations}"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                results = response.json()
-                # Ensure JSON-serializable
-                output = []
-                
-                for r in results:
-                    r['score'] = float(r.get('score', 0))
-                    output.append(r['item_name'])    
-                return output
-            except requests.exceptions.RequestException as e:
-                print(f"Error in get_collaborative_recommendations: {e}")
-                return []
-
-        @tool
-        def get_trending_items(n_recommendations: int = 5) -> List[Dict[str, Any]]:
+            return names_result(_item_names(self.collaborative(user_id, n_recommendations)))
+
+        def get_trending_items(n_recommendations: int = 5) -> Union[str, List[str]]:
             """Get currently trending items
                 n_recommendations: int = 5
             """
-            try:
-                url = f"{self.api_base_url}/trending?n_recommendations={n_recommendations}"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                results = response.json()
-                
-                output=[]
-                
-                for r in results:
-                    output.append(r['item_name'])    
-                return output
-            except requests.exceptions.RequestException as e:
-                print(f"Error in get_trending_items: {e}")
-                return []
+            if self.trending is None:
+                return names_result(_item_names(self.client.trending(n_recommendations)))
+            names = _item_names(self.trending.top(n_recommendations))
+            if len(names) < n_recommendations:
+                # quiet hours: fill up with the all-time favourites
+                names += [n for n in _item_names(self.engine.popular(n_recommendations)) if n not in names]
+            return names_result(names[:n_recommendations])
+
+        def get_recommendations_for_now(user_id: str, n_recommendations: int = 5) -> Union[str, List[str]]:
+            """Recommend menu items for a user right now: only products that are
+            available, ranked by what they like and what they usually order at
+            this time of day / day of week
+            """
+            if self.reranker is None:
+                # http: the external service does its own ranking
+                return names_result(_item_names(self.client.for_user(user_id, n_recommendations)))
+            return names_result(_item_names(self.reranker.recommend(user_id, n_recommendations)))
+
+        if self.client is None:
+            # in-memory lookups; with_async() gives them a coroutine
+            return [
+                StructuredTool.from_function(get_collaborative_recommendations),
+                StructuredTool.from_function(get_trending_items),
+                StructuredTool.from_function(get_recommendations_for_now),
+            ]
+
+        async def aget_collaborative_recommendations(user_id: str, n_recommendations: int = 5) -> Union[str, List[str]]:
+            return names_result(_item_names(await self.client.afor_user(user_id, n_recommendations)))
+
+        async def aget_trending_items(n_recommendations: int = 5) -> Union[str, List[str]]:
+            return names_result(_item_names(await self.client.atrending(n_recommendations)))
+
+        async def aget_recommendations_for_now(user_id: str, n_recommendations: int = 5) -> Union[str, List[str]]:
+            return names_result(_item_names(await self.client.afor_user(user_id, n_recommendations)))
 
+        # sync body for chat(), native coroutine for achat() (no thread hop)
         return [
-            get_collaborative_recommendations,
-            get_trending_items
+            StructuredTool.from_function(
+                func=get_collaborative_recommendations,
+                coroutine=aget_collaborative_recommendations,
+            ),
+            StructuredTool.from_function(
+                func=get_trending_items,
+                coroutine=aget_trending_items,
+            ),
+            # the prompt points customers here on either backend
+            StructuredTool.from_function(
+                func=get_recommendations_for_now,
+                coroutine=aget_recommendations_for_now,
+            ),
         ]
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain.tools import BaseTool
+
+from utills.cancellation import current_run
+
+load_dotenv()
+
+# per agent invocation: key -> (tag, value)
+_turn_cache: ContextVar[Optional[Dict[str, Tuple[str, Any]]]] = ContextVar("tool_turn_cache", default=None)
+
+
+class ToolResultCache:
+    """
+    Memoization for read tools.
+
+    Every agent invocation gets its own scope (see turn()), so repeated calls
+    with the same arguments inside one run hit Mongo once. Optionally results
+    are also shared across runs for `ttl` seconds. Each entry carries a tag
+    (product / order / user); write tools and external writes invalidate a tag.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, tag, value)
+        self._shared: Dict[str, Tuple[float, str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def turn(self):
+        """Scope for one agent invocation"""
+        token = _turn_cache.set({})
+        try:
+            yield
+        finally:
+            _turn_cache.reset(token)
+
+    # the turn dict is shared by the tool threads of one run (copy_context),
+    # so it is only touched under the lock, like the shared entries
+
+    def get(self, key: str, shared: bool) -> Tuple[bool, Any]:
+        turn = _turn_cache.get()
+        with self._lock:
+            if turn is not None and key in turn:
+                return True, turn[key][1]
+            if shared and self.ttl > 0:
+                entry = self._shared.get(key)
+                if entry and entry[0] > time.monotonic():
+                    if turn is not None:
+                        turn[key] = (entry[1], entry[2])
+                    return True, entry[2]
+        return False, None
+
+    def put(self, key: str, tag: str, value: Any, shared: bool) -> None:
+        turn = _turn_cache.get()
+        with self._lock:
+            if turn is not None:
+                turn[key] = (tag, value)
+            if shared and self.ttl > 0:
+                if len(self._shared) >= self.max_entries:
+                    self._shared.pop(next(iter(self._shared)))
+                self._shared[key] = (time.monotonic() + self.ttl, tag, value)
+
+    def invalidate(self, tag: str) -> None:
+        turn = _turn_cache.get()
+        with self._lock:
+            if turn is not None:
+                for key in [k for k, (t, _) in turn.items() if t == tag]:
+                    del turn[key]
+            for key in [k for k, (_, t, _) in self._shared.items() if t == tag]:
+                del self._shared[key]
+
+
+tool_cache = ToolResultCache(ttl=float(os.getenv("TOOL_CACHE_TTL", "0")))
+
+
+def _cache_key(name: str, kwargs: Dict[str, Any]) -> str:
+    return name + ":" + json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _memoized(name: str, func, tag: str, shared: bool):
+    def run(**kwargs):
+        key = _cache_key(name, kwargs)
+        hit, value = tool_cache.get(key, shared)
+        if hit:
+            return value
+        value = func(**kwargs)
+        tool_cache.put(key, tag, value, shared)
+        return value
+    return run
+
+
+def _invalidating(name: str, func, tag: str):
+    def run(**kwargs):
+        # a superseded / timed-out run must not commit anything new
+        control = current_run()
+        if control is not None and not control.begin_write():
+            return f"cancelled: {name} was not run because this request was cancelled."
+        try:
+            return func(**kwargs)
+        finally:
+            tool_cache.invalidate(tag)
+    return run
+
+
+def memoize_tools(tools: List[BaseTool], tag: str, read_tools: Iterable[str], shared: bool = True) -> List[BaseTool]:
+    """
+    Wrap a service's tools: tools named in read_tools are memoized under
+    `tag`, every other tool is treated as a write: it invalidates `tag` and
+    is refused once the current run is cancelled (utills.cancellation).
+    """
+    read_tools = set(read_tools)
+    wrapped = []
+    for t in tools:
+        if t.name in read_tools:
+            func = _memoized(t.name, t.func, tag, shared)
+        else:
+            func = _invalidating(t.name, t.func, tag)
+        wrapped.append(t.model_copy(update={"func": func}))
+    return wrapped
@@ -0,0 +1,127 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# compact = projected fields, short keys, no indentation (default)
+# verbose = the original emoji/markdown and indented JSON output
+output_format = os.getenv("TOOL_OUTPUT_FORMAT", "compact")
+LIST_LIMIT = int(os.getenv("TOOL_OUTPUT_LIMIT", "20"))
+
+# stable short keys; never reuse a short key for a different field
+SHORT_KEYS = {
+    "_id": "id",
+    "product_name": "name",
+    "price": "price",
+    "status": "st",
+    "description": "desc",
+    "userId": "uid",
+    "addon": "add",
+    "createAt": "at",
+    "username": "user",
+    "display_name": "dname",
+    "email": "email",
+    "studentID": "sid",
+    "studentId": "sid",
+    "line_user_id": "line",
+    "role": "role",
+}
+
+# keys the wrappers below add around projected docs
+ENVELOPE_KEYS = {
+    "n": "total count",
+    "items": "first results",
+    "more": "results omitted",
+    "ok": "1 done / 0 failed",
+    "err": "why it failed",
+}
+
+PRODUCT_FIELDS = ("_id", "product_name", "price", "status", "description")
+ORDER_FIELDS = ("_id", "product_name", "price", "addon", "status", "description", "createAt")
+USER_FIELDS = ("_id", "username", "display_name", "email", "studentID", "studentId", "role", "line_user_id")
+
+
+def compact_mode() -> bool:
+    return output_format == "compact"
+
+
+def set_output_format(fmt: str) -> None:
+    global output_format
+    if fmt not in ("compact", "verbose"):
+        raise ValueError(f"Unknown tool output format: {fmt}")
+    output_format = fmt
+
+
+def key_legend() -> str:
+    """One line for the system prompt: what the short keys stand for"""
+    renamed = {}
+    for field, key in SHORT_KEYS.items():
+        if key != field:
+            renamed.setdefault(key, field)
+    pairs = [f"{key}={field}" for key, field in renamed.items()]
+    pairs += [f"{key}={meaning}" for key, meaning in ENVELOPE_KEYS.items()]
+    return "Tool results are compact JSON with short keys: " + ", ".join(pairs)
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def project(doc: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """Keep only `fields`, rename to short keys, drop empty values"""
+    out = {}
+    for field in fields:
+        value = doc.get(field)
+        if value is None or value == "" or value == []:
+            continue
+        out[SHORT_KEYS.get(field, field)] = _value(value)
+    return out
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def compact_doc(doc: Optional[Dict[str, Any]], fields: Sequence[str]) -> str:
+    return dumps(project(doc, fields)) if doc else "not found"
+
+
+def compact_list(docs: Iterable[Dict[str, Any]], fields: Sequence[str], limit: int = None) -> str:
+    """{"n": total, "items": [...first `limit`], "more": omitted}"""
+    docs = list(docs)
+    limit = LIST_LIMIT if limit is None else limit
+    out: Dict[str, Any] = {"n": len(docs), "items": [project(d, fields) for d in docs[:limit]]}
+    if len(docs) > limit:
+        out["more"] = len(docs) - limit
+    return dumps(out)
+
+
+def write_result(ok: bool, message: str, **fields: Any) -> str:
+    """
+    Result of a write tool: `message` (the emoji sentence) in verbose mode,
+    {"ok": 1|0, <short keys of fields>, "err": reason} in compact mode.
+    Pass only what the model does not know yet (new ids, new values), not
+    the ids it just sent.
+    """
+    if not compact_mode():
+        return message
+    out: Dict[str, Any] = {"ok": int(ok), **project(fields, list(fields))}
+    if not ok:
+        out["err"] = message.lstrip("❌🗑️✅ ")
+    return dumps(out)
+
+
+def names_result(names: List[str]) -> Any:
+    """Result of a recommendation tool: the item names (JSON array in compact mode)"""
+    return dumps(names) if compact_mode() else names
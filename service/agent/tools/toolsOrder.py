@@ -1,11 +1,13 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from langchain.tools import tool
 from langchain.tools import BaseTool
 
 # Assuming your original OrderService is imported or defined above
 # from your_module import OrderService
 from service.order.order import OrderService
+from service.agent.tools.toolCache import memoize_tools
+from service.agent.tools.toolFormat import ORDER_FIELDS, compact_doc, compact_list, compact_mode, write_result
 import json
 
 class LangChainOrderService(OrderService):
@@ -18,7 +20,20 @@ class LangChainOrderService(OrderService):
     def get_langchain_tools(self) -> List[BaseTool]:
         """Get all LangChain tools for this service"""
         if self._tools is None:
-            self._tools = self._create_tools()
+            self._tools = memoize_tools(
+                self._create_tools(),
+                tag="order",
+                read_tools=[
+                    "get_order",
+                    "get_user_orders",
+                    "get_user_orders_by_status",
+                    "get_latest_user_order",
+                    "get_orders_by_date_range",
+                ],
+                # per turn only: staff change orders over REST and in other
+                # processes, a shared cache would serve stale statuses
+                shared=False,
+            )
         return self._tools
     
     def _create_tools(self) -> List[BaseTool]:
@@ -52,14 +67,17 @@ class LangChainOrderService(OrderService):
             }
             
             # The AddOrder function will now receive the correct data type.
-            return self.AddOrder(order_data)
+            order_id = self.AddOrder(order_data)
+            return write_result(True, order_id, _id=order_id, product_name=product_name, status=status)
 
         @tool
-        def get_order(order_id: str) -> Optional[Dict[str, Any]]:
+        def get_order(order_id: str) -> Union[str, Dict[str, Any], None]:
             """Retrieve order details by ID 
             input should be a string of order id -> id of mongodb
             """
             result = self.GetOrder(order_id)
+            if compact_mode():
+                return compact_doc(result, ORDER_FIELDS)
             if result:
                 # Convert ObjectId and datetime for JSON serialization
                 result['_id'] = str(result['_id'])
@@ -69,11 +87,13 @@ class LangChainOrderService(OrderService):
             return result
         
         @tool
-        def get_user_orders(user_id: str) -> List[Dict[str, Any]]:
+        def get_user_orders(user_id: str) -> Union[str, List[Dict[str, Any]]]:
             """Get all orders for a user
             input should be a string of user id -> id of mongodb
             """
             results = self.GetUserOrders(user_id)
+            if compact_mode():
+                return compact_list(results, ORDER_FIELDS)
             # Convert ObjectId and datetime for JSON serialization
             for result in results:
                 result['_id'] = str(result['_id'])
@@ -83,7 +103,7 @@ class LangChainOrderService(OrderService):
             return results
         
         @tool
-        def get_user_orders_by_status(user_id: str, status: str) -> List[Dict[str, Any]]:
+        def get_user_orders_by_status(user_id: str, status: str) -> Union[str, List[Dict[str, Any]]]:
             """Get user orders filtered by status
                 first input should be a string of user id -> id of mongodb
                 second input is status of order, should have 2 value 
@@ -91,6 +111,8 @@ class LangChainOrderService(OrderService):
                     - unavalible
             """
             results = self.GetUserOrdersByStatus(user_id, status)
+            if compact_mode():
+                return compact_list(results, ORDER_FIELDS)
             # Convert ObjectId and datetime for JSON serialization
             for result in results:
                 result['_id'] = str(result['_id'])
@@ -109,8 +131,8 @@ class LangChainOrderService(OrderService):
             """
             result = self.UpdateOrderStatus(order_id, status)
             if result > 0:
-                return f"Successfully updated order {order_id} to status '{status}'"
-            return f"Failed to update order {order_id}. Order may not exist."
+                return write_result(True, f"Successfully updated order {order_id} to status '{status}'", status=status)
+            return write_result(False, f"Failed to update order {order_id}. Order may not exist.")
         
         @tool
         def cancel_order(order_id: str) -> str:
@@ -118,16 +140,20 @@ class LangChainOrderService(OrderService):
                 first input should be a string of order id -> id of mongodb
             """
             result = self.CancelOrder(order_id)
+            if compact_mode():
+                return write_result(result > 0, "order not found or already cancelled")
             if result > 0:
                 return True
             return None
         
         @tool
-        def get_latest_user_order(user_id: str) -> Optional[Dict[str, Any]]:
+        def get_latest_user_order(user_id: str) -> Union[str, Dict[str, Any], None]:
             """Get the most recent order for a user
                 first input should be a string of user id -> id of mongodb
             """
             result = self.GetLatestUserOrder(user_id)
+            if compact_mode():
+                return compact_doc(result, ORDER_FIELDS)
             if result:
                 result['_id'] = str(result['_id'])
                 for key, value in result.items():
@@ -136,12 +162,14 @@ class LangChainOrderService(OrderService):
             return result
         
         @tool
-        def get_orders_by_date_range(start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        def get_orders_by_date_range(start_date: str, end_date: str) -> Union[str, List[Dict[str, Any]]]:
             """Get orders within a date range. Dates in ISO format (YYYY-MM-DD)"""
             try:
                 start = datetime.fromisoformat(start_date)
                 end = datetime.fromisoformat(end_date)
                 results = self.GetOrdersByDateRange(start, end)
+                if compact_mode():
+                    return compact_list(results, ORDER_FIELDS)
                 
                 # Convert ObjectId and datetime for JSON serialization
                 for result in results:
@@ -13,7 +13,12 @@ from langchain.tools import tool, BaseTool
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
-from service.product.product import ProductService
+from service.product.product import ProductService, on_catalog_change
+from service.agent.tools.toolCache import memoize_tools, tool_cache
+from service.agent.tools.toolFormat import PRODUCT_FIELDS, compact_doc, compact_list, compact_mode, write_result
+
+# product writes made outside the agent (REST, other services) drop cached reads
+on_catalog_change(lambda product_id: tool_cache.invalidate("product"))
 
 class ProductSchema(BaseModel):
     product_name: str
@@ -54,7 +59,18 @@ class LangChainProductService(ProductService):
     def get_langchain_tools(self) -> List[BaseTool]:
         """Get all LangChain tools for this service"""
         if self._tools is None:
-            self._tools = self._create_tools()
+            self._tools = memoize_tools(
+                self._create_tools(),
+                tag="product",
+                read_tools=[
+                    "get_product_by_id",
+                    "find_product_by_name",
+                    "list_all_products",
+                    "filter_products_by_status",
+                    "search_products",
+                    "find_similar_products",
+                ],
+            )
         return self._tools
 
     def _create_tools(self) -> List[BaseTool]:
@@ -93,10 +109,13 @@ class LangChainProductService(ProductService):
                     product_data["image"] = image
                     
                 product_id = self.CreateProduct(product_data)
-                return f"✅ Product '{product_name}' created successfully with ID: {product_id}"
+                return write_result(
+                    True, f"✅ Product '{product_name}' created successfully with ID: {product_id}",
+                    _id=product_id, product_name=product_name,
+                )
                 
             except Exception as e:
-                return f"❌ Error creating product: {str(e)}"
+                return write_result(False, f"❌ Error creating product: {str(e)}")
 
         @tool
         def get_product_by_id(product_id: str) -> str:
@@ -111,6 +130,8 @@ class LangChainProductService(ProductService):
             """
             try:
                 product = self.GetProduct(product_id)
+                if product and compact_mode():
+                    return compact_doc(product, PRODUCT_FIELDS)
                 if product:
                     product = self._serialize_product(product)
                     return f"📦 Product Details:\n" + json.dumps(product, indent=2)
@@ -132,6 +153,8 @@ class LangChainProductService(ProductService):
             """
             try:
                 product = self.GetProductByName(product_name)
+                if product and compact_mode():
+                    return compact_doc(product, PRODUCT_FIELDS)
                 if product:
                     product = self._serialize_product(product)
                     return f"📦 Found Product:\n" + json.dumps(product, indent=2)
@@ -150,6 +173,8 @@ class LangChainProductService(ProductService):
             """
             try:
                 products = self.GetAllProducts()
+                if compact_mode():
+                    return compact_list(products, PRODUCT_FIELDS)
                 if not products:
                     return "📝 No products found in catalog"
                 
@@ -181,6 +206,8 @@ class LangChainProductService(ProductService):
             """
             try:
                 products = self.GetProductsByStatus(status)
+                if compact_mode():
+                    return compact_list(products, PRODUCT_FIELDS)
                 if not products:
                     return f"📝 No products found with status '{status}'"
                 
@@ -213,15 +240,15 @@ class LangChainProductService(ProductService):
             """
             try:
                 if new_price < 0:
-                    return "❌ Price cannot be negative"
+                    return write_result(False, "❌ Price cannot be negative")
                     
                 result = self.UpdateProductPrice(product_id, new_price)
                 if result > 0:
-                    return f"✅ Product price updated to ${new_price:.2f}"
+                    return write_result(True, f"✅ Product price updated to ${new_price:.2f}", price=new_price)
                 else:
-                    return f"❌ Product with ID '{product_id}' not found"
+                    return write_result(False, f"❌ Product with ID '{product_id}' not found")
             except Exception as e:
-                return f"❌ Error updating price: {str(e)}"
+                return write_result(False, f"❌ Error updating price: {str(e)}")
 
         @tool
         def update_product_status(product_id: str, new_status: str) -> str:
@@ -238,11 +265,11 @@ class LangChainProductService(ProductService):
             try:
                 result = self.UpdateProductStatus(product_id, new_status)
                 if result > 0:
-                    return f"✅ Product status updated to '{new_status}'"
+                    return write_result(True, f"✅ Product status updated to '{new_status}'", status=new_status)
                 else:
-                    return f"❌ Product with ID '{product_id}' not found"
+                    return write_result(False, f"❌ Product with ID '{product_id}' not found")
             except Exception as e:
-                return f"❌ Error updating status: {str(e)}"
+                return write_result(False, f"❌ Error updating status: {str(e)}")
 
         @tool
         def update_product_details(
@@ -282,12 +309,12 @@ class LangChainProductService(ProductService):
                         updates.append("image")
                 
                 if updates:
-                    return f"✅ Updated product {', '.join(updates)}"
+                    return write_result(True, f"✅ Updated product {', '.join(updates)}")
                 else:
-                    return f"❌ Product with ID '{product_id}' not found or no changes made"
+                    return write_result(False, f"❌ Product with ID '{product_id}' not found or no changes made")
                     
             except Exception as e:
-                return f"❌ Error updating product: {str(e)}"
+                return write_result(False, f"❌ Error updating product: {str(e)}")
 
         @tool
         def delete_product(product_id: str) -> str:
@@ -304,18 +331,21 @@ class LangChainProductService(ProductService):
                 # First get product details for confirmation
                 product = self.GetProduct(product_id)
                 if not product:
-                    return f"❌ Product with ID '{product_id}' not found"
+                    return write_result(False, f"❌ Product with ID '{product_id}' not found")
                 
                 product_name = product.get('product_name', 'Unknown')
                 result = self.DeleteProduct(product_id)
                 
                 if result > 0:
-                    return f"🗑️ Product '{product_name}' (ID: {product_id}) deleted successfully"
+                    return write_result(
+                        True, f"🗑️ Product '{product_name}' (ID: {product_id}) deleted successfully",
+                        product_name=product_name,
+                    )
                 else:
-                    return f"❌ Failed to delete product with ID '{product_id}'"
+                    return write_result(False, f"❌ Failed to delete product with ID '{product_id}'")
                     
             except Exception as e:
-                return f"❌ Error deleting product: {str(e)}"
+                return write_result(False, f"❌ Error deleting product: {str(e)}")
 
         @tool
         def search_products(
@@ -362,6 +392,8 @@ class LangChainProductService(ProductService):
                 if max_price is not None:
                     filtered_products = [p for p in filtered_products if p.get('price', 0) <= max_price]
                 
+                if compact_mode():
+                    return compact_list(filtered_products, PRODUCT_FIELDS, limit=10)
                 if not filtered_products:
                     return f"🔍 No products found matching '{keyword}' with specified filters"
                 
@@ -384,6 +416,36 @@ class LangChainProductService(ProductService):
             except Exception as e:
                 return f"❌ Error searching products: {str(e)}"
 
+        @tool
+        def find_similar_products(query: str, k: int = 5) -> str:
+            """
+            Find the menu items closest to a dish name or description, best match first.
+            Use this when the ordered food is not found by exact name (typos,
+            nicknames, partial names) instead of listing all products.
+            
+            Args:
+                query: Dish name or description as the customer wrote it
+                k: Number of matches to return (default 5)
+                
+            Returns:
+                Matching products with a similarity score (0-1)
+            """
+            try:
+                matches = self.FindSimilarProducts(query, k=min(max(k, 1), 20))
+                if compact_mode():
+                    return compact_list(matches, PRODUCT_FIELDS + ("score",))
+                if not matches:
+                    return f"🔍 No products similar to '{query}'"
+                
+                result = f"🔍 **Closest matches for '{query}':**\n\n"
+                for product in matches:
+                    result += f"🏷️ **{product['product_name']}** - ${product['price']:.2f} (score {product['score']})\n"
+                    result += f"   ID: {product['_id']} | Status: {product['status']}\n\n"
+                return result
+                
+            except Exception as e:
+                return f"❌ Error finding similar products: {str(e)}"
+
         return [
             create_product,
             get_product_by_id,
@@ -394,5 +456,6 @@ class LangChainProductService(ProductService):
             update_product_status,
             update_product_details,
             delete_product,
-            search_products
+            search_products,
+            find_similar_products
         ]
\ No newline at end of file
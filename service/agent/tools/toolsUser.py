@@ -7,7 +7,9 @@ from bson import ObjectId
 
 from langchain.tools import tool, BaseTool
 
-from service.users.user import Users
+from service.users.user import Users, user_profile_cache
+from service.agent.tools.toolCache import memoize_tools
+from service.agent.tools.toolFormat import USER_FIELDS, compact_doc, compact_list, compact_mode, write_result
 
 class LangChainUsers(Users):
     """Extended Users service with LangChain tool integration"""
@@ -51,6 +53,7 @@ class LangChainUsers(Users):
                 {"_id": ObjectId(user_id)},
                 {"$set": {"role": new_role, "updatedAt": datetime.now(timezone.utc)}}
             )
+            user_profile_cache.invalidate(user_id=user_id)
             return int(result.modified_count)
         except Exception:
             return 0
@@ -63,6 +66,7 @@ class LangChainUsers(Users):
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            user_profile_cache.invalidate(user_id=user_id)
             return int(result.modified_count)
         except Exception:
             return 0
@@ -71,6 +75,7 @@ class LangChainUsers(Users):
         """Delete user by ID"""
         try:
             result = self.collection.delete_one({"_id": ObjectId(user_id)})
+            user_profile_cache.invalidate(user_id=user_id)
             return int(result.deleted_count)
         except Exception:
             return 0
@@ -108,7 +113,21 @@ class LangChainUsers(Users):
     def get_langchain_tools(self) -> List[BaseTool]:
         """Get all LangChain tools for this service"""
         if self._tools is None:
-            self._tools = self._create_tools()
+            # user writes also happen in the login/register routes, so user
+            # reads are only memoized within a single agent run
+            self._tools = memoize_tools(
+                self._create_tools(),
+                tag="user",
+                read_tools=[
+                    "find_user_by_email",
+                    "find_user_by_line_id",
+                    "find_user_by_student_id",
+                    "list_users_by_role",
+                    "search_users_by_keyword",
+                    "get_user_statistics",
+                ],
+                shared=False,
+            )
         return self._tools
 
     def _create_tools(self) -> List[BaseTool]:
@@ -141,11 +160,11 @@ class LangChainUsers(Users):
                 # Check if user already exists
                 existing_user = self.get_user_by_email(email)
                 if existing_user:
-                    return f"❌ User with email '{email}' already exists"
+                    return write_result(False, f"❌ User with email '{email}' already exists")
                 
                 existing_username = self.get_user_by_username(username)
                 if existing_username:
-                    return f"❌ Username '{username}' is already taken"
+                    return write_result(False, f"❌ Username '{username}' is already taken")
                 
                 user_data = {
                     "username": username,
@@ -157,7 +176,7 @@ class LangChainUsers(Users):
                     # Check if student ID is already used
                     existing_student = self.get_user_by_student_id(student_id)
                     if existing_student:
-                        return f"❌ Student ID '{student_id}' is already registered"
+                        return write_result(False, f"❌ Student ID '{student_id}' is already registered")
                     user_data["studentID"] = student_id
                 
                 if line_id:
@@ -167,10 +186,10 @@ class LangChainUsers(Users):
                     user_data["password"] = password  # In production, hash this!
                 
                 user_id = self.create_user(user_data)
-                return f"✅ User '{username}' created successfully with ID: {user_id}"
+                return write_result(True, f"✅ User '{username}' created successfully with ID: {user_id}", _id=user_id, username=username)
                 
             except Exception as e:
-                return f"❌ Error creating user: {str(e)}"
+                return write_result(False, f"❌ Error creating user: {str(e)}")
 
         @tool
         def find_user_by_email(email: str) -> str:
@@ -185,6 +204,8 @@ class LangChainUsers(Users):
             """
             try:
                 user = self.get_user_by_email(email)
+                if user and compact_mode():
+                    return compact_doc(user, USER_FIELDS)
                 if user:
                     user = self._serialize_user(user)
                     return f"👤 **User Found:**\n" + json.dumps(user, indent=2)
@@ -206,6 +227,8 @@ class LangChainUsers(Users):
             """
             try:
                 user = self.get_user_by_line_id(line_id)
+                if user and compact_mode():
+                    return compact_doc(user, USER_FIELDS)
                 if user:
                     user = self._serialize_user(user)
                     return f"👤 **User Found:**\n" + json.dumps(user, indent=2)
@@ -227,6 +250,8 @@ class LangChainUsers(Users):
             """
             try:
                 user = self.get_user_by_student_id(student_id)
+                if user and compact_mode():
+                    return compact_doc(user, USER_FIELDS)
                 if user:
                     user = self._serialize_user(user)
                     return f"👤 **User Found:**\n" + json.dumps(user, indent=2)
@@ -248,6 +273,8 @@ class LangChainUsers(Users):
             """
             try:
                 users = self.get_users_by_role(role)
+                if compact_mode():
+                    return compact_list(users, USER_FIELDS)
                 if not users:
                     return f"📝 No users found with role '{role}'"
                 
@@ -279,6 +306,8 @@ class LangChainUsers(Users):
             """
             try:
                 users = self.search_users(keyword)
+                if compact_mode():
+                    return compact_list(users, USER_FIELDS, limit=10)
                 if not users:
                     return f"🔍 No users found matching '{keyword}'"
                 
@@ -316,16 +345,16 @@ class LangChainUsers(Users):
                 # First check if user exists
                 user = self.get_user_by_id(user_id)
                 if not user:
-                    return f"❌ User with ID '{user_id}' not found"
+                    return write_result(False, f"❌ User with ID '{user_id}' not found")
                 
                 result = self.update_user_role(user_id, new_role)
                 if result > 0:
-                    return f"✅ Updated user '{user.get('username', 'Unknown')}' role to '{new_role}'"
+                    return write_result(True, f"✅ Updated user '{user.get('username', 'Unknown')}' role to '{new_role}'", role=new_role)
                 else:
-                    return f"❌ Failed to update user role"
+                    return write_result(False, f"❌ Failed to update user role")
                     
             except Exception as e:
-                return f"❌ Error updating user role: {str(e)}"
+                return write_result(False, f"❌ Error updating user role: {str(e)}")
 
         @tool
         def update_user_information(
@@ -350,7 +379,7 @@ class LangChainUsers(Users):
                 # Check if user exists
                 user = self.get_user_by_id(user_id)
                 if not user:
-                    return f"❌ User with ID '{user_id}' not found"
+                    return write_result(False, f"❌ User with ID '{user_id}' not found")
                 
                 update_data = {}
                 updates = []
@@ -359,7 +388,7 @@ class LangChainUsers(Users):
                     # Check if username is already taken by another user
                     existing = self.get_user_by_username(username)
                     if existing and str(existing['_id']) != user_id:
-                        return f"❌ Username '{username}' is already taken"
+                        return write_result(False, f"❌ Username '{username}' is already taken")
                     update_data["username"] = username
                     updates.append(f"username to '{username}'")
                 
@@ -367,7 +396,7 @@ class LangChainUsers(Users):
                     # Check if email is already used by another user
                     existing = self.get_user_by_email(email)
                     if existing and str(existing['_id']) != user_id:
-                        return f"❌ Email '{email}' is already registered"
+                        return write_result(False, f"❌ Email '{email}' is already registered")
                     update_data["email"] = email
                     updates.append(f"email to '{email}'")
                 
@@ -375,21 +404,21 @@ class LangChainUsers(Users):
                     # Check if student ID is already used by another user
                     existing = self.get_user_by_student_id(student_id)
                     if existing and str(existing['_id']) != user_id:
-                        return f"❌ Student ID '{student_id}' is already registered"
+                        return write_result(False, f"❌ Student ID '{student_id}' is already registered")
                     update_data["studentID"] = student_id
                     updates.append(f"student ID to '{student_id}'")
                 
                 if not update_data:
-                    return "❌ No valid updates provided"
+                    return write_result(False, "❌ No valid updates provided")
                 
                 result = self.update_user_info(user_id, update_data)
                 if result > 0:
-                    return f"✅ Updated user {', '.join(updates)}"
+                    return write_result(True, f"✅ Updated user {', '.join(updates)}", **update_data)
                 else:
-                    return f"❌ Failed to update user information"
+                    return write_result(False, f"❌ Failed to update user information")
                     
             except Exception as e:
-                return f"❌ Error updating user: {str(e)}"
+                return write_result(False, f"❌ Error updating user: {str(e)}")
 
         @tool
         def upsert_user_by_line_id(
@@ -425,12 +454,12 @@ class LangChainUsers(Users):
                 result = self.upsert_user(user_data)
                 
                 if result == "updated":
-                    return f"✅ User with LINE ID '{line_id}' updated successfully"
+                    return write_result(True, f"✅ User with LINE ID '{line_id}' updated successfully", line_user_id=line_id)
                 else:
-                    return f"✅ New user created with LINE ID '{line_id}' and ID: {result}"
+                    return write_result(True, f"✅ New user created with LINE ID '{line_id}' and ID: {result}", _id=result, line_user_id=line_id)
                     
             except Exception as e:
-                return f"❌ Error upserting user: {str(e)}"
+                return write_result(False, f"❌ Error upserting user: {str(e)}")
 
         @tool
         def delete_user_by_id(user_id: str) -> str:
@@ -447,18 +476,18 @@ class LangChainUsers(Users):
                 # First get user details for confirmation
                 user = self.get_user_by_id(user_id)
                 if not user:
-                    return f"❌ User with ID '{user_id}' not found"
+                    return write_result(False, f"❌ User with ID '{user_id}' not found")
                 
                 username = user.get('username', 'Unknown')
                 result = self.delete_user(user_id)
                 
                 if result > 0:
-                    return f"🗑️ User '{username}' (ID: {user_id}) deleted successfully"
+                    return write_result(True, f"🗑️ User '{username}' (ID: {user_id}) deleted successfully", username=username)
                 else:
-                    return f"❌ Failed to delete user with ID '{user_id}'"
+                    return write_result(False, f"❌ Failed to delete user with ID '{user_id}'")
                     
             except Exception as e:
-                return f"❌ Error deleting user: {str(e)}"
+                return write_result(False, f"❌ Error deleting user: {str(e)}")
 
         @tool
         def get_user_statistics() -> str:
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from service.agent.toolSelection import TokenUsageHandler
+from utills.metrics import REGISTRY
+
+load_dotenv()
+
+run_seconds = REGISTRY.histogram(
+    "agent_run_seconds",
+    "Wall time of one agent run (LLM path only), by model route, tool set and outcome",
+    ["route", "toolset", "outcome"],
+)
+llm_call_seconds = REGISTRY.histogram(
+    "agent_llm_call_seconds",
+    "Latency of one model call inside an agent run",
+    ["route", "toolset"],
+)
+tool_call_seconds = REGISTRY.histogram(
+    "agent_tool_call_seconds",
+    "Duration of one tool call",
+    ["tool", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+tool_result_bytes = REGISTRY.histogram(
+    "agent_tool_result_bytes",
+    "Size of the tool result passed back to the model",
+    ["tool"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536),
+)
+run_iterations = REGISTRY.histogram(
+    "agent_run_iterations",
+    "Model calls per agent run",
+    ["toolset"],
+    buckets=(1, 2, 3, 4, 6, 8, 10),
+)
+
+
+class TraceBuffer:
+    """
+    Recent structured traces. Runs slower than slow_ms are always kept (in
+    their own ring), other runs with probability sample_rate.
+    """
+
+    def __init__(self, size: int = 200, slow_ms: float = 5000.0, sample_rate: float = 0.05):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self._slow: deque = deque(maxlen=size)
+        self._sampled: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Dict[str, Any]) -> None:
+        if trace["duration_ms"] >= self.slow_ms:
+            with self._lock:
+                self._slow.append(trace)
+        elif random.random() < self.sample_rate:
+            with self._lock:
+                self._sampled.append(trace)
+
+    def recent(self, limit: int = 20, min_ms: float = 0.0) -> List[Dict[str, Any]]:
+        """Slowest first among the kept traces that took at least min_ms"""
+        with self._lock:
+            traces = [t for t in list(self._slow) + list(self._sampled) if t["duration_ms"] >= min_ms]
+        traces.sort(key=lambda t: t["duration_ms"], reverse=True)
+        return traces[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slow.clear()
+            self._sampled.clear()
+
+
+trace_buffer = TraceBuffer(
+    size=int(os.getenv("AGENT_TRACE_SIZE", "200")),
+    slow_ms=float(os.getenv("AGENT_TRACE_SLOW_MS", "5000")),
+    sample_rate=float(os.getenv("AGENT_TRACE_SAMPLE", "0.05")),
+)
+
+
+class AgentTracer(TokenUsageHandler):
+    """
+    Callback handler for one agent run: model latency and tokens per call,
+    each tool call's name, duration and result size, and the iteration count.
+    finish() exports the run to Prometheus and the trace buffer.
+    """
+
+    # called directly from the executor (sync and async), not via a thread pool
+    run_inline = True
+
+    def __init__(
+        self,
+        toolset: str,
+        user_id: str = "",
+        message: str = "",
+        route: str = "large",
+        buffer: TraceBuffer = trace_buffer,
+    ):
+        super().__init__(toolset)
+        self.route = route
+        self.buffer = buffer
+        self.user = hashlib.sha1(user_id.encode()).hexdigest()[:10] if user_id else ""
+        self.message_chars = len(message)
+        self.started = time.perf_counter()
+        self.steps: List[Dict[str, Any]] = []
+        self.iterations = 0
+        self._open: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _begin(self, run_id, *info) -> None:
+        with self._lock:
+            self._open[run_id] = (time.perf_counter(), *info)
+
+    def _end(self, run_id) -> Optional[tuple]:
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return None
+        return (time.perf_counter() - entry[0], *entry[1:])
+
+    # ---------- model ----------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._begin(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._begin(run_id)
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs) -> None:
+        before_in, before_out = self.input_tokens, self.output_tokens
+        super().on_llm_end(response, **kwargs)
+        ended = self._end(run_id)
+        seconds = ended[0] if ended else 0.0
+        llm_call_seconds.observe(seconds, route=self.route, toolset=self.toolset)
+        with self._lock:
+            self.iterations += 1
+            self.steps.append({
+                "kind": "llm",
+                "ms": round(seconds * 1000, 1),
+                "input_tokens": self.input_tokens - before_in,
+                "output_tokens": self.output_tokens - before_out,
+            })
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs) -> None:
+        ended = self._end(run_id)
+        with self._lock:
+            self.steps.append({"kind": "llm", "ms": round((ended[0] if ended else 0) * 1000, 1), "error": str(error)[:200]})
+
+    # ---------- tools ----------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._begin(run_id, (serialized or {}).get("name", "?"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        seconds, name = ended
+        content = getattr(output, "content", output)
+        size = len(str(content).encode())
+        tool_call_seconds.observe(seconds, tool=name, outcome="ok")
+        tool_result_bytes.observe(size, tool=name)
+        with self._lock:
+            self.steps.append({"kind": "tool", "name": name, "ms": round(seconds * 1000, 1), "result_bytes": size})
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        seconds, name = ended
+        tool_call_seconds.observe(seconds, tool=name, outcome="error")
+        with self._lock:
+            self.steps.append({"kind": "tool", "name": name, "ms": round(seconds * 1000, 1), "error": str(error)[:200]})
+
+    # ---------- export ----------
+
+    def finish(self, outcome: str = "ok") -> Dict[str, Any]:
+        duration = time.perf_counter() - self.started
+        self.report()
+        run_seconds.observe(duration, route=self.route, toolset=self.toolset, outcome=outcome)
+        run_iterations.observe(self.iterations, toolset=self.toolset)
+        trace = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "user": self.user,
+            "route": self.route,
+            "toolset": self.toolset,
+            "outcome": outcome,
+            "message_chars": self.message_chars,
+            "duration_ms": round(duration * 1000, 1),
+            "iterations": self.iterations,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "llm_ms": round(sum(s["ms"] for s in self.steps if s["kind"] == "llm"), 1),
+            "tool_ms": round(sum(s["ms"] for s in self.steps if s["kind"] == "tool"), 1),
+            "steps": list(self.steps),
+        }
+        self.buffer.add(trace)
+        return trace
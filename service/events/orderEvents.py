@@ -0,0 +1,168 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, TypedDict
+
+from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+
+load_dotenv()
+
+# inline = OrderService publishes after each write
+# change_stream = a watcher on the orders collection publishes instead (needs a replica set)
+ORDER_EVENT_SOURCE = os.getenv("ORDER_EVENT_SOURCE", "inline")
+
+
+class OrderEvent(TypedDict, total=False):
+    type: str          # "created" | "status_changed" | "cancelled"
+    order_id: str
+    status: str
+    userId: Optional[str]
+    at: datetime
+    # "created" only
+    product_name: str
+    addon: List[str]
+
+
+OrderEventHandler = Callable[[List[OrderEvent]], None]
+
+_STOP = object()
+
+
+class OrderEventBus:
+    """
+    In-process pub/sub for order events.
+
+    publish() only enqueues, so the write path never waits on subscribers.
+    A single worker thread drains the queue and hands each subscriber a batch
+    of events (up to batch_size, or whatever arrived within flush_interval).
+    """
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 0.5, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._subscribers: List[OrderEventHandler] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler: OrderEventHandler) -> None:
+        """Register a handler that receives a list of events per batch"""
+        if handler not in self._subscribers:
+            self._subscribers.append(handler)
+
+    def publish(self, event: OrderEvent) -> bool:
+        """Enqueue an event without blocking. Returns False if the queue is full."""
+        event.setdefault("at", datetime.utcnow())
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            print(f"⚠️ order event queue full, dropped event for order {event.get('order_id')}")
+            return False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="order-event-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending events and stop the worker"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self) -> tuple:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _dispatch(self, batch: List[OrderEvent]) -> None:
+        for handler in list(self._subscribers):
+            try:
+                handler(batch)
+            except Exception as e:
+                print(f"❌ order event subscriber {getattr(handler, '__name__', handler)} failed: {e}")
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._dispatch(batch)
+            if stopping:
+                return
+
+
+def watch_order_changes(collection, bus: "OrderEventBus") -> threading.Thread:
+    """
+    Feed the bus from a MongoDB change stream on the orders collection.
+    Picks new orders and status changes made by any writer (other workers, admin scripts, ...).
+    """
+    pipeline = [
+        {"$match": {"$or": [
+            {"operationType": "insert"},
+            {
+                "operationType": "update",
+                "updateDescription.updatedFields.status": {"$exists": True},
+            },
+        ]}}
+    ]
+
+    def run():
+        resume_token = None
+        while True:
+            try:
+                with collection.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change.get("fullDocument") or {}
+                        if change["operationType"] == "insert":
+                            bus.publish({
+                                "type": "created",
+                                "order_id": str(change["documentKey"]["_id"]),
+                                "status": doc.get("status", "pending"),
+                                "userId": doc.get("userId"),
+                                "product_name": doc.get("product_name"),
+                                "addon": doc.get("addon") or [],
+                            })
+                            continue
+                        status = change["updateDescription"]["updatedFields"]["status"]
+                        bus.publish({
+                            "type": "cancelled" if status == "cancelled" else "status_changed",
+                            "order_id": str(change["documentKey"]["_id"]),
+                            "status": status,
+                            "userId": doc.get("userId"),
+                        })
+            except PyMongoError as e:
+                print(f"⚠️ order change stream interrupted: {e}, retrying")
+                time.sleep(2)
+
+    thread = threading.Thread(target=run, name="order-change-stream", daemon=True)
+    thread.start()
+    return thread
+
+
+order_event_bus = OrderEventBus()
@@ -0,0 +1,49 @@
+from collections import Counter, deque
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from service.events.orderEvents import OrderEvent
+
+
+class KitchenFeed:
+    """Recent order events for the kitchen screen (newest last)"""
+
+    def __init__(self, maxlen: int = 200):
+        self._events: deque = deque(maxlen=maxlen)
+        self._lock = Lock()
+
+    def handle(self, events: List[OrderEvent]) -> None:
+        with self._lock:
+            self._events.extend(events)
+
+    def recent(self, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            events = list(self._events)
+        if since:
+            if since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            events = [e for e in events if e["at"] > since]
+        return [{**e, "at": e["at"].isoformat()} for e in events]
+
+
+class OrderStatusRollup:
+    """Count of status transitions per day"""
+
+    def __init__(self):
+        self._counts: Dict[str, Counter] = {}
+        self._lock = Lock()
+
+    def handle(self, events: List[OrderEvent]) -> None:
+        with self._lock:
+            for e in events:
+                day = e["at"].date().isoformat()
+                self._counts.setdefault(day, Counter())[e.get("status", "unknown")] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {day: dict(c) for day, c in self._counts.items()}
+
+
+kitchen_feed = KitchenFeed()
+status_rollup = OrderStatusRollup()
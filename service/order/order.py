@@ -8,6 +8,7 @@ from pymongo import MongoClient
 from pymongo.database import Database
 
 from service.product.product import ProductService
+from service.events.orderEvents import ORDER_EVENT_SOURCE, order_event_bus
 import os
 from dotenv import load_dotenv
 
@@ -55,7 +56,12 @@ class OrderService:
         #     return None
         order = dict(OrderSchema(**order_data))
         result = self.collection.insert_one(order)
-        return str(result.inserted_id)
+        orderId = str(result.inserted_id)
+        self._publish_event(
+            "created", orderId, order["status"],
+            userId=order["userId"], product_name=order["product_name"], addon=order["addon"],
+        )
+        return orderId
 
     # ---------- Read ----------
     def GetOrder(self, orderId: str) -> Optional[Dict[str, Any]]:
@@ -66,6 +72,13 @@ class OrderService:
         except Exception:
             return None
 
+    def GetOrders(self, orderIds: List[str]) -> List[Dict[str, Any]]:
+        """Find several orders by _id in one query."""
+        try:
+            return list(self.collection.find({"_id": {"$in": [ObjectId(i) for i in orderIds]}}))
+        except Exception:
+            return []
+
     def GetUserOrders(self, userId: str) -> List[Dict[str, Any]]:
         """Return all orders for a user (list)."""
         try:
@@ -120,6 +133,8 @@ class OrderService:
                 {"_id": ObjectId(orderId)},
                 {"$set": update_payload}
             )
+            if result.modified_count:
+                self._publish_event("status_changed", orderId, status)
             return int(result.modified_count)
         except Exception:
             return 0
@@ -135,6 +150,13 @@ class OrderService:
         except Exception:
             return 0
 
+    # ---------- Events ----------
+    def _publish_event(self, event_type: str, orderId: str, status: str, **fields: Any) -> None:
+        """Hand the change to the order event bus (non-blocking)."""
+        if ORDER_EVENT_SOURCE != "inline":
+            return
+        order_event_bus.publish({"type": event_type, "order_id": orderId, "status": status, **fields})
+
     # ---------- Cancel / Delete ----------
     def CancelOrder(self, orderId: str) -> int:
         """
@@ -146,6 +168,8 @@ class OrderService:
                 {"_id": ObjectId(orderId)},
                 {"$set": {"status": "cancelled", "Finish": datetime.utcnow(), "updateAt": datetime.utcnow()}}
             )
+            if result.modified_count:
+                self._publish_event("cancelled", orderId, "cancelled")
             return int(result.modified_count)
         except Exception:
             return 0
@@ -1,6 +1,7 @@
 from datetime import datetime
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional
 
 from bson import ObjectId
 from dotenv import load_dotenv
@@ -19,6 +20,36 @@ class ProductSchema(BaseModel):
     updateAt: datetime = Field(default_factory=datetime.utcnow)
 
 
+# ---------- Catalog change notification ----------
+# bumped on every product write in this process; caches key on it and
+# listeners (response cache, vector index, ...) get the changed product id
+
+_catalog_lock = threading.Lock()
+_catalog_version = 0
+_catalog_listeners: List[Callable[[Optional[str]], None]] = []
+
+
+def get_catalog_version() -> int:
+    return _catalog_version
+
+
+def on_catalog_change(listener: Callable[[Optional[str]], None]) -> None:
+    """Register a callback(product_id) run after any product write"""
+    if listener not in _catalog_listeners:
+        _catalog_listeners.append(listener)
+
+
+def notify_catalog_change(product_id: Optional[str] = None) -> None:
+    global _catalog_version
+    with _catalog_lock:
+        _catalog_version += 1
+    for listener in list(_catalog_listeners):
+        try:
+            listener(product_id)
+        except Exception as e:
+            print(f"❌ catalog listener failed: {e}")
+
+
 class ProductService:
     def __init__(self, uri: str = None):
         load_dotenv()
@@ -31,6 +62,7 @@ class ProductService:
     def CreateProduct(self, product_data: Dict[str, Any]) -> str:
         product = dict(ProductSchema(**product_data))
         result = self.collection.insert_one(product)
+        notify_catalog_change(str(result.inserted_id))
         return str(result.inserted_id)
 
     # ---------- Read ----------
@@ -49,12 +81,20 @@ class ProductService:
     def GetProductsByStatus(self, status: str) -> List[Dict[str, Any]]:
         return list(self.collection.find({"status": status}))
 
+    def FindSimilarProducts(self, query: str, k: int = 5, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Closest products by name/description (local vector index), best first"""
+        from service.product.productIndex import get_product_index
+
+        return get_product_index(self.collection).search(query, k=k, status=status)
+
     # ---------- Update ----------
     def UpdateProductName(self, product_id: str, new_name: str) -> int:
         result = self.collection.update_one(
             {"_id": ObjectId(product_id)},
             {"$set": {"product_name": new_name, "updateAt": datetime.utcnow()}}
         )
+        if result.modified_count:
+            notify_catalog_change(product_id)
         return int(result.modified_count)
 
     def UpdateProductPrice(self, product_id: str, price: float) -> int:
@@ -62,6 +102,8 @@ class ProductService:
             {"_id": ObjectId(product_id)},
             {"$set": {"price": price, "updateAt": datetime.utcnow()}}
         )
+        if result.modified_count:
+            notify_catalog_change(product_id)
         return int(result.modified_count)
 
     def UpdateProductStatus(self, product_id: str, status: str) -> int:
@@ -69,6 +111,8 @@ class ProductService:
             {"_id": ObjectId(product_id)},
             {"$set": {"status": status, "updateAt": datetime.utcnow()}}
         )
+        if result.modified_count:
+            notify_catalog_change(product_id)
         return int(result.modified_count)
 
     def UpdateProductDescription(self, product_id: str, description: str) -> int:
@@ -76,6 +120,8 @@ class ProductService:
             {"_id": ObjectId(product_id)},
             {"$set": {"description": description, "updateAt": datetime.utcnow()}}
         )
+        if result.modified_count:
+            notify_catalog_change(product_id)
         return int(result.modified_count)
 
     def UpdateProductImage(self, product_id: str, image_url: str) -> int:
@@ -83,9 +129,13 @@ class ProductService:
             {"_id": ObjectId(product_id)},
             {"$set": {"image": image_url, "updateAt": datetime.utcnow()}}
         )
+        if result.modified_count:
+            notify_catalog_change(product_id)
         return int(result.modified_count)
 
     # ---------- Delete ----------
     def DeleteProduct(self, product_id: str) -> int:
         result = self.collection.delete_one({"_id": ObjectId(product_id)})
+        if result.deleted_count:
+            notify_catalog_change(product_id)
         return int(result.deleted_count)
@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from utills.textVector import DIM, embed, normalize
+
+# fields kept next to each vector (returned with search results)
+META_FIELDS = ("product_name", "price", "status", "description")
+
+
+class ProductIndex:
+    """
+    In-memory vector index over product names + descriptions.
+
+    Vectors are the hashed character n-grams from utills.textVector (no model
+    download, works for Thai), stored row-wise in one float32 matrix so a
+    query is a single matrix-vector product + argpartition. Rows are updated
+    per product on catalog change; the whole index is rebuilt only on first
+    use, after an unknown change, or when older than max_age (writes made by
+    other processes).
+    """
+
+    def __init__(self, collection, max_age: float = 300.0, name_weight: float = 0.75):
+        self.collection = collection
+        self.max_age = max_age
+        self.name_weight = name_weight
+        self._ids: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._meta: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, DIM), dtype=np.float32)
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _vector(self, product: Dict[str, Any]) -> np.ndarray:
+        vector = embed(normalize(product.get("product_name", "")))
+        description = normalize(product.get("description") or "")
+        if description:
+            vector = self.name_weight * vector + (1 - self.name_weight) * embed(description)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+        return vector
+
+    @staticmethod
+    def _meta_of(product: Dict[str, Any]) -> Dict[str, Any]:
+        return {"_id": str(product["_id"]), **{f: product.get(f) for f in META_FIELDS}}
+
+    # ---------- Build / update ----------
+
+    def rebuild(self) -> None:
+        products = list(self.collection.find({}, {f: 1 for f in META_FIELDS}))
+        vectors = [self._vector(p) for p in products]
+        with self._lock:
+            self._ids = [str(p["_id"]) for p in products]
+            self._pos = {product_id: i for i, product_id in enumerate(self._ids)}
+            self._meta = [self._meta_of(p) for p in products]
+            self._matrix = np.vstack(vectors) if vectors else np.zeros((0, DIM), dtype=np.float32)
+            self._built_at = time.monotonic()
+
+    def upsert(self, product: Dict[str, Any]) -> None:
+        product_id = str(product["_id"])
+        vector = self._vector(product)
+        with self._lock:
+            if self._built_at is None:
+                return  # built lazily on first search
+            i = self._pos.get(product_id)
+            if i is None:
+                self._pos[product_id] = len(self._ids)
+                self._ids.append(product_id)
+                self._meta.append(self._meta_of(product))
+                self._matrix = np.vstack([self._matrix, vector[None, :]])
+            else:
+                self._meta[i] = self._meta_of(product)
+                self._matrix[i] = vector
+
+    def remove(self, product_id: str) -> None:
+        with self._lock:
+            i = self._pos.pop(product_id, None)
+            if i is None:
+                return
+            # move the last row into the hole
+            last = len(self._ids) - 1
+            if i != last:
+                self._ids[i] = self._ids[last]
+                self._meta[i] = self._meta[last]
+                self._matrix[i] = self._matrix[last]
+                self._pos[self._ids[i]] = i
+            self._ids.pop()
+            self._meta.pop()
+            self._matrix = self._matrix[:last]
+
+    def on_catalog_change(self, product_id: Optional[str]) -> None:
+        """Listener for service.product.product.on_catalog_change"""
+        if product_id is None:
+            with self._lock:
+                self._built_at = None
+            return
+        try:
+            product = self.collection.find_one({"_id": ObjectId(product_id)}, {f: 1 for f in META_FIELDS})
+        except Exception:
+            product = None
+        if product is None:
+            self.remove(product_id)
+        else:
+            self.upsert(product)
+
+    # ---------- Query ----------
+
+    def search(self, query: str, k: int = 5, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k products by cosine similarity to `query` (optionally only one status)"""
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+        vector = embed(normalize(query))
+        with self._lock:
+            if not self._ids:
+                return []
+            scores = self._matrix @ vector
+            if status is not None:
+                mask = np.array([m.get("status") == status for m in self._meta])
+                scores = np.where(mask, scores, -1.0)
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {**self._meta[i], "score": round(float(scores[i]), 3)}
+                for i in top
+                if scores[i] > 0
+            ]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+_indexes: Dict[str, ProductIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_product_index(collection) -> ProductIndex:
+    """One shared index per products collection, kept in sync with catalog changes"""
+    from service.product.product import on_catalog_change
+
+    key = collection.full_name
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ProductIndex(collection)
+            on_catalog_change(index.on_catalog_change)
+    return index
@@ -0,0 +1,275 @@
+"""
+Batch precompute of per-user recommendations.
+
+The item-item model is rebuilt from every order, then the top-N products of
+each user are ranked in worker processes and stored in
+Orders.recommendations (one doc per user, _id = userId), so a chat-time
+lookup is a single _id read. Incremental runs only re-rank users with
+orders created since the previous run; a full run (first run, every
+REC_BATCH_FULL_HOURS, or --full) re-ranks every active user and drops the
+docs of users who went inactive.
+
+    python -m service.recommendation.batch            # incremental
+    python -m service.recommendation.batch --full --workers 4
+
+Run it from cron, or let the app start it every REC_BATCH_INTERVAL_MINUTES
+(start_batch_scheduler; 0 = off). Every app process starts a scheduler, so
+a run first takes a lease in Orders.recommendation_runs: while another
+process holds it the run is skipped.
+"""
+import math
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from service.recommendation.recommendation import (
+    IGNORED_STATUSES,
+    co_occurrence,
+    item_similarity,
+    order_matrix,
+    popularity,
+    rank_rows,
+)
+
+load_dotenv()
+
+REC_BATCH_TOP_N = int(os.getenv("REC_BATCH_TOP_N", "20"))
+REC_BATCH_WORKERS = int(os.getenv("REC_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+REC_ACTIVE_DAYS = int(os.getenv("REC_ACTIVE_DAYS", "90"))
+REC_BATCH_FULL_HOURS = float(os.getenv("REC_BATCH_FULL_HOURS", "24"))
+REC_BATCH_INTERVAL_MINUTES = float(os.getenv("REC_BATCH_INTERVAL_MINUTES", "30"))
+# longest a run may hold the lease (a crashed run blocks the others this long)
+REC_BATCH_LEASE_MINUTES = float(os.getenv("REC_BATCH_LEASE_MINUTES", "60"))
+
+LEASE_ID = "lease"
+
+# below this many users, ranking inline is faster than starting processes
+PARALLEL_MIN_USERS = 2000
+WRITE_BATCH = 1000
+
+
+class RecommendationStore:
+    """Precomputed top-N per user (Orders.recommendations) + run log (Orders.recommendation_runs)"""
+
+    def __init__(self, database):
+        self.collection = database["recommendations"]
+        self.runs = database["recommendation_runs"]
+        self.orders = database["orders"]
+
+    def lookup(self, user_id: str, n: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """
+        Stored recommendations for a user, or None if the batch has not
+        covered them or they have ordered since (the stored list would still
+        offer what they just ordered)
+        """
+        doc = self.collection.find_one(
+            {"_id": str(user_id)},
+            {"items": {"$slice": n}, "scores": {"$slice": n}, "computedAt": 1},
+        )
+        if doc is None:
+            return None
+        newer = self.orders.find_one(
+            {
+                "userId": str(user_id),
+                "createAt": {"$gt": doc["computedAt"]},
+                "status": {"$nin": list(IGNORED_STATUSES)},
+            },
+            {"_id": 1},
+        )
+        if newer is not None:
+            return None
+        return [{"item_name": i, "score": s} for i, s in zip(doc["items"], doc["scores"])]
+
+    def save(self, docs: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(docs), WRITE_BATCH):
+            self.collection.bulk_write(
+                [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs[start:start + WRITE_BATCH]],
+                ordered=False,
+            )
+
+    def drop_older_than(self, computed_at: datetime) -> int:
+        return self.collection.delete_many({"computedAt": {"$lt": computed_at}}).deleted_count
+
+    def last_run(self, full_only: bool = False) -> Optional[Dict[str, Any]]:
+        query = {"full": True} if full_only else {"full": {"$exists": True}}
+        return self.runs.find_one(query, sort=[("startedAt", -1)])
+
+    def log_run(self, run: Dict[str, Any]) -> None:
+        self.runs.insert_one(dict(run))
+
+    def acquire_lease(self, owner: str, minutes: float) -> bool:
+        """Take the batch lease unless another owner holds an unexpired one"""
+        now = datetime.now()
+        try:
+            self.runs.update_one(
+                {"_id": LEASE_ID, "$or": [{"expiresAt": {"$lte": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "expiresAt": now + timedelta(minutes=minutes)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # the lease doc exists and did not match: held by someone else
+            return False
+        return True
+
+    def release_lease(self, owner: str, until: Optional[datetime] = None) -> None:
+        """Free the lease now, or keep others out until `until`"""
+        self.runs.update_one(
+            {"_id": LEASE_ID, "owner": owner},
+            {"$set": {"expiresAt": until or datetime.now()}},
+        )
+
+
+# ---------- Worker processes ----------
+
+_model: Dict[str, Any] = {}
+
+
+def _init_worker(sim: np.ndarray, is_product: np.ndarray, item_popularity: np.ndarray, top_n: int) -> None:
+    _model.update(sim=sim, is_product=is_product, item_popularity=item_popularity, top_n=top_n)
+
+
+def _rank_chunk(counts: np.ndarray):
+    return rank_rows(counts, **_model)
+
+
+# ---------- Job ----------
+
+def run_batch(
+    database,
+    full: bool = False,
+    workers: int = REC_BATCH_WORKERS,
+    top_n: int = REC_BATCH_TOP_N,
+    active_days: int = REC_ACTIVE_DAYS,
+) -> Dict[str, Any]:
+    """Recompute and store recommendations; returns the run summary"""
+    started = datetime.now()
+    t0 = time.perf_counter()
+    orders = database["orders"]
+    store = RecommendationStore(database)
+
+    last = store.last_run()
+    last_full = store.last_run(full_only=True)
+    if last is None or last_full is None or started - last_full["startedAt"] > timedelta(hours=REC_BATCH_FULL_HOURS):
+        full = True
+
+    # similarities need the whole history, ranking only the target users
+    cursor = orders.find(
+        {"status": {"$nin": list(IGNORED_STATUSES)}},
+        {"userId": 1, "product_name": 1, "addon": 1},
+    )
+    users, items, is_product, counts = order_matrix(cursor)
+    sim = item_similarity(co_occurrence(counts))
+    item_popularity = popularity(counts)
+    names = [key.split(":", 1)[1] for key in items]
+
+    since = started - timedelta(days=active_days) if full else last["startedAt"]
+    targets = [str(u) for u in orders.distinct("userId", {"createAt": {"$gte": since}})]
+    rows = np.array([users[u] for u in targets if u in users], dtype=np.int64)
+    user_ids = list(users)
+
+    if len(rows) >= PARALLEL_MIN_USERS and workers > 1:
+        chunk = math.ceil(len(rows) / (workers * 4))
+        chunks = [counts[rows[i:i + chunk]] for i in range(0, len(rows), chunk)]
+        # spawn: workers import only this module, not the web app
+        with multiprocessing.get_context("spawn").Pool(
+            workers, initializer=_init_worker, initargs=(sim, is_product, item_popularity, top_n),
+        ) as pool:
+            ranked = pool.map(_rank_chunk, chunks)
+        top = np.vstack([r[0] for r in ranked]) if ranked else np.zeros((0, top_n), dtype=np.int32)
+        scores = np.vstack([r[1] for r in ranked]) if ranked else np.zeros((0, top_n), dtype=np.float32)
+    else:
+        top, scores = rank_rows(counts[rows], sim, is_product, item_popularity, top_n)
+
+    docs = []
+    for row, best, best_scores in zip(rows, top, scores):
+        valid = best >= 0
+        docs.append({
+            "_id": user_ids[row],
+            "items": [names[i] for i in best[valid]],
+            "scores": [round(float(s), 4) for s in best_scores[valid]],
+            "computedAt": started,
+        })
+    store.save(docs)
+    dropped = store.drop_older_than(started) if full else 0
+
+    run = {
+        "startedAt": started,
+        "full": full,
+        "users": len(docs),
+        "dropped": dropped,
+        "items": len(names),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    store.log_run(run)
+    return run
+
+
+# ---------- Scheduling ----------
+
+def start_batch_scheduler(interval_minutes: float = REC_BATCH_INTERVAL_MINUTES) -> Optional[threading.Thread]:
+    """
+    Run the batch as a child process (python -m service.recommendation.batch)
+    now and then every interval_minutes, so its worker processes never
+    import the web app. The child keeps the lease for most of the interval
+    after it finishes, so N app processes still give about one run per
+    interval. Returns None when disabled.
+    """
+    if interval_minutes <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                result = subprocess.run(
+                    [sys.executable, "-m", "service.recommendation.batch", "--hold-minutes", str(interval_minutes * 0.9)],
+                    capture_output=True, text=True, timeout=interval_minutes * 60,
+                )
+                if result.returncode != 0:
+                    print(f"❌ recommendation batch failed: {result.stderr.strip()[-500:]}")
+                else:
+                    print(result.stdout.strip())
+            except Exception as e:
+                print(f"❌ recommendation batch failed: {e}")
+            time.sleep(interval_minutes * 60)
+
+    thread = threading.Thread(target=loop, name="recommendation-batch", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(description="Precompute per-user recommendations")
+    arg_parser.add_argument("--full", action="store_true", help="re-rank every active user")
+    arg_parser.add_argument("--workers", type=int, default=REC_BATCH_WORKERS)
+    arg_parser.add_argument("--top-n", type=int, default=REC_BATCH_TOP_N)
+    arg_parser.add_argument(
+        "--hold-minutes", type=float, default=0.0,
+        help="keep other processes from starting a run this long after this one started",
+    )
+    options = arg_parser.parse_args()
+
+    database = MongoClient(os.getenv("MONGODB_URI"))["Orders"]
+    store = RecommendationStore(database)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    started = datetime.now()
+    if not store.acquire_lease(owner, max(REC_BATCH_LEASE_MINUTES, options.hold_minutes)):
+        print("⏭️ recommendation batch skipped: another process holds the lease")
+        sys.exit(0)
+    try:
+        run = run_batch(database, full=options.full, workers=options.workers, top_n=options.top_n)
+    finally:
+        store.release_lease(owner, started + timedelta(minutes=options.hold_minutes))
+    mode = "full" if run["full"] else "incremental"
+    print(f"✅ recommendation batch ({mode}): {run['users']} users, {run['items']} items in {run['seconds']}s")
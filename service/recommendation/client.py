@@ -0,0 +1,272 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from utills.deadline import remaining
+from utills.metrics import REGISTRY
+
+load_dotenv()
+
+RECOMMENDER_URL = os.getenv("RECOMMENDER_URL", "http://127.0.0.1:8080")
+
+client_requests = REGISTRY.counter(
+    "recommendation_client_requests_total",
+    "Recommendation lookups by endpoint and result (hit/stale/miss/error/open)",
+    ["endpoint", "result"],
+)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; while open
+    no request is made for `reset_timeout` seconds; then one trial request
+    (half-open) closes it again on success.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a half-open trial that was never sent (deadline spent, cancelled)"""
+        with self._lock:
+            self._trial = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RecommendationClient:
+    """
+    Client for the recommendation HTTP service.
+
+    - one pooled keep-alive httpx client per mode (sync / async)
+    - results cached per (endpoint, user): fresh for `ttl`, then served stale
+      for up to `stale_ttl` while one background request refreshes them
+    - when the breaker is open, cached (even expired) or empty results are
+      returned immediately
+    Larger n is fetched once (`fetch_n`) and sliced, so different n share
+    a cache entry.
+    """
+
+    def __init__(
+        self,
+        base_url: str = RECOMMENDER_URL,
+        timeout: float = 2.0,
+        trending_ttl: float = 300.0,
+        user_ttl: float = 120.0,
+        stale_ttl: float = 1800.0,
+        fetch_n: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.trending_ttl = trending_ttl
+        self.user_ttl = user_ttl
+        self.stale_ttl = stale_ttl
+        self.fetch_n = fetch_n
+        self.breaker = breaker or CircuitBreaker()
+        limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout, limits=limits)
+        self._limits = limits
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # key -> (fetched_at, items)
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="recommendation-refresh")
+
+    # ---------- public API ----------
+
+    def trending(self, n: int = 5) -> List[Dict[str, Any]]:
+        return self._get("trending", "/trending", self.trending_ttl)[:n]
+
+    def for_user(self, user_id: str, n: int = 5) -> List[Dict[str, Any]]:
+        return self._get(f"user:{user_id}", f"/recommendations/{user_id}", self.user_ttl)[:n]
+
+    async def atrending(self, n: int = 5) -> List[Dict[str, Any]]:
+        return (await self._aget("trending", "/trending", self.trending_ttl))[:n]
+
+    async def afor_user(self, user_id: str, n: int = 5) -> List[Dict[str, Any]]:
+        return (await self._aget(f"user:{user_id}", f"/recommendations/{user_id}", self.user_ttl))[:n]
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(f"user:{user_id}", None)
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def aclose(self) -> None:
+        self._client.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    # ---------- cache ----------
+
+    def _lookup(self, key: str, ttl: float) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return "miss", None
+        age = time.monotonic() - entry[0]
+        if age < ttl:
+            return "hit", entry[1]
+        if age < ttl + self.stale_ttl:
+            return "stale", entry[1]
+        return "expired", entry[1]
+
+    def _store(self, key: str, items: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic(), items)
+
+    def _claim_refresh(self, key: str) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key: str) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def _get(self, key: str, path: str, ttl: float) -> List[Dict[str, Any]]:
+        endpoint = key.split(":")[0]
+        state, cached = self._lookup(key, ttl)
+        if state == "hit":
+            client_requests.inc(endpoint=endpoint, result="hit")
+            return cached
+        if state == "stale":
+            client_requests.inc(endpoint=endpoint, result="stale")
+            if self._claim_refresh(key):
+                self._refresher.submit(self._refresh, key, path)
+            return cached
+        if not self.breaker.allow():
+            client_requests.inc(endpoint=endpoint, result="open")
+            return cached or []
+        client_requests.inc(endpoint=endpoint, result="miss")
+        items = self._fetch(key, path)
+        return items if items is not None else (cached or [])
+
+    async def _aget(self, key: str, path: str, ttl: float) -> List[Dict[str, Any]]:
+        endpoint = key.split(":")[0]
+        state, cached = self._lookup(key, ttl)
+        if state == "hit":
+            client_requests.inc(endpoint=endpoint, result="hit")
+            return cached
+        if state == "stale":
+            client_requests.inc(endpoint=endpoint, result="stale")
+            if self._claim_refresh(key):
+                asyncio.get_running_loop().create_task(self._arefresh(key, path))
+            return cached
+        if not self.breaker.allow():
+            client_requests.inc(endpoint=endpoint, result="open")
+            return cached or []
+        client_requests.inc(endpoint=endpoint, result="miss")
+        items = await self._afetch(key, path)
+        return items if items is not None else (cached or [])
+
+    # ---------- HTTP ----------
+
+    def _refresh(self, key: str, path: str) -> None:
+        try:
+            if self.breaker.allow():
+                self._fetch(key, path)
+        finally:
+            self._release_refresh(key)
+
+    async def _arefresh(self, key: str, path: str) -> None:
+        try:
+            if self.breaker.allow():
+                await self._afetch(key, path)
+        finally:
+            self._release_refresh(key)
+
+    def _fetch(self, key: str, path: str) -> Optional[List[Dict[str, Any]]]:
+        timeout = remaining(self.timeout)
+        if timeout <= 0:
+            # request deadline already spent; not the service's fault
+            self.breaker.release()
+            return None
+        try:
+            response = self._client.get(
+                path, params={"n_recommendations": self.fetch_n}, timeout=timeout
+            )
+            response.raise_for_status()
+            items = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self.breaker.failure()
+            client_requests.inc(endpoint=key.split(":")[0], result="error")
+            print(f"⚠️ recommendation service {path}: {e}")
+            return None
+        self.breaker.success()
+        self._store(key, items)
+        return items
+
+    async def _afetch(self, key: str, path: str) -> Optional[List[Dict[str, Any]]]:
+        timeout = remaining(self.timeout)
+        if timeout <= 0:
+            # request deadline already spent; not the service's fault
+            self.breaker.release()
+            return None
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self._limits)
+        try:
+            response = await self._async_client.get(
+                path, params={"n_recommendations": self.fetch_n}, timeout=timeout
+            )
+            response.raise_for_status()
+            items = response.json()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except (httpx.HTTPError, ValueError) as e:
+            self.breaker.failure()
+            client_requests.inc(endpoint=key.split(":")[0], result="error")
+            print(f"⚠️ recommendation service {path}: {e}")
+            return None
+        self.breaker.success()
+        self._store(key, items)
+        return items
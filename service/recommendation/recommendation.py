@@ -1,4 +1,325 @@
-class Recommendation():
-    def __init__(self):
-        pass
-    
\ No newline at end of file
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from service.events.orderEvents import OrderEvent, order_event_bus
+
+# orders that never happened are not a preference signal
+IGNORED_STATUSES = ("cancelled",)
+
+# rows scored per matrix product in rebuild() (bounds the users x items temp)
+RANK_BLOCK = 4096
+
+
+def item_key(name: str, product: bool) -> str:
+    return ("p:" if product else "a:") + name
+
+
+def addon_names(addon: Any) -> List[str]:
+    # List[str] in OrderSchema, older orders may hold a dict
+    if isinstance(addon, str):
+        return [addon] if addon else []
+    if isinstance(addon, dict):
+        addon = list(addon)
+    if isinstance(addon, (list, tuple)):
+        return [str(a) for a in addon if a]
+    return []
+
+
+def order_matrix(orders: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, int], Dict[str, int], np.ndarray, np.ndarray]:
+    """
+    (user rows, item columns keyed by item_key, is_product per column,
+    user x item count matrix) from order docs with userId/product_name/addon
+    """
+    users: Dict[str, int] = {}
+    items: Dict[str, int] = {}
+    is_product: List[bool] = []
+    rows: List[int] = []
+    cols: List[int] = []
+
+    def column(name: str, product: bool) -> int:
+        key = item_key(name, product)
+        if key not in items:
+            items[key] = len(items)
+            is_product.append(product)
+        return items[key]
+
+    for order in orders:
+        user_id, product_name = order.get("userId"), order.get("product_name")
+        if not user_id or not product_name:
+            continue
+        u = users.setdefault(str(user_id), len(users))
+        rows.append(u)
+        cols.append(column(product_name, True))
+        for addon in addon_names(order.get("addon")):
+            rows.append(u)
+            cols.append(column(addon, False))
+
+    counts = np.zeros((len(users), len(items)), dtype=np.float32)
+    np.add.at(counts, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), 1.0)
+    return users, items, np.asarray(is_product, dtype=bool), counts
+
+
+def co_occurrence(counts: np.ndarray) -> np.ndarray:
+    seen = (counts > 0).astype(np.float32)
+    return seen.T @ seen
+
+
+def item_similarity(cooc: np.ndarray) -> np.ndarray:
+    """Cosine similarity between items from their co-occurrence counts (diagonal zeroed)"""
+    support = np.sqrt(np.diag(cooc))
+    norm = np.outer(support, support)
+    sim = np.divide(cooc, norm, out=np.zeros_like(cooc), where=norm > 0)
+    np.fill_diagonal(sim, 0.0)
+    return sim
+
+
+def popularity(counts: np.ndarray) -> np.ndarray:
+    """Order count per item scaled to [0, 1]"""
+    totals = counts.sum(axis=0)
+    top = totals.max() if totals.size else 0.0
+    return totals / top if top > 0 else totals
+
+
+def rank_rows(
+    counts: np.ndarray,
+    sim: np.ndarray,
+    is_product: np.ndarray,
+    item_popularity: np.ndarray,
+    top_n: int,
+    addon_weight: float = 0.5,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-n product columns (-1 = none) and scores for each row of `counts`,
+    in one matrix product; already-ordered products are excluded
+    """
+    top = np.full((counts.shape[0], top_n), -1, dtype=np.int32)
+    top_scores = np.zeros((counts.shape[0], top_n), dtype=np.float32)
+    if not counts.shape[0] or not counts.shape[1]:
+        return top, top_scores
+
+    weights = np.where(is_product, 1.0, addon_weight).astype(np.float32)
+    scores = (np.log1p(counts) * weights) @ sim
+    # popularity breaks ties and fills in when neighbours run out
+    scores += 1e-3 * item_popularity
+    scores[:, ~is_product] = -np.inf
+    scores[counts > 0] = -np.inf
+
+    k = min(top_n, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    valid = np.isfinite(best_scores)
+    top[:, :k] = np.where(valid, best, -1)
+    top_scores[:, :k] = np.where(valid, best_scores, 0.0)
+    return top, top_scores
+
+
+class Recommendation:
+    """
+    Built-in item-to-item collaborative filtering over Orders.orders.
+
+    - a dense user x item count matrix (menus are tens to hundreds of items,
+      so dense float32 beats a sparse format and needs no SciPy); products
+      and addons are both columns, addons only count addon_weight and are
+      never recommended themselves
+    - item-item cosine similarity on the binarized matrix (co-occurrence of
+      "ordered by the same user" / sqrt(popularity_i * popularity_j))
+    - the top_n products per user are precomputed in one vectorized pass,
+      already-ordered products excluded and the gaps filled by popularity
+      (covers new users as well)
+    - a new order is folded in by updating one row of counts and the affected
+      co-occurrence block; other users' rows are re-ranked lazily on read
+    - a full rebuild only runs on first use or when older than max_age
+      (picks up cancellations and writes from other processes)
+    """
+
+    def __init__(
+        self,
+        collection,
+        top_n: int = 20,
+        addon_weight: float = 0.5,
+        max_age: float = 3600.0,
+    ):
+        self.collection = collection
+        self.top_n = top_n
+        self.addon_weight = addon_weight
+        self.max_age = max_age
+
+        self._user_pos: Dict[str, int] = {}
+        self._user_ids: List[str] = []
+        self._item_pos: Dict[str, int] = {}
+        self._item_names: List[str] = []
+        self._is_product = np.zeros(0, dtype=bool)
+        self._counts = np.zeros((0, 0), dtype=np.float32)   # users x items
+        self._cooc = np.zeros((0, 0), dtype=np.float32)     # items x items
+        self._sim = np.zeros((0, 0), dtype=np.float32)
+        self._top = np.zeros((0, top_n), dtype=np.int32)    # item columns, best first (-1 = none)
+        self._top_scores = np.zeros((0, top_n), dtype=np.float32)
+        self._ranked_at = np.zeros(0, dtype=np.int64)       # model version each row was ranked at
+        self._version = 0
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ---------- Build ----------
+
+    def rebuild(self) -> None:
+        """Reload every order and recompute similarities + all users' top-N"""
+        cursor = self.collection.find(
+            {"status": {"$nin": list(IGNORED_STATUSES)}},
+            {"userId": 1, "product_name": 1, "addon": 1},
+        )
+        users, items, is_product, counts = order_matrix(cursor)
+
+        with self._lock:
+            self._user_ids = list(users)
+            self._user_pos = users
+            self._item_names = [key.split(":", 1)[1] for key in items]
+            self._item_pos = items
+            self._is_product = is_product
+            self._counts = counts
+            self._cooc = co_occurrence(counts)
+            self._sim = item_similarity(self._cooc)
+            self._top = np.full((len(users), self.top_n), -1, dtype=np.int32)
+            self._top_scores = np.zeros((len(users), self.top_n), dtype=np.float32)
+            self._ranked_at = np.full(len(users), -1, dtype=np.int64)
+            for start in range(0, len(users), RANK_BLOCK):
+                self._rank(np.arange(start, min(start + RANK_BLOCK, len(users))))
+            self._built_at = time.monotonic()
+        print(f"✅ recommendation model built: {len(users)} users x {len(items)} items")
+
+    def _ensure_built(self) -> None:
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    # ---------- Incremental updates ----------
+
+    def add_order(self, user_id: str, product_name: str, addon: Any = None) -> None:
+        """Fold one new order into the model (no rebuild)"""
+        if not user_id or not product_name:
+            return
+        with self._lock:
+            if self._built_at is None:
+                return  # built lazily on first read, which will include this order
+            u = self._user_row(str(user_id))
+            columns = [self._item_column(product_name, True)]
+            columns += [self._item_column(a, False) for a in addon_names(addon)]
+
+            before = self._counts[u] > 0
+            np.add.at(self._counts[u], columns, 1.0)
+            after = self._counts[u] > 0
+            if (after != before).any():
+                # co-occurrence only changes between the user's items, and only
+                # by pairs that involve a newly seen item
+                idx = np.flatnonzero(after)
+                old = before[idx].astype(np.float32)
+                self._cooc[np.ix_(idx, idx)] += 1.0 - np.outer(old, old)
+                self._sim = item_similarity(self._cooc)
+            self._version += 1
+            self._rank(np.array([u]))
+
+    def handle(self, events: List[OrderEvent]) -> None:
+        """Order event bus subscriber: fold in newly created orders"""
+        for event in events:
+            if event.get("type") == "created":
+                try:
+                    self.add_order(event.get("userId"), event.get("product_name"), event.get("addon"))
+                except Exception as e:
+                    print(f"❌ failed to fold order {event.get('order_id')} into recommendations: {e}")
+
+    # ---------- Query ----------
+
+    def for_user(self, user_id: str, n: int = 5) -> List[Dict[str, Any]]:
+        """Top-n products for a user (popular products for unknown users)"""
+        self._ensure_built()
+        with self._lock:
+            u = self._user_pos.get(str(user_id))
+            if u is None:
+                return self._popular(n)
+            if self._ranked_at[u] != self._version:
+                self._rank(np.array([u]))
+            top, scores = self._top[u], self._top_scores[u]
+            return [
+                {"item_name": self._item_names[i], "score": round(float(s), 4)}
+                for i, s in zip(top[:n], scores[:n])
+                if i >= 0
+            ]
+
+    def popular(self, n: int = 5) -> List[Dict[str, Any]]:
+        """All-time most ordered products"""
+        self._ensure_built()
+        with self._lock:
+            return self._popular(n)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._user_ids),
+                "items": len(self._item_names),
+                "products": int(self._is_product.sum()),
+                "version": self._version,
+                "age_seconds": None if self._built_at is None else round(time.monotonic() - self._built_at, 1),
+            }
+
+    # ---------- Internals (call with the lock held) ----------
+
+    def _user_row(self, user_id: str) -> int:
+        u = self._user_pos.get(user_id)
+        if u is not None:
+            return u
+        u = len(self._user_ids)
+        self._user_pos[user_id] = u
+        self._user_ids.append(user_id)
+        self._counts = np.vstack([self._counts, np.zeros((1, self._counts.shape[1]), dtype=np.float32)])
+        self._top = np.vstack([self._top, np.full((1, self.top_n), -1, dtype=np.int32)])
+        self._top_scores = np.vstack([self._top_scores, np.zeros((1, self.top_n), dtype=np.float32)])
+        self._ranked_at = np.append(self._ranked_at, -1)
+        return u
+
+    def _item_column(self, name: str, product: bool) -> int:
+        key = item_key(name, product)
+        i = self._item_pos.get(key)
+        if i is not None:
+            return i
+        i = len(self._item_names)
+        self._item_pos[key] = i
+        self._item_names.append(name)
+        self._is_product = np.append(self._is_product, product)
+        self._counts = np.hstack([self._counts, np.zeros((self._counts.shape[0], 1), dtype=np.float32)])
+        self._cooc = np.pad(self._cooc, ((0, 1), (0, 1)))
+        return i
+
+    def _popular(self, n: int) -> List[Dict[str, Any]]:
+        scores = np.where(self._is_product, popularity(self._counts), -1.0)
+        order = np.argsort(-scores)[:n]
+        return [
+            {"item_name": self._item_names[i], "score": round(float(scores[i]), 4)}
+            for i in order
+            if scores[i] > 0
+        ]
+
+    def _rank(self, rows: np.ndarray) -> None:
+        """Recompute top_n for the given user rows in one matrix product"""
+        self._top[rows], self._top_scores[rows] = rank_rows(
+            self._counts[rows], self._sim, self._is_product, popularity(self._counts), self.top_n, self.addon_weight,
+        )
+        self._ranked_at[rows] = self._version
+
+
+_engines: Dict[str, Recommendation] = {}
+_engines_lock = threading.Lock()
+
+
+def get_recommendation_engine(collection) -> Recommendation:
+    """One shared engine per orders collection, fed by the order event bus"""
+    key = collection.full_name
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = Recommendation(collection)
+            order_event_bus.subscribe(engine.handle)
+    return engine
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from service.product.product import get_catalog_version
+from service.recommendation.recommendation import IGNORED_STATUSES
+
+# (user_id, k) -> candidate dicts with item_name / score, best first
+CandidateSource = Callable[[str, int], List[Dict[str, Any]]]
+
+# candidates pulled per request before filtering + re-ranking
+CANDIDATES = 20
+
+
+class AvailableCatalog:
+    """
+    Names of the products currently "available". Reloaded when the catalog
+    version moves (writes in this process) or after max_age (other processes).
+    """
+
+    def __init__(self, product_service, max_age: float = 60.0):
+        self.product_service = product_service
+        self.max_age = max_age
+        self._names: Optional[FrozenSet[str]] = None
+        self._version = -1
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def names(self) -> FrozenSet[str]:
+        version = get_catalog_version()
+        with self._lock:
+            if self._names is not None and version == self._version and time.monotonic() - self._loaded_at < self.max_age:
+                return self._names
+        products = self.product_service.GetProductsByStatus("available")
+        names = frozenset(p["product_name"] for p in products if p.get("product_name"))
+        with self._lock:
+            self._names, self._version, self._loaded_at = names, version, time.monotonic()
+        return names
+
+
+def _time_histograms(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """{product_name: 24 x 7 order counts} from $group rows of (p, h, d) -> n"""
+    histograms: Dict[str, np.ndarray] = {}
+    for row in rows:
+        key = row["_id"]
+        if not key.get("p") or key.get("h") is None or key.get("d") is None:
+            continue
+        histogram = histograms.setdefault(key["p"], np.zeros((24, 7), dtype=np.float32))
+        # $dayOfWeek is 1 = Sunday .. 7 = Saturday, datetime.weekday() is 0 = Monday
+        histogram[int(key["h"]), (int(key["d"]) - 2) % 7] += row["n"]
+    return histograms
+
+
+class ContextReranker:
+    """
+    Second stage after collaborative filtering / the batch lookup:
+
+    1. drop candidates that are not available right now (AvailableCatalog)
+    2. add back the available products the user has ordered before
+       (collaborative filtering excludes them), each scored repeat_weight x
+       the best candidate score x its orders / the user's most ordered
+    3. multiply each score by how well the item fits the moment:
+       lift = P(item is ordered in this hour | item) / uniform, where "this
+       hour" is the current hour (smoothed +-1h) blended with the hours the
+       user usually orders in; the same for the day of week
+
+    Hour/day histograms come from createAt via one aggregation for all
+    items (cached profile_ttl) and one per user (cached user_ttl); the
+    scoring is a couple of matrix-vector products over the candidate set.
+    """
+
+    def __init__(
+        self,
+        orders,
+        catalog: AvailableCatalog,
+        candidates: CandidateSource,
+        fallback: Optional[Callable[[int], List[Dict[str, Any]]]] = None,
+        hour_weight: float = 0.3,
+        day_weight: float = 0.2,
+        user_weight: float = 0.5,
+        repeat_weight: float = 0.5,
+        profile_ttl: float = 3600.0,
+        user_ttl: float = 300.0,
+        max_users: int = 1000,
+    ):
+        self.orders = orders
+        self.catalog = catalog
+        self.candidates = candidates
+        self.fallback = fallback
+        self.hour_weight = hour_weight
+        self.day_weight = day_weight
+        self.user_weight = user_weight
+        self.repeat_weight = repeat_weight
+        self.profile_ttl = profile_ttl
+        self.user_ttl = user_ttl
+        self.max_users = max_users
+        self._items: Dict[str, int] = {}
+        self._item_hours = np.zeros((0, 24), dtype=np.float32)
+        self._item_days = np.zeros((0, 7), dtype=np.float32)
+        self._profiles_at: Optional[float] = None
+        # user_id -> (loaded at, 24 x 7 histogram, orders per product)
+        self._users: "OrderedDict[str, Tuple[float, np.ndarray, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- Profiles ----------
+
+    def _aggregate(self, match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return list(self.orders.aggregate([
+            {"$match": {**match, "status": {"$nin": list(IGNORED_STATUSES)}, "createAt": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"p": "$product_name", "h": {"$hour": "$createAt"}, "d": {"$dayOfWeek": "$createAt"}},
+                "n": {"$sum": 1},
+            }},
+        ]))
+
+    def refresh_profiles(self) -> None:
+        """Hour-of-day / day-of-week distribution of every product (Laplace smoothed)"""
+        histograms = _time_histograms(self._aggregate({}))
+        names = list(histograms)
+        counts = np.stack([histograms[n] for n in names]) if names else np.zeros((0, 24, 7), dtype=np.float32)
+        hours = counts.sum(axis=2) + 1.0
+        days = counts.sum(axis=1) + 1.0
+        with self._lock:
+            self._items = {name: i for i, name in enumerate(names)}
+            self._item_hours = hours / hours.sum(axis=1, keepdims=True)
+            self._item_days = days / days.sum(axis=1, keepdims=True)
+            self._profiles_at = time.monotonic()
+
+    def _user_profile(self, user_id: str) -> Tuple[np.ndarray, Dict[str, float]]:
+        """24 x 7 order counts of one user and their orders per product (cached)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and now - entry[0] < self.user_ttl:
+                self._users.move_to_end(user_id)
+                return entry[1], entry[2]
+        histograms = _time_histograms(self._aggregate({"userId": user_id}))
+        histogram = sum(histograms.values(), np.zeros((24, 7), dtype=np.float32))
+        ordered = {name: float(h.sum()) for name, h in histograms.items()}
+        with self._lock:
+            self._users[user_id] = (now, histogram, ordered)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return histogram, ordered
+
+    def _context(self, user_id: str, now: datetime) -> Tuple[np.ndarray, np.ndarray]:
+        """Hour (24) and weekday (7) weights of "now" for this user, each summing to 1"""
+        hours = np.zeros(24, dtype=np.float32)
+        hours[[(now.hour - 1) % 24, now.hour, (now.hour + 1) % 24]] = (0.25, 0.5, 0.25)
+        days = np.zeros(7, dtype=np.float32)
+        days[now.weekday()] = 1.0
+
+        histogram, _ = self._user_profile(user_id)
+        total = histogram.sum()
+        if total > 0:
+            hours = (1 - self.user_weight) * hours + self.user_weight * histogram.sum(axis=1) / total
+            days = (1 - self.user_weight) * days + self.user_weight * histogram.sum(axis=0) / total
+        return hours, days
+
+    # ---------- Ranking ----------
+
+    def rerank(self, user_id: str, candidates: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Available candidates re-scored for the current time, best first"""
+        if self._profiles_at is None or time.monotonic() - self._profiles_at > self.profile_ttl:
+            self.refresh_profiles()
+        available = self.catalog.names()
+        candidates = [c for c in candidates if c.get("item_name") in available]
+        if not candidates:
+            return []
+
+        hours, days = self._context(str(user_id), now or datetime.now())
+        with self._lock:
+            rows = np.array([self._items.get(c["item_name"], -1) for c in candidates])
+            known = rows >= 0
+            # items without history get a lift of 1 (no boost, no penalty)
+            hour_lift = np.ones(len(candidates), dtype=np.float32)
+            day_lift = np.ones(len(candidates), dtype=np.float32)
+            if known.any():
+                hour_lift[known] = self._item_hours[rows[known]] @ hours * 24
+                day_lift[known] = self._item_days[rows[known]] @ days * 7
+
+        hour_lift = np.clip(hour_lift, 0.0, 3.0)
+        day_lift = np.clip(day_lift, 0.0, 3.0)
+        base = np.array([float(c.get("score") or 0.0) for c in candidates], dtype=np.float32) + 1e-3
+        scores = base * (1 + self.hour_weight * (hour_lift - 1)) * (1 + self.day_weight * (day_lift - 1))
+
+        order = np.argsort(-scores, kind="stable")
+        return [
+            {
+                "item_name": candidates[i]["item_name"],
+                "score": round(float(scores[i]), 4),
+                "hour_lift": round(float(hour_lift[i]), 2),
+                "day_lift": round(float(day_lift[i]), 2),
+            }
+            for i in order
+        ]
+
+    def _with_repeats(self, user_id: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Candidates plus the products the user already orders (not in the list yet)"""
+        _, ordered = self._user_profile(user_id)
+        if not ordered:
+            return candidates
+        names = {c.get("item_name") for c in candidates}
+        best = max((float(c.get("score") or 0.0) for c in candidates), default=0.0) or 1.0
+        most = max(ordered.values())
+        repeats = [
+            {"item_name": name, "score": self.repeat_weight * best * count / most}
+            for name, count in ordered.items()
+            if name not in names
+        ]
+        return candidates + repeats
+
+    def recommend(self, user_id: str, n: int = 5, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Top-n available products for this user at this time"""
+        candidates = self._with_repeats(str(user_id), self.candidates(user_id, max(CANDIDATES, n)))
+        ranked = self.rerank(user_id, candidates, now)
+        if len(ranked) < n and self.fallback is not None:
+            names = {r["item_name"] for r in ranked}
+            extra = [c for c in self.fallback(max(CANDIDATES, n)) if c["item_name"] not in names]
+            ranked += self.rerank(user_id, extra, now)
+        return ranked[:n]
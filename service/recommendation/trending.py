@@ -0,0 +1,296 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from service.events.orderEvents import OrderEvent, order_event_bus
+
+load_dotenv()
+
+TRENDING_WINDOW_MINUTES = int(os.getenv("TRENDING_WINDOW_MINUTES", "180"))
+TRENDING_SNAPSHOT_PATH = os.getenv("TRENDING_SNAPSHOT_PATH", ".trending.npz")
+TRENDING_SNAPSHOT_SECONDS = float(os.getenv("TRENDING_SNAPSHOT_SECONDS", "60"))
+# history replayed from Orders.orders on start (window + hour-of-day profile)
+TRENDING_BACKFILL_DAYS = int(os.getenv("TRENDING_BACKFILL_DAYS", "14"))
+
+
+class TrendingCounter:
+    """
+    Streaming order counts per product, all in NumPy arrays:
+
+    - ring: one row per minute for the last window_minutes (ring buffer,
+      slot = minute % window_minutes); `window` holds the row sums so the
+      sliding-window count per product is always ready
+    - hourly: counts per hour of day (24 rows), decayed by daily_decay each
+      day, so "what sells at lunch" survives a quiet morning
+
+    score = window count + hour_weight * expected count for the current hour
+    over the same span. Top-k is an argpartition plus a sort of k items.
+
+    Each process counts only the events of its own event bus, so on load the
+    counters are rebuilt from Orders.orders (the last TRENDING_BACKFILL_DAYS,
+    oldest first, so the daily decay applies as it would have live) rather
+    than from one worker's partial file. Events that arrive during the
+    rebuild are held back and counted afterwards unless the rebuild already
+    saw the order. State is still saved with np.savez every
+    snapshot_interval seconds (from the event worker, not the request path)
+    and on shutdown; the snapshot is only restored when MongoDB cannot be
+    read at start.
+    """
+
+    def __init__(
+        self,
+        collection=None,
+        window_minutes: int = TRENDING_WINDOW_MINUTES,
+        hour_weight: float = 0.5,
+        daily_decay: float = 0.9,
+        snapshot_path: Optional[str] = TRENDING_SNAPSHOT_PATH,
+        snapshot_interval: float = TRENDING_SNAPSHOT_SECONDS,
+    ):
+        self.collection = collection
+        self.window_minutes = window_minutes
+        self.hour_weight = hour_weight
+        self.daily_decay = daily_decay
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self._names: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._ring = np.zeros((window_minutes, 0), dtype=np.float32)
+        self._window = np.zeros(0, dtype=np.float32)
+        self._hourly = np.zeros((24, 0), dtype=np.float32)
+        self._minute: Optional[int] = None   # absolute minute of the newest ring slot
+        self._day: Optional[int] = None      # local day ordinal `hourly` is decayed to
+        self._loaded = False
+        self._loading = False
+        self._held: List[OrderEvent] = []   # created events seen while loading
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    # ---------- Counting ----------
+
+    def add(self, product_name: str, ts: Optional[float] = None, count: float = 1.0) -> None:
+        """Count an order of product_name at unix time ts (default now)"""
+        if not product_name:
+            return
+        ts = time.time() if ts is None else ts
+        minute = int(ts // 60)
+        local = datetime.fromtimestamp(ts)
+        with self._lock:
+            i = self._column(product_name)
+            self._advance(minute)
+            if self._minute - minute < self.window_minutes:
+                self._ring[minute % self.window_minutes, i] += count
+                self._window[i] += count
+            self._decay_to(local.toordinal())
+            self._hourly[local.hour, i] += count
+            self._dirty = True
+
+    def _count_event(self, event: OrderEvent) -> None:
+        at = event.get("at")
+        ts = at.replace(tzinfo=timezone.utc).timestamp() if at else None
+        self.add(event.get("product_name"), ts)
+
+    def handle(self, events: List[OrderEvent]) -> None:
+        """Order event bus subscriber: count newly created orders"""
+        created = [event for event in events if event.get("type") == "created"]
+        with self._lock:
+            if not self._loaded:
+                # before load() the backfill on first read includes them;
+                # during it they may or may not be in its cursor
+                if self._loading:
+                    self._held.extend(created)
+                return
+        for event in created:
+            self._count_event(event)
+        if self._dirty and time.monotonic() - self._saved_at > self.snapshot_interval:
+            self.snapshot()
+
+    # ---------- Query ----------
+
+    def top(self, k: int = 5, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The k products trending right now, best first"""
+        self.load()
+        now = time.time() if now is None else now
+        local = datetime.fromtimestamp(now)
+        with self._lock:
+            if not self._names:
+                return []
+            self._advance(int(now // 60))
+            self._decay_to(local.toordinal())
+            # decayed sum over days -> one day's count, scaled to the window span
+            expected = self._hourly[local.hour] * (1 - self.daily_decay) * (self.window_minutes / 60)
+            scores = self._window + self.hour_weight * expected
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"item_name": self._names[i], "score": round(float(scores[i]), 3), "orders": int(self._window[i])}
+                for i in top
+                if scores[i] > 0
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "products": len(self._names),
+                "window_minutes": self.window_minutes,
+                "window_orders": int(self._window.sum()),
+                "loaded": self._loaded,
+            }
+
+    # ---------- Snapshot / restore ----------
+
+    def snapshot(self, path: Optional[str] = None) -> None:
+        """Write the counters to disk (atomic: tmp file + rename)"""
+        path = path or self.snapshot_path
+        if not path or not self._loaded:
+            return  # never overwrite a snapshot with counters that were not restored
+        with self._lock:
+            data = {
+                "names": np.array(self._names, dtype=str),
+                "ring": self._ring.copy(),
+                "hourly": self._hourly.copy(),
+                "minute": np.int64(-1 if self._minute is None else self._minute),
+                "day": np.int64(-1 if self._day is None else self._day),
+                "saved_at": np.float64(time.time()),
+            }
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(tmp, **data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"❌ failed to snapshot trending counters: {e}")
+
+    def restore(self, path: Optional[str] = None) -> Optional[float]:
+        """Load a snapshot; returns its unix time, or None if there is none"""
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                names = [str(n) for n in data["names"]]
+                ring, hourly = data["ring"], data["hourly"]
+                minute, day, saved_at = int(data["minute"]), int(data["day"]), float(data["saved_at"])
+        except Exception as e:
+            print(f"⚠️ ignoring unreadable trending snapshot {path}: {e}")
+            return None
+
+        with self._lock:
+            self._names = names
+            self._pos = {name: i for i, name in enumerate(names)}
+            self._hourly = hourly.astype(np.float32)
+            self._day = None if day < 0 else day
+            self._ring = np.zeros((self.window_minutes, len(names)), dtype=np.float32)
+            self._minute = None if minute < 0 else minute
+            if self._minute is not None:
+                # keep the minutes that still fit (window size may have changed)
+                kept = min(len(ring), self.window_minutes)
+                for m in range(self._minute - kept + 1, self._minute + 1):
+                    self._ring[m % self.window_minutes] = ring[m % len(ring)]
+            self._window = self._ring.sum(axis=0)
+        return saved_at
+
+    def backfill(self, since: datetime, seen: Optional[set] = None) -> int:
+        """Count orders created since `since` (local time, like createAt), oldest first"""
+        if self.collection is None:
+            return 0
+        cursor = self.collection.find(
+            {"createAt": {"$gt": since}, "status": {"$ne": "cancelled"}},
+            {"product_name": 1, "createAt": 1},
+        ).sort("createAt", 1)
+        count = 0
+        for order in cursor:
+            if seen is not None:
+                seen.add(str(order["_id"]))
+            if order.get("product_name") and order.get("createAt"):
+                self.add(order["product_name"], order["createAt"].timestamp())
+                count += 1
+        return count
+
+    def load(self) -> None:
+        """Rebuild the counters from Orders.orders (once, on first use)"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._loading = True
+            since = datetime.now() - max(timedelta(days=TRENDING_BACKFILL_DAYS), timedelta(minutes=self.window_minutes))
+            seen: set = set()
+            try:
+                count = self.backfill(since, seen)
+                print(f"✅ trending counters ready ({count} orders replayed since {since:%Y-%m-%d %H:%M})")
+            except Exception as e:
+                saved_at = self.restore()
+                restored = f"snapshot of {datetime.fromtimestamp(saved_at):%Y-%m-%d %H:%M}" if saved_at else "no snapshot"
+                print(f"⚠️ trending backfill failed ({e}), using {restored}")
+            with self._lock:
+                held, self._held = self._held, []
+                self._loading = False
+                self._loaded = True  # events from now on are counted live
+            for event in held:
+                if str(event.get("order_id")) not in seen:
+                    self._count_event(event)
+
+    # ---------- Internals (call with the lock held) ----------
+
+    def _column(self, name: str) -> int:
+        i = self._pos.get(name)
+        if i is not None:
+            return i
+        i = len(self._names)
+        self._pos[name] = i
+        self._names.append(name)
+        self._ring = np.pad(self._ring, ((0, 0), (0, 1)))
+        self._window = np.append(self._window, np.float32(0))
+        self._hourly = np.pad(self._hourly, ((0, 0), (0, 1)))
+        return i
+
+    def _advance(self, minute: int) -> None:
+        """Move the ring head to `minute`, clearing the slots that fall out of the window"""
+        if self._minute is None:
+            self._minute = minute
+            return
+        gap = minute - self._minute
+        if gap <= 0:
+            return
+        if gap >= self.window_minutes:
+            self._ring[:] = 0
+            self._window[:] = 0
+        else:
+            slots = np.arange(self._minute + 1, minute + 1) % self.window_minutes
+            self._window -= self._ring[slots].sum(axis=0)
+            self._ring[slots] = 0
+        self._minute = minute
+
+    def _decay_to(self, day: int) -> None:
+        if self._day is None:
+            self._day = day
+        elif day > self._day:
+            self._hourly *= self.daily_decay ** (day - self._day)
+            self._day = day
+
+
+_counters: Dict[str, TrendingCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_trending_counter(collection) -> TrendingCounter:
+    """One shared counter per orders collection, fed by the order event bus"""
+    key = collection.full_name
+    with _counters_lock:
+        counter = _counters.get(key)
+        if counter is None:
+            counter = _counters[key] = TrendingCounter(collection)
+            order_event_bus.subscribe(counter.handle)
+    return counter
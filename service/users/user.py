@@ -1,12 +1,19 @@
 from datetime import datetime, timezone
 import os
-from typing import TypedDict, Optional
+from typing import Any, Dict, TypedDict, Optional
 from bson import ObjectId
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from pymongo.database import Database
 
+from service.users.userCache import PROFILE_FIELDS, UserProfileCache, to_profile
+
+load_dotenv()
+user_profile_cache = UserProfileCache(
+    max_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+)
 
 class UserType(TypedDict, total=False):
     line_user_id: str
@@ -40,6 +47,31 @@ class Users:
             # Fall back to a simple string search if conversion fails
             return self.collection.find_one({"_id": user_id})
 
+    # ---------- Cached profile lookups (hot path) ----------
+    def get_user_profile_by_line_id(self, line_id: str) -> Optional[Dict[str, Any]]:
+        """Compact user profile by LINE ID, served from cache when possible"""
+        profile = user_profile_cache.get_by_line_id(line_id)
+        if profile is None:
+            token = user_profile_cache.token()
+            user = self.collection.find_one({"line_user_id": line_id}, {f: 1 for f in PROFILE_FIELDS})
+            if not user:
+                return None
+            profile = to_profile(user)
+            user_profile_cache.put(profile, token)
+        return profile
+
+    def get_user_profile_by_user_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Compact user profile by _id, served from cache when possible"""
+        profile = user_profile_cache.get_by_user_id(user_id)
+        if profile is None:
+            token = user_profile_cache.token()
+            user = self.get_user_by_user_id(user_id)
+            if not user:
+                return None
+            profile = to_profile(user)
+            user_profile_cache.put(profile, token)
+        return profile
+
     def create_user(self, user_data: UserType) -> str:
         """Insert new user"""
         # if "line_user_id" in user_data:
@@ -48,6 +80,8 @@ class Users:
         if "createdAt" not in user_data:
             user_data["createdAt"] = datetime.now(timezone.utc)
         result = self.collection.insert_one(user_data)
+        if user_data.get("line_user_id"):
+            user_profile_cache.invalidate(line_id=user_data["line_user_id"])
         return str(result.inserted_id)
 
     def upsert_user(self, user_data: UserType) -> str:
@@ -60,4 +94,5 @@ class Users:
             {"$set": user_data},
             upsert=True
         )
+        user_profile_cache.invalidate(line_id=user_data["line_user_id"])
         return str(result.upserted_id) if result.upserted_id else "updated"
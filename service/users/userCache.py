@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# fields the agent prompt and the routes actually read
+PROFILE_FIELDS = (
+    "_id",
+    "line_user_id",
+    "username",
+    "display_name",
+    "picture_url",
+    "email",
+    "studentId",
+    "studentID",
+    "role",
+)
+
+
+def to_profile(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact projection of a user document (_id as string)"""
+    profile = {k: user[k] for k in PROFILE_FIELDS if k in user}
+    if "_id" in profile:
+        profile["_id"] = str(profile["_id"])
+    return profile
+
+
+class UserProfileCache:
+    """
+    LRU + TTL cache of user profiles, addressable by _id and by line_user_id.
+    Writers must call invalidate() so readers in this process never see a
+    stale profile for longer than it takes the write to return.
+
+    The cache is per process: a write made through another uvicorn worker
+    (or straight in Mongo) is only seen here after `ttl`, role changes
+    included. Keep USER_CACHE_TTL short where that matters.
+
+    Read-through callers take a token() before loading and hand it to put():
+    a profile loaded before an invalidate() of the same user is dropped
+    instead of overwriting the invalidation.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._line_index: Dict[str, str] = {}
+        # per-key generation: "u:<_id>" / "l:<line_user_id>" -> invalidation
+        # sequence number; bounded, older keys fall back to _forgotten
+        self._sequence = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token(self) -> int:
+        """Take before loading a profile from the database, pass to put()"""
+        with self._lock:
+            return self._sequence
+
+    def get_by_user_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get(user_id)
+
+    def get_by_line_id(self, line_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            user_id = self._line_index.get(line_id)
+            if user_id is None:
+                self.misses += 1
+                return None
+            return self._get(user_id)
+
+    def put(self, profile: Dict[str, Any], token: Optional[int] = None) -> None:
+        user_id = profile.get("_id")
+        if not user_id:
+            return
+        with self._lock:
+            if token is not None and self._stale(token, user_id, profile.get("line_user_id")):
+                return
+            self._remove(user_id)
+            self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+            if profile.get("line_user_id"):
+                self._line_index[profile["line_user_id"]] = user_id
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[str] = None, line_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._sequence += 1
+            if line_id is not None:
+                self._bump("l:" + line_id)
+                user_id = self._line_index.get(line_id, user_id)
+            if user_id is not None:
+                self._bump("u:" + str(user_id))
+                self._remove(str(user_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._line_index.clear()
+
+    def _bump(self, key: str) -> None:
+        self._invalidated.pop(key, None)
+        self._invalidated[key] = self._sequence
+        while len(self._invalidated) > self.max_size:
+            _, sequence = self._invalidated.popitem(last=False)
+            self._forgotten = max(self._forgotten, sequence)
+
+    def _stale(self, token: int, user_id: str, line_id: Optional[str]) -> bool:
+        if token < self._forgotten:
+            return True
+        keys = ["u:" + str(user_id)] + (["l:" + line_id] if line_id else [])
+        return any(self._invalidated.get(k, -1) > token for k in keys)
+
+    def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(user_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def _remove(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry and entry[1].get("line_user_id"):
+            line_id = entry[1]["line_user_id"]
+            if self._line_index.get(line_id) == user_id:
+                del self._line_index[line_id]
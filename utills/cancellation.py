@@ -0,0 +1,55 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RunControl:
+    """
+    Cooperative cancellation for one agent run.
+
+    task.cancel() only stops the awaiting coroutine: tool bodies already
+    handed to a worker thread keep running. Write tools therefore call
+    begin_write() before they commit; it refuses once the run is cancelled.
+    cancel() in turn refuses once a write has started, so the caller knows
+    the run has side effects and must not be dropped or retried.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = False
+        self.writes = 0
+
+    def cancel(self) -> bool:
+        """Block further writes. False if a write already started (let the run finish)."""
+        with self._lock:
+            if self.writes:
+                return False
+            self.cancelled = True
+            return True
+
+    def begin_write(self) -> bool:
+        """Called by a write tool before committing. False = the run was cancelled, skip the write."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.writes += 1
+            return True
+
+
+# like the request deadline, follows the run into asyncio tasks and (via
+# copy_context) into tool threads
+_current: ContextVar[Optional[RunControl]] = ContextVar("run_control", default=None)
+
+
+@contextmanager
+def run_control(control: RunControl):
+    token = _current.set(control)
+    try:
+        yield control
+    finally:
+        _current.reset(token)
+
+
+def current_run() -> Optional[RunControl]:
+    return _current.get()
@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute deadline (time.monotonic()) of the current request. Set once at the
+# entry point; tools, HTTP clients and retries read the remaining budget so a
+# slow step can't push the whole reply past it. contextvars follow the request
+# into asyncio tasks and (via copy_context / to_thread) into worker threads.
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Limit everything inside to `seconds` (an outer, earlier deadline wins)"""
+    new = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: float) -> float:
+    """Seconds left, capped at `default` (= `default` when no deadline is set)"""
+    current = _deadline.get()
+    if current is None:
+        return default
+    return max(0.0, min(default, current - time.monotonic()))
+
+
+def expired() -> bool:
+    current = _deadline.get()
+    return current is not None and time.monotonic() >= current
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from utills.cancellation import RunControl, run_control
+
+
+class MessageDebouncer:
+    """
+    Coalesce bursts of messages per key (LINE user) into one handler call.
+
+    Messages that arrive within `window_ms` of each other are merged. If a new
+    message arrives while the handler is still running for the same key and
+    that run has not started a write tool yet, the run is cancelled (further
+    writes are refused via RunControl) and its messages are merged into the
+    next one, so the user only ever gets the answer to everything they sent.
+    A run that already started a write is left to finish; the new messages
+    are then handled on their own, after it.
+    """
+
+    def __init__(self, handler: Callable[[str, List[str]], Awaitable[None]], window_ms: int = 1200):
+        self.handler = handler
+        self.window = window_ms / 1000
+        self._pending: Dict[str, List[str]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._running: Dict[str, Tuple[asyncio.Task, List[str], RunControl]] = {}
+
+    def is_active(self, key: str) -> bool:
+        return key in self._pending or key in self._running
+
+    def submit(self, key: str, text: str) -> bool:
+        """
+        Queue a message. Returns True when it opens a new burst, i.e. the
+        caller should send the placeholder reply.
+        """
+        is_new = not self.is_active(key)
+
+        running = self._running.get(key)
+        if running:
+            task, texts, control = running
+            if control.cancel():
+                del self._running[key]
+                task.cancel()
+                self._pending[key] = texts + self._pending.get(key, [])
+
+        self._pending.setdefault(key, []).append(text)
+
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._timers[key] = asyncio.create_task(self._flush_later(key))
+        return is_new
+
+    async def _flush_later(self, key: str):
+        await asyncio.sleep(self.window)
+        running = self._running.get(key)
+        if running:
+            # a run with a write in flight: answer the new messages after it
+            await asyncio.wait([running[0]])
+        self._timers.pop(key, None)
+        texts = self._pending.pop(key, [])
+        if not texts:
+            return
+        control = RunControl()
+        task = asyncio.create_task(self._run(key, texts, control))
+        self._running[key] = (task, texts, control)
+        task.add_done_callback(lambda t: self._finished(key, t))
+
+    async def _run(self, key: str, texts: List[str], control: RunControl):
+        with run_control(control):
+            await self.handler(key, texts)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        current = self._running.get(key)
+        if current and current[0] is task:
+            del self._running[key]
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+# Records incoming LINE text messages as an anonymized JSONL corpus for
+# benchmarks/replay.py. Only the text, a salted pseudonym of the user and the
+# user's role are kept; emails, phone numbers, long digit runs (student ids)
+# and LINE ids inside the text are masked.
+
+_MASKS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"), "<email>"),
+    (re.compile(r"\bU[0-9a-f]{32}\b"), "<line_id>"),
+    (re.compile(r"(?:\+66|0)[689]\d[-\s]?\d{3}[-\s]?\d{4}"), "<phone>"),
+    (re.compile(r"\d{8,}"), "<number>"),
+]
+
+
+def anonymize_text(text: str) -> str:
+    for pattern, replacement in _MASKS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class ConversationRecorder:
+    def __init__(self, path: str, salt: str = ""):
+        self.path = path
+        self.salt = salt
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def pseudonym(self, user_id: str) -> str:
+        return "u_" + hashlib.sha256((self.salt + user_id).encode()).hexdigest()[:12]
+
+    def record(self, user_id: str, text: str, role: Optional[str] = None) -> None:
+        line = json.dumps({
+            "ts": round(time.time(), 3),
+            "user": self.pseudonym(user_id),
+            "role": role or "student",
+            "text": anonymize_text(text),
+        }, ensure_ascii=False)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"⚠️ failed to record message: {e}")
+
+
+def create_recorder() -> Optional[ConversationRecorder]:
+    """LINE_RECORD_PATH enables recording; LINE_RECORD_SALT keeps pseudonyms unlinkable"""
+    path = os.getenv("LINE_RECORD_PATH")
+    if not path:
+        return None
+    return ConversationRecorder(path, os.getenv("LINE_RECORD_SALT", os.getenv("SECRET_KEY", "")))
@@ -0,0 +1,38 @@
+import re
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+# Lightweight local "embedding": hashed character n-grams, L2 normalised.
+# Works for Thai (no word boundaries) without a tokenizer or model download.
+
+DIM = 2048
+NGRAMS = (2, 3)
+
+# polite particles / filler that don't change intent
+_FILLERS = ("ครับผม", "ครับ", "คับ", "ค่ะ", "คะ", "จ้า", "จ้ะ", "นะ", "หน่อย", "ด้วย")
+_PUNCT = re.compile(r"[\s\.,!?~'\"“”‘’\-_:;()\[\]{}]+")
+
+
+def normalize(text: str) -> str:
+    text = (text or "").strip().lower()
+    for filler in _FILLERS:
+        text = text.replace(filler, "")
+    return _PUNCT.sub("", text)
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Vector for already-normalised text"""
+    vector = np.zeros(dim, dtype=np.float32)
+    padded = f"^{text}$"
+    for n in NGRAMS:
+        for i in range(len(padded) - n + 1):
+            vector[zlib.crc32(padded[i:i + n].encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_many(texts: Iterable[str], dim: int = DIM) -> np.ndarray:
+    rows = [embed(t, dim) for t in texts]
+    return np.vstack(rows) if rows else np.zeros((0, dim), dtype=np.float32)
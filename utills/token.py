@@ -1,48 +1,147 @@
 import os
 import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient
+
+STATE_TTL = timedelta(minutes=10)
+
+
+class OAuthStateStore(ABC):
+    """ที่เก็บ state token ของ OAuth (ใช้ครั้งเดียว หมดอายุเอง)"""
+
+    @abstractmethod
+    def put(self, state_token: str, data: Any, ttl: timedelta = STATE_TTL) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, state_token: str) -> Optional[Any]:
+        """คืนค่าที่เก็บไว้โดยไม่ลบ (None ถ้าไม่มีหรือหมดอายุ)"""
+
+    @abstractmethod
+    def pop(self, state_token: str) -> Optional[Any]:
+        """คืนค่าที่เก็บไว้และลบทิ้งในครั้งเดียว (None ถ้าไม่มีหรือหมดอายุ)"""
+
+
+class InMemoryOAuthStateStore(OAuthStateStore):
+    """สำหรับ deploy แบบเครื่องเดียว / worker เดียว"""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._states: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def put(self, state_token: str, data: Any, ttl: timedelta = STATE_TTL) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._states[state_token] = (now + ttl.total_seconds(), data)
+            if now - self._last_sweep > self._sweep_interval:
+                self._states = {k: v for k, v in self._states.items() if v[0] > now}
+                self._last_sweep = now
+
+    def get(self, state_token: str) -> Optional[Any]:
+        with self._lock:
+            record = self._states.get(state_token)
+        if not record or record[0] < time.monotonic():
+            return None
+        return record[1]
+
+    def pop(self, state_token: str) -> Optional[Any]:
+        with self._lock:
+            record = self._states.pop(state_token, None)
+        if not record or record[0] < time.monotonic():
+            return None
+        return record[1]
+
+
+class MongoOAuthStateStore(OAuthStateStore):
+    """
+    เก็บใน MongoDB: TTL index ลบ state ที่หมดอายุให้เอง
+    และใช้ find_one_and_delete ตรวจ+ลบใน round trip เดียว
+    """
+
+    def __init__(self, mongodb_uri: str):
+        self.client = MongoClient(mongodb_uri)
+        self.database = self.client["Users"]
+        self.collection = self.database["line_oauth"]
+        # สร้าง index ตอนใช้งานครั้งแรก ไม่ใช่ตอน import (ไม่บล็อกการ start)
+        self._indexed = False
+        self._index_lock = threading.Lock()
+
+    def _ensure_indexes(self) -> None:
+        if self._indexed:
+            return
+        with self._index_lock:
+            if not self._indexed:
+                self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+                self.collection.create_index([("state_token", ASCENDING)], unique=True)
+                self._indexed = True
+
+    def put(self, state_token: str, data: Any, ttl: timedelta = STATE_TTL) -> None:
+        self._ensure_indexes()
+        now = datetime.utcnow()
+        self.collection.insert_one({
+            "state_token": state_token,
+            "data": data,
+            "expires_at": now + ttl,
+            "created_at": now,
+        })
+
+    def get(self, state_token: str) -> Optional[Any]:
+        record = self.collection.find_one({
+            "state_token": state_token,
+            "expires_at": {"$gt": datetime.utcnow()},
+        })
+        return record.get("data") if record else None
+
+    def pop(self, state_token: str) -> Optional[Any]:
+        # TTL monitor รันทุก ~60 วินาที จึงต้องเช็ค expires_at ใน filter ด้วย
+        record = self.collection.find_one_and_delete({
+            "state_token": state_token,
+            "expires_at": {"$gt": datetime.utcnow()},
+        })
+        return record.get("data") if record else None
+
+
+def create_state_store(backend: str, mongodb_uri: str = None) -> OAuthStateStore:
+    if backend == "memory":
+        return InMemoryOAuthStateStore()
+    if backend == "mongo":
+        return MongoOAuthStateStore(mongodb_uri)
+    raise ValueError(f"Unknown OAuth state backend: {backend}")
+
 
 class Token:
-    def __init__(self, mongodb_uri):
+    def __init__(self, mongodb_uri, backend: str = None):
         load_dotenv()
         self.uri = mongodb_uri
-        self.client = MongoClient(self.uri)
-        self.database = self.client["Users"]
-        self.collection = self.database["line_oauth"]
+        # mongo = ใช้ร่วมกันได้หลาย worker, memory = เครื่องเดียว ไม่ต้องแตะ DB
+        backend = backend or os.getenv("OAUTH_STATE_BACKEND", "mongo")
+        self.store = create_state_store(backend, self.uri)
 
     def generate_state_token(self) -> str:
         """สร้าง state token"""
         return secrets.token_urlsafe(32)
 
-    def store_oauth_state(self, state_token: str, line_user_id: str = None):
-        """เก็บ state token + user_id ลง MongoDB"""
-        expires_at = datetime.utcnow() + timedelta(minutes=10)
-
-        doc = {
-            "state_token": state_token,
-            "line_user_id": line_user_id,
-            "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-        }
-
-        self.collection.insert_one(doc)
+    def store_oauth_state(self, state_token: str, data: Any = None):
+        """เก็บ state token + ข้อมูลที่ต้องใช้ตอน callback"""
+        self.store.put(state_token, data)
         return True
 
     def get_oauth_state(self, state_token: str):
-        """ดึง state token กลับมาเพื่อตรวจสอบ"""
-        record = self.collection.find_one({"state_token": state_token})
-        if not record:
-            return None
-
-        # ตรวจสอบหมดอายุ
-        if record["expires_at"] < datetime.utcnow():
-            self.collection.delete_one({"_id": record["_id"]})
-            return None
+        """ดึง state token กลับมาดูโดยไม่ลบ (callback ใช้ consume_oauth_state)"""
+        return self.store.get(state_token)
 
-        return record.get("line_user_id")  # ✅ คืนค่า user_id (string) อย่างเดียว
+    def consume_oauth_state(self, state_token: str):
+        """ใช้ state token (ครั้งเดียว ตรวจ+ลบใน round trip เดียว) ก่อนแลก code"""
+        return self.store.pop(state_token)
 
     def delete_oauth_state(self, state_token: str):
-        """ลบ state token ทิ้ง (หลังใช้แล้ว)"""
-        self.collection.delete_one({"state_token": state_token})
+        """ลบ state token ทิ้ง"""
+        self.store.pop(state_token)
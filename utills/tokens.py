@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+# Local token counting. tiktoken is used when its encoding is available
+# offline; otherwise a byte-based estimate (~4 bytes/token, close enough
+# for Thai + JSON budgeting).
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text.encode("utf-8")) // 4)